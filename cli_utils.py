@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+CLI Wrapper Utilities for NextEleven Terminal Agent
+Shared subprocess handling for the thin kubectl/helm/vault/scanner wrappers
+"""
+
+import subprocess
+from typing import List, Optional, Tuple
+
+
+def run_cli(cmd: List[str], timeout: float, tool: str, install_hint: Optional[str] = None,
+            stdin_text: Optional[str] = None) -> Tuple[int, str, str]:
+    """Run a CLI command and return (exit_code, stdout, stderr)
+
+    Missing binaries, timeouts and other launch errors are reported as exit
+    code 1 with a message in stderr rather than raised.
+
+    Args:
+        cmd: Command and arguments
+        timeout: Seconds before the command is killed
+        tool: Tool name used in error messages
+        install_hint: Appended as "Install with: ..." when the tool is missing
+        stdin_text: Optional text passed on stdin
+    """
+    try:
+        result = subprocess.run(cmd, input=stdin_text, capture_output=True, text=True, timeout=timeout)
+        return result.returncode, result.stdout, result.stderr
+    except FileNotFoundError:
+        if install_hint:
+            return 1, "", f"{tool} not found. Install with: {install_hint}"
+        return 1, "", f"{tool} not found"
+    except subprocess.TimeoutExpired:
+        return 1, "", f"{tool} timeout"
+    except Exception as e:
+        return 1, "", str(e)
@@ -5,7 +5,94 @@ Parse code blocks from AI responses and automatically create files
 
 import re
 import os
-from typing import List, Tuple, Dict, Any
+from typing import Iterator, List, Tuple, Dict, Any
+
+_FENCE = '```'
+# Info string after an opening fence: ```python\n or ```filename.py\n
+_LANGUAGE_HEADER_RE = re.compile(r'(\w*)\n')
+_FILENAME_HEADER_RE = re.compile(r'([a-zA-Z0-9_./-]+\.\w+)\n')
+
+# Filename hints in the text before a block, in priority order:
+# "**`filename`**" or "`filename`" or "filename:" or "file/create/save filename"
+_FILENAME_HINT_RES = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\*\*`([a-zA-Z0-9_./-]+\.\w+)`\*\*',
+    r'`([a-zA-Z0-9_./-]+\.\w+)`',
+    r'([a-zA-Z0-9_./-]+\.(?:py|js|ts|jsx|tsx|json|md|txt|yml|yaml|toml|rs|go|java|kt|swift|cpp|c|h|hpp|rb|php|sh|bash|zsh|fish|html|css|sql|dockerfile|makefile)):',
+    r'file[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
+    r'create[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
+    r'save[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
+)]
+
+_LANG_TO_EXT = {
+    'python': 'py',
+    'javascript': 'js',
+    'typescript': 'ts',
+    'jsx': 'jsx',
+    'tsx': 'tsx',
+    'json': 'json',
+    'markdown': 'md',
+    'yaml': 'yml',
+    'toml': 'toml',
+    'rust': 'rs',
+    'go': 'go',
+    'java': 'java',
+    'kotlin': 'kt',
+    'swift': 'swift',
+    'cpp': 'cpp',
+    'c': 'c',
+    'html': 'html',
+    'css': 'css',
+    'sql': 'sql',
+    'bash': 'sh',
+    'shell': 'sh',
+    'dockerfile': 'Dockerfile',
+    'makefile': 'Makefile',
+}
+
+_EXT_TO_LANG = {
+    'py': 'python',
+    'js': 'javascript',
+    'ts': 'typescript',
+    'jsx': 'jsx',
+    'tsx': 'tsx',
+    'json': 'json',
+    'md': 'markdown',
+    'yml': 'yaml',
+    'yaml': 'yaml',
+    'toml': 'toml',
+    'rs': 'rust',
+    'go': 'go',
+    'java': 'java',
+    'kt': 'kotlin',
+    'swift': 'swift',
+    'cpp': 'cpp',
+    'c': 'c',
+    'html': 'html',
+    'css': 'css',
+    'sql': 'sql',
+    'sh': 'bash',
+}
+
+
+def _iter_fenced_blocks(response: str, header_re: re.Pattern) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yield (fence_start, header, body) for each ```header\nbody``` block, in order
+    
+    Scans fence to fence with str.find, so the cost is linear in the response
+    even with many unterminated fences.
+    """
+    pos = response.find(_FENCE)
+    while pos != -1:
+        header = header_re.match(response, pos + len(_FENCE))
+        if header:
+            close = response.find(_FENCE, header.end())
+            if close == -1:
+                # No closing fence anywhere after this one, so nothing later can close either
+                return
+            yield pos, header.group(1), response[header.end():close]
+            pos = response.find(_FENCE, close + len(_FENCE))
+        else:
+            pos = response.find(_FENCE, pos + 1)
 
 
 def extract_code_blocks(response: str) -> List[Tuple[str, str, str]]:
@@ -18,103 +105,36 @@ def extract_code_blocks(response: str) -> List[Tuple[str, str, str]]:
     code_blocks = []
     
     # Pattern 1: Standard markdown code blocks with language
-    # ```python\ncode\n```
-    pattern1 = r'```(\w+)?\n(.*?)```'
-    matches1 = re.finditer(pattern1, response, re.DOTALL)
-    
-    for match in matches1:
-        language = match.group(1) or 'txt'
-        code = match.group(2).strip()
+    for start, language, code in _iter_fenced_blocks(response, _LANGUAGE_HEADER_RE):
+        language = language or 'txt'
+        code = code.strip()
         
         # Try to infer filename from language and context
         filename = None
         
         # Look for filename hints before the code block
-        context_start = max(0, match.start() - 200)
-        context = response[context_start:match.start()]
-        
-        # Pattern: "**`filename`**" or "`filename`" or "filename:" before code block
-        filename_patterns = [
-            r'\*\*`([a-zA-Z0-9_./-]+\.\w+)`\*\*',
-            r'`([a-zA-Z0-9_./-]+\.\w+)`',
-            r'([a-zA-Z0-9_./-]+\.(?:py|js|ts|jsx|tsx|json|md|txt|yml|yaml|toml|rs|go|java|kt|swift|cpp|c|h|hpp|rb|php|sh|bash|zsh|fish|html|css|sql|dockerfile|makefile)):',
-            r'file[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
-            r'create[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
-            r'save[:\s]+([a-zA-Z0-9_./-]+\.\w+)',
-        ]
+        context = response[max(0, start - 200):start]
         
-        for pattern in filename_patterns:
-            filename_match = re.search(pattern, context, re.IGNORECASE)
+        for pattern in _FILENAME_HINT_RES:
+            filename_match = pattern.search(context)
             if filename_match:
                 filename = filename_match.group(1).strip()
                 break
         
         # If no filename found, try language-based defaults
         if not filename:
-            lang_to_ext = {
-                'python': 'py',
-                'javascript': 'js',
-                'typescript': 'ts',
-                'jsx': 'jsx',
-                'tsx': 'tsx',
-                'json': 'json',
-                'markdown': 'md',
-                'yaml': 'yml',
-                'toml': 'toml',
-                'rust': 'rs',
-                'go': 'go',
-                'java': 'java',
-                'kotlin': 'kt',
-                'swift': 'swift',
-                'cpp': 'cpp',
-                'c': 'c',
-                'html': 'html',
-                'css': 'css',
-                'sql': 'sql',
-                'bash': 'sh',
-                'shell': 'sh',
-                'dockerfile': 'Dockerfile',
-                'makefile': 'Makefile',
-            }
-            ext = lang_to_ext.get(language.lower(), 'txt')
+            ext = _LANG_TO_EXT.get(language.lower(), 'txt')
             filename = f"code.{ext}"
         
         code_blocks.append((filename, language, code))
     
     # Pattern 2: Code blocks with filename in first line
-    # ```filename.py\ncode\n```
-    pattern2 = r'```([a-zA-Z0-9_./-]+\.\w+)\n(.*?)```'
-    matches2 = re.finditer(pattern2, response, re.DOTALL)
-    
-    for match in matches2:
-        filename = match.group(1).strip()
-        code = match.group(2).strip()
+    for _, filename, code in _iter_fenced_blocks(response, _FILENAME_HEADER_RE):
+        filename = filename.strip()
+        code = code.strip()
         # Infer language from extension
         ext = filename.split('.')[-1] if '.' in filename else 'txt'
-        ext_to_lang = {
-            'py': 'python',
-            'js': 'javascript',
-            'ts': 'typescript',
-            'jsx': 'jsx',
-            'tsx': 'tsx',
-            'json': 'json',
-            'md': 'markdown',
-            'yml': 'yaml',
-            'yaml': 'yaml',
-            'toml': 'toml',
-            'rs': 'rust',
-            'go': 'go',
-            'java': 'java',
-            'kt': 'kotlin',
-            'swift': 'swift',
-            'cpp': 'cpp',
-            'c': 'c',
-            'html': 'html',
-            'css': 'css',
-            'sql': 'sql',
-            'sh': 'bash',
-        }
-        language = ext_to_lang.get(ext, ext)
+        language = _EXT_TO_LANG.get(ext, ext)
         code_blocks.append((filename, language, code))
     
     # Deduplicate (keep first occurrence)
@@ -137,6 +157,7 @@ def create_files_from_code_blocks(code_blocks: List[Tuple[str, str, str]], base_
         List of (filename, success, message) tuples
     """
     results = []
+    ensured_dirs = set()
     
     for filename, language, code in code_blocks:
         # Clean filename (remove any path traversal attempts)
@@ -144,8 +165,11 @@ def create_files_from_code_blocks(code_blocks: List[Tuple[str, str, str]], base_
         filepath = os.path.join(base_path, filename)
         
         try:
-            # Create directory if needed
-            os.makedirs(os.path.dirname(filepath) if os.path.dirname(filepath) else '.', exist_ok=True)
+            # Create directory if needed (once per directory, not per file)
+            directory = os.path.dirname(filepath) or '.'
+            if directory not in ensured_dirs:
+                os.makedirs(directory, exist_ok=True)
+                ensured_dirs.add(directory)
             
             # Write file
             with open(filepath, 'w', encoding='utf-8') as f:
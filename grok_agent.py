@@ -33,6 +33,14 @@ except ImportError:
     DISK_CACHE_AVAILABLE = False
     DiskCache = None  # type: ignore
 
+# Try to import orjson for faster history serialization (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None  # type: ignore
+    ORJSON_AVAILABLE = False
+
 # Try to import plugin system (optional)
 try:
     from plugin_system import get_tool as plugin_get_tool, execute_tool as plugin_execute_tool, load_plugins_from_directory, list_tools as plugin_list_tools
@@ -155,8 +163,12 @@ RETRY_JITTER_PERCENT = 0.3  # Jitter percentage for retry backoff
 MAX_REQUEST_SIZE = 100 * 1024  # 100KB max request size
 MAX_RESPONSE_SIZE = 10 * 1024 * 1024  # 10MB max response size
 HISTORY_COMPACT_THRESHOLD = 20  # Compact history when > 20 messages
+HISTORY_SAVE_INTERVAL_TURNS = 5  # Persist interactive history at most every N turns...
+HISTORY_SAVE_INTERVAL_SECONDS = 10.0  # ...or once this many seconds have passed (always on exit)
 CACHE_DEFAULT_TTL = 300  # 5 minutes default cache TTL
 CACHE_DEFAULT_SIZE = 100  # Default cache size
+STREAM_FLUSH_SECONDS = 0.05  # Flush streamed output at most this long after the last flush
+ENV_CONTEXT_TTL = 5.0  # Seconds to reuse cached env context (cwd, git status, dir tree)
 
 # Config defaults (Claude-like)
 DEFAULT_CONFIG = {
@@ -398,6 +410,9 @@ _response_cache: OrderedDict[str, Tuple[float, Any]] = OrderedDict()  # hash ->
 _cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}  # Cache statistics
 _disk_cache: Optional[DiskCache] = None  # Disk cache instance (optional)
 
+# Env context cache (keyed on cwd + .git/HEAD and .git/index mtimes)
+_env_context_cache: Dict[str, Any] = {"key": None, "value": None, "timestamp": 0.0}
+
 # Request deduplication (track in-flight requests)
 _in_flight_requests: Dict[str, Any] = {}
 _in_flight_lock = threading.Lock()  # Lock for thread-safe access
@@ -466,11 +481,63 @@ CRITICAL: When providing code or creating files, you MUST use tools:
 
 Be concise for CLI. Maintain todos if mentioned. Use appropriate tools based on project type."""
 
+# Last built system prompt, keyed on the env context it was built from
+_system_prompt_cache: Dict[str, Any] = {"key": None, "value": None}
+
+def get_system_prompt_cached(cwd: str, git_status: str, dir_tree: str) -> str:
+    """Get the system prompt, rebuilding it (and re-detecting the project) only when the env context changes"""
+    key = (cwd, git_status, dir_tree)
+    if _system_prompt_cache["key"] != key:
+        _system_prompt_cache["value"] = get_system_prompt(cwd, git_status, dir_tree)
+        _system_prompt_cache["key"] = key
+    return _system_prompt_cache["value"]
+
 # Lightweight topic prompt (emulates Claude's check-new-topic)
 TOPIC_PROMPT = "Analyze if this starts a new topic: {input}. Return JSON: {{\"isNewTopic\": bool, \"title\": str}}"
 
+# Local topic-shift heuristic: word-set Jaccard overlap with the previous user message.
+# Above SAME it is a follow-up, below NEW a new topic; in between the API decides.
+TOPIC_SAME_THRESHOLD = 0.4
+TOPIC_NEW_THRESHOLD = 0.05
+TOPIC_TITLE_LENGTH = 40
+# Inputs shorter than this skip topic detection entirely
+TOPIC_DETECTION_MIN_LENGTH = 20
+_WORD_RE = re.compile(r'\w+')
+# Inputs mentioning a todo are recorded (matched in place, no lowercased copy of large pastes)
+TODO_RE = re.compile(r'todo', re.IGNORECASE)
+
+def likely_new_topic(previous: str, current: str) -> Optional[bool]:
+    """Guess whether current starts a new topic without an API call
+    
+    Returns:
+        True/False when word overlap is decisive, None when ambiguous
+    """
+    prev_words = set(_WORD_RE.findall(previous.lower()))
+    cur_words = set(_WORD_RE.findall(current.lower()))
+    if not prev_words or not cur_words:
+        return None
+    overlap = len(prev_words & cur_words) / len(prev_words | cur_words)
+    if overlap > TOPIC_SAME_THRESHOLD:
+        return False
+    if overlap < TOPIC_NEW_THRESHOLD:
+        return True
+    return None
+
+def last_user_message(history: List[Dict[str, Any]]) -> str:
+    """Text of the most recent user message in history ("" if none)"""
+    for message in reversed(history):
+        if message.get('role') == 'user' and isinstance(message.get('content'), str):
+            return message['content']
+    return ""
+
 # Context compaction prompt (emulates Claude's compact)
 COMPACT_PROMPT = "Summarize this conversation history concisely: {history}"
+# Pre-split so inputs are concatenated in instead of run through str.format each turn
+# (the TOPIC halves drop the {{ }} escapes that str.format would have consumed)
+COMPACT_PROMPT_HEAD, COMPACT_PROMPT_TAIL = COMPACT_PROMPT.split("{history}")
+TOPIC_PROMPT_HEAD, TOPIC_PROMPT_TAIL = (
+    part.replace("{{", "{").replace("}}", "}") for part in TOPIC_PROMPT.split("{input}")
+)
 
 # Tools implementation (Python equivalents of Claude's tools)
 def tool_bash(params: Dict[str, Any], allow_force: bool = False) -> Tuple[int, str, str]:
@@ -1056,7 +1123,7 @@ def tool_cprofile_analyze(params: Dict[str, Any]) -> Tuple[int, str, str]:
     try:
         from profiling_utils import analyze_profile_stats
         stats_file = params.get('stats_file', '')
-        top_n = params.get('top_n', 20)
+        top_n = int(params.get('top_n', 20))  # XML tool params arrive as strings
         
         if not stats_file:
             return 1, "", "stats_file parameter required"
@@ -1217,11 +1284,16 @@ def tool_kubectl_get(params: Dict[str, Any]) -> Tuple[int, str, str]:
         resource = params.get('resource', '')
         namespace = params.get('namespace', None)
         output_format = params.get('output', 'json')
+        fields = params.get('fields', None)
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
         
         if not resource:
             return 1, "", "resource parameter required"
         
-        return kubectl_get(resource, namespace, output_format)
+        return kubectl_get(resource, namespace, output_format, fields=fields,
+                           label_selector=params.get('label_selector', None),
+                           field_selector=params.get('field_selector', None))
     except ImportError:
         return 1, "", "orchestration_utils module not available"
     except Exception as e:
@@ -1409,6 +1481,12 @@ def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
             return DEFAULT_CONFIG.copy()
     return DEFAULT_CONFIG.copy()
 
+def dumps_history(history: List[Dict[str, Any]]) -> str:
+    """Serialize history to a JSON string for prompts (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(history).decode('utf-8')
+    return json.dumps(history)
+
 def load_history() -> List[Dict[str, str]]:
     """
     Load conversation history with corruption detection and validation.
@@ -1657,6 +1735,37 @@ def get_env_context() -> Tuple[str, str, str]:
     
     return cwd, git_status, dir_tree
 
+def _env_context_key(cwd: str) -> Tuple[Any, ...]:
+    """Build env context cache key from cwd and git metadata mtimes"""
+    mtimes = []
+    for name in ('HEAD', 'index'):
+        try:
+            mtimes.append(os.stat(os.path.join(cwd, '.git', name)).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return (cwd, *mtimes)
+
+def get_env_context_cached(ttl: float = ENV_CONTEXT_TTL) -> Tuple[str, str, str]:
+    """Get environment context, reusing the last result for up to ttl seconds
+    
+    The cached value is dropped early if the cwd changes or git's HEAD/index
+    are touched (commit, checkout, add), so git status stays accurate.
+    """
+    cwd = os.getcwd()
+    key = _env_context_key(cwd)
+    now = time.monotonic()
+    if _env_context_cache["key"] == key and now - _env_context_cache["timestamp"] < ttl:
+        return _env_context_cache["value"]
+    
+    value = get_env_context()
+    _env_context_cache.update(key=key, value=value, timestamp=now)
+    return value
+
+def invalidate_env_context_cache() -> None:
+    """Force the next get_env_context_cached() call to refresh"""
+    _env_context_cache["key"] = None
+    _env_context_cache["value"] = None
+
 def _get_http_client() -> httpx.Client:
     """Get or create HTTP client with connection pooling"""
     global _http_client
@@ -2053,6 +2162,61 @@ def call_grok_api(
             else:
                 raise ValueError(f"API request failed: {e.response.status_code} {e.response.text}")
 
+# Set ELEVEN_HEALTHCHECK=1 to probe the API in the background at session start
+HEALTHCHECK_ENV_VAR = "ELEVEN_HEALTHCHECK"
+
+def _probe_api(api_key: str, config: Dict[str, Any]) -> None:
+    """Lightweight quota/API probe (logs problems, never blocks the session)"""
+    try:
+        quota_resp = call_grok_api(
+            api_key,
+            [{"role": "user", "content": "quota"}],
+            config['model'],
+            0.0,
+            10,
+            stream=False,
+            config=config
+        )
+        if "error" in quota_resp:
+            logger.warning("Quota/API issue reported by startup probe")
+    except Exception as e:
+        logger.warning(f"API check failed: {e}")
+
+def start_api_probe(api_key: str, config: Dict[str, Any]) -> None:
+    """Run the opt-in startup API probe off the critical path, in a daemon thread"""
+    if os.environ.get(HEALTHCHECK_ENV_VAR) == "1":
+        threading.Thread(target=_probe_api, args=(api_key, config), daemon=True).start()
+
+def message_content(resp: Dict[str, Any], default: str = '') -> str:
+    """Content of the first choice's message in a non-streaming API response"""
+    return ((resp.get('choices') or [{}])[0].get('message') or {}).get('content', default)
+
+def delta_content(chunk: Dict[str, Any]) -> str:
+    """Content of the first choice's delta in a streamed API chunk"""
+    return ((chunk.get('choices') or [{}])[0].get('delta') or {}).get('content', '')
+
+def stream_response_to_stdout(chunks: Iterator[Dict[str, Any]]) -> str:
+    """Echo streamed API chunks to stdout and return the full response text
+    
+    Chunks are written straight to sys.stdout and flushed on newlines or once
+    STREAM_FLUSH_SECONDS have passed, instead of a print() + flush per chunk.
+    """
+    out = sys.stdout
+    parts: List[str] = []
+    last_flush = time.monotonic()
+    for chunk in chunks:
+        content = delta_content(chunk)
+        if content:
+            out.write(content)
+            parts.append(content)
+            now = time.monotonic()
+            if '\n' in content or now - last_flush >= STREAM_FLUSH_SECONDS:
+                out.flush()
+                last_flush = now
+    out.write('\n')  # Newline after streaming
+    out.flush()
+    return "".join(parts)
+
 def extract_tools(response: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
     """Parse <tool name="..."><param>...</tool> from response"""
     tools = []
@@ -2066,8 +2230,9 @@ def extract_tools(response: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
     
     return tools
 
+@lru_cache(maxsize=256)
 def classify_command_risk(cmd: str) -> str:
-    """Classify command risk level"""
+    """Classify command risk level (memoized: agents re-run the same commands often)"""
     cmd_lower = cmd.lower()
     for pattern in DANGEROUS_PATTERNS:
         if re.search(pattern, cmd_lower):
@@ -2076,9 +2241,14 @@ def classify_command_risk(cmd: str) -> str:
         return "SAFE"
     return "CAUTION"
 
+@lru_cache(maxsize=32)
+def expand_user_path(path: str) -> str:
+    """os.path.expanduser, memoized (config paths are expanded on every tool call)"""
+    return os.path.expanduser(path)
+
 def run_hook(hook_type: str, data: Dict[str, Any]) -> Tuple[bool, str]:
     """Run pre/post tool hooks from ~/.grok_terminal/hooks/"""
-    hook_dir = os.path.expanduser(DEFAULT_CONFIG['hooks_dir'])
+    hook_dir = expand_user_path(DEFAULT_CONFIG['hooks_dir'])
     hook_file = os.path.join(hook_dir, f"{hook_type}.sh")
     
     if os.path.exists(hook_file):
@@ -2411,23 +2581,8 @@ def main():
             print("Declined.")
             sys.exit(0)
     
-        # Quota check (emulate Claude's lightweight call)
-        try:
-            quota_resp = call_grok_api(
-                api_key,
-                [{"role": "user", "content": "quota"}],
-                config['model'],
-                0.0,
-                10,
-                stream=False,
-                config=config
-            )
-            if "error" in quota_resp:
-                print(colored("Quota/API issue.", 'red'))
-                sys.exit(1)
-        except Exception as e:
-            print(colored(f"API check failed: {e}", 'red'))
-            # Continue anyway
+        # Optional API probe (ELEVEN_HEALTHCHECK=1), never blocks the first prompt
+        start_api_probe(api_key, config)
 
         # Summarize previous if history exists (emulate Claude's compact)
         system_msg = None
@@ -2435,14 +2590,14 @@ def main():
             try:
                 compact_resp = call_grok_api(
                     api_key,
-                    [{"role": "user", "content": COMPACT_PROMPT.format(history=json.dumps(history))}],
+                    [{"role": "user", "content": COMPACT_PROMPT_HEAD + dumps_history(history) + COMPACT_PROMPT_TAIL}],
                     config['model'],
                     config['temperature'],
                     512,
                     stream=False,
                     config=config
                 )
-                compacted_content = compact_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
+                compacted_content = message_content(compact_resp)
                 cwd, git_status, dir_tree = get_env_context()
                 system_prompt = get_system_prompt(cwd, git_status, dir_tree)
                 history = [
@@ -2461,11 +2616,13 @@ def main():
 
         print(colored("eleven session started. Type queries; /help for commands; 'exit' to quit.", 'green'))
 
+        turns_since_save = 0
+        last_history_save = time.monotonic()
         while True:
             try:
                 user_input = input(colored("You: ", 'blue')).strip()
                 
-                if user_input.lower() == 'exit':
+                if len(user_input) == 4 and user_input.lower() == 'exit':  # Length first: no lowercased copy of long pastes
                     save_history(history)
                     save_todos(todos)
                     print(colored("Session ended.", 'green'))
@@ -2493,64 +2650,64 @@ def main():
                                 stream=False,
                                 config=config
                             )
-                            init_content = init_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
+                            init_content = message_content(init_resp)
                             with open('ELEVEN.md', 'w') as f:
                                 f.write(init_content)
                             print(colored("ELEVEN.md generated.", 'green'))
                         except Exception as e:
                             print(colored(f"Failed to generate ELEVEN.md: {e}", 'red'))
                     elif user_input == '/clear':
-                        history = [history[0]] if history and history[0].get('role') == 'system' else []
+                        history = history[:1]  # Keep the system-prompt slot
                         print(colored("History cleared.", 'green'))
                     elif user_input == '/hooks':
-                        hook_dir = os.path.expanduser(DEFAULT_CONFIG['hooks_dir'])
+                        hook_dir = expand_user_path(DEFAULT_CONFIG['hooks_dir'])
                         print(colored(f"Hooks directory: {hook_dir}", 'cyan'))
                         print("Create PreToolUse.sh and PostToolUse.sh in this directory")
                     continue
 
-                # Topic detection (lightweight call)
+                # Topic detection (skipped for short follow-ups; local heuristic first,
+                # lightweight call only when ambiguous)
                 is_new_topic = False
-                try:
-                    topic_resp = call_grok_api(
-                        api_key,
-                        [{"role": "user", "content": TOPIC_PROMPT.format(input=user_input)}],
-                        config['model'],
-                        0.0,
-                        128,
-                        stream=False,
-                        config=config
-                    )
-                    topic_content = topic_resp.get('choices', [{}])[0].get('message', {}).get('content', '{}')
-                    topic = json.loads(topic_content)
-                    if topic.get('isNewTopic', False):
-                        is_new_topic = True
-                        print(colored(f"New topic: {topic.get('title', 'Unknown')}", 'cyan'))
-                except Exception:
-                    pass  # Topic detection is non-critical
+                if len(user_input) >= TOPIC_DETECTION_MIN_LENGTH:
+                    is_new_topic = likely_new_topic(last_user_message(history), user_input)
+                    if is_new_topic:
+                        print(colored(f"New topic: {user_input[:TOPIC_TITLE_LENGTH]}", 'cyan'))
+                if is_new_topic is None:
+                    is_new_topic = False
+                    try:
+                        topic_resp = call_grok_api(
+                            api_key,
+                            [{"role": "user", "content": TOPIC_PROMPT_HEAD + user_input + TOPIC_PROMPT_TAIL}],
+                            config['model'],
+                            0.0,
+                            128,
+                            stream=False,
+                            config=config
+                        )
+                        topic_content = message_content(topic_resp, '{}')
+                        topic = json.loads(topic_content)
+                        if topic.get('isNewTopic', False):
+                            is_new_topic = True
+                            print(colored(f"New topic: {topic.get('title', 'Unknown')}", 'cyan'))
+                    except Exception:
+                        pass  # Topic detection is non-critical
 
                 # Add user message to history
                 history.append({"role": "user", "content": user_input})
 
                 # Update system prompt with current context
-                cwd, git_status, dir_tree = get_env_context()
-                system_prompt = get_system_prompt(cwd, git_status, dir_tree)
-                if history and history[0].get('role') == 'system':
-                    history[0]['content'] = system_prompt
-                else:
-                    history.insert(0, {"role": "system", "content": system_prompt})
+                cwd, git_status, dir_tree = get_env_context_cached()
+                system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
+                history[0]['content'] = system_prompt  # Session start and /clear keep this slot
 
                 # Call API with streaming
                 messages = history
-                full_response = ""
                 print(colored("eleven: ", 'green'), end='', flush=True)
                 
                 try:
-                    for chunk in call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config):
-                        content = chunk.get('choices', [{}])[0].get('delta', {}).get('content', '')
-                        if content:
-                            print(content, end='', flush=True)
-                            full_response += content
-                    print()  # Newline after streaming
+                    full_response = stream_response_to_stdout(
+                        call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config)
+                    )
                 except Exception as e:
                     print(colored(f"\nAPI error: {e}", 'red'))
                     continue
@@ -2655,26 +2812,30 @@ def main():
                         try:
                             compact_resp = call_grok_api(
                                 api_key,
-                                [{"role": "user", "content": COMPACT_PROMPT.format(history=json.dumps(history[1:]))}],
+                                [{"role": "user", "content": COMPACT_PROMPT_HEAD + dumps_history(history[1:]) + COMPACT_PROMPT_TAIL}],
                                 config['model'],
                                 config['temperature'],
                                 1024,
                                 stream=False,
                                 config=config
                             )
-                            compacted_content = compact_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
-                            history = [history[0]] + [{"role": "assistant", "content": compacted_content}]
+                            compacted_content = message_content(compact_resp)
+                            history = [history[0], {"role": "assistant", "content": compacted_content}]
                         except Exception:
                             # If compaction fails, just keep recent history
-                            history = history[:1] + history[-19:]
+                            history = [history[0], *history[-19:]]
 
                 # Todos if mentioned
-                if "todo" in user_input.lower():
+                if TODO_RE.search(user_input):
                     todos[datetime.now().isoformat()] = user_input
                     save_todos(todos)
 
-                # Save history periodically
-                save_history(history)
+                # Save history periodically (debounced; exit paths always save)
+                turns_since_save += 1
+                now = time.monotonic()
+                if turns_since_save >= HISTORY_SAVE_INTERVAL_TURNS or now - last_history_save >= HISTORY_SAVE_INTERVAL_SECONDS:
+                    save_history(history)
+                    turns_since_save, last_history_save = 0, now
 
             except KeyboardInterrupt:
                 print(colored("\nInterrupted. Session ended.", 'yellow'))
@@ -2719,14 +2880,10 @@ def main():
         
         try:
             # Stream response
-            full_response = ""
             print(colored("eleven: ", 'green'), end='', flush=True)
-            for chunk in call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config):
-                content = chunk.get('choices', [{}])[0].get('delta', {}).get('content', '')
-                if content:
-                    print(content, end='', flush=True)
-                    full_response += content
-            print()
+            full_response = stream_response_to_stdout(
+                call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config)
+            )
             
             # Extract commands if any
             tool_calls = extract_tools(full_response)
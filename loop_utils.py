@@ -4,17 +4,64 @@ Ralph-Wiggum Loop Implementation for Eleven-Term
 Enables self-iterative AI loops for autonomous development workflows
 """
 
+import io
 import json
 import os
 import re
 import time
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional, Tuple, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, BinaryIO, Callable, Optional, Tuple, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Try to import orjson for faster state serialization (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None  # type: ignore
+    ORJSON_AVAILABLE = False
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes (orjson when available, stdlib fallback)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data: Any) -> Any:
+    """Deserialize JSON from bytes or str (orjson when available, stdlib fallback)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _timestamp() -> str:
+    """Local time as an ISO-8601 string (second resolution)"""
+    return time.strftime(TIMESTAMP_FORMAT)
+
+
+# grok_agent and main_helpers are resolved on first loop run rather than at import
+# time (main_helpers imports this module), then cached for later runs
+_grok = None
+_helpers = None
+
+
+def _agent_modules() -> Tuple[Any, Any]:
+    """Return the (grok_agent, main_helpers) modules, importing them once"""
+    global _grok, _helpers
+    if _grok is None:
+        import grok_agent
+        import main_helpers
+        _grok, _helpers = grok_agent, main_helpers
+    return _grok, _helpers
+
 
 def extract_tools_from_natural_language(response: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
     """Extract tool calls from natural language responses (fallback for orchestrator API)
@@ -135,6 +182,31 @@ LOOP_LOG_DIR = os.path.expanduser('~/.grok_terminal/loop_logs')
 os.makedirs(LOOP_STATE_DIR, exist_ok=True)
 os.makedirs(LOOP_LOG_DIR, exist_ok=True)
 
+# Number of previous iterations included in each prompt
+CONTEXT_WINDOW = 5
+
+# Number of recent history messages sent with each loop request
+LOOP_HISTORY_WINDOW = 10
+
+# Read-only tools that may run concurrently within one iteration
+PARALLEL_SAFE_TOOLS = frozenset({"View", "LS", "Glob", "Grep"})
+MAX_TOOL_WORKERS = 8
+
+# Window size for case-insensitive completion promise scanning
+COMPLETION_SCAN_WINDOW = 64 * 1024
+
+# Iteration log buffering (flush every N iterations and when the loop ends)
+LOG_BUFFER_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 5
+# Persist the full state snapshot every N iterations (and on terminal events)
+STATE_SAVE_INTERVAL = 5
+
+# Name of the pointer file (inside LOOP_STATE_DIR) holding the active loop ID
+ACTIVE_LOOP_POINTER = "active"
+
+# Tool usage instructions appended to the first iteration's prompt
+TOOL_INSTRUCTIONS = "\n\nCRITICAL: You MUST use tools in XML format to interact with files:\n\n<tool name=\"LS\"><param name=\"path\">.</param></tool>\n<tool name=\"View\"><param name=\"path\">filename.py</param></tool>\n<tool name=\"Bash\"><param name=\"command\">ls -la</param></tool>\n\nIf you cannot use XML format, describe tools clearly like:\n- \"Tool: LS\" or \"Use LS tool to list files\"\n- \"Tool: View file=main.py\" or \"Read the file main.py\"\n- \"Tool: Bash command='python test.py'\" or \"Run: python test.py\"\n\nStart by listing files, then read and refactor them."
+
 
 class LoopState:
     """Manages state for iterative AI loops"""
@@ -143,16 +215,20 @@ class LoopState:
         self.loop_id = loop_id
         self.prompt = prompt
         self.completion_promise = completion_promise
+        self._promise_cf = completion_promise.casefold()
         self.max_iterations = max_iterations
         self.current_iteration = 0
         self.context: List[str] = []
         self.files_modified: List[str] = []
         self.git_commits: List[str] = []
-        self.start_time = datetime.now().isoformat()
+        self.start_time = _timestamp()
         self.state_file = os.path.join(LOOP_STATE_DIR, f"{loop_id}.json")
         self.log_file = os.path.join(LOOP_LOG_DIR, f"{loop_id}.txt")
         self.completed = False
         self.completion_reason = ""
+        self._active_marked = False
+        self._dirty = False
+        self._log_fh: Optional[BinaryIO] = None
         
     def save(self) -> None:
         """Save loop state to file"""
@@ -170,10 +246,23 @@ class LoopState:
             "completion_reason": self.completion_reason,
         }
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state_data, f, indent=2)
+            # Atomic write: write to temp file, then rename over the state file
+            temp_file = self.state_file + '.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(_json_dumps(state_data, indent=True))
+            os.replace(temp_file, self.state_file)
         except Exception as e:
             logger.error(f"Failed to save loop state: {e}")
+            return
+        self._dirty = False
+        
+        # Keep the active-loop pointer in sync (written once, cleared on completion)
+        if self.completed:
+            if _read_active_pointer() == self.loop_id:
+                _write_active_pointer("")
+        elif not self._active_marked:
+            _write_active_pointer(self.loop_id)
+            self._active_marked = True
     
     @classmethod
     def load(cls, loop_id: str) -> Optional['LoopState']:
@@ -183,8 +272,8 @@ class LoopState:
             return None
         
         try:
-            with open(state_file, 'r') as f:
-                state_data = json.load(f)
+            with open(state_file, 'rb') as f:
+                state_data = _json_loads(f.read())
             
             loop = cls(
                 state_data["loop_id"],
@@ -196,7 +285,7 @@ class LoopState:
             loop.context = state_data.get("context", [])
             loop.files_modified = state_data.get("files_modified", [])
             loop.git_commits = state_data.get("git_commits", [])
-            loop.start_time = state_data.get("start_time", datetime.now().isoformat())
+            loop.start_time = state_data.get("start_time", _timestamp())
             loop.completed = state_data.get("completed", False)
             loop.completion_reason = state_data.get("completion_reason", "")
             return loop
@@ -211,63 +300,108 @@ class LoopState:
             iteration_data += f"\nExecution output:\n{executed_output}"
         self.context.append(iteration_data)
         self.current_iteration += 1
-        self.save()
+        self._dirty = True
+        if self.completed or self.current_iteration % STATE_SAVE_INTERVAL == 0:
+            self.save()
         
         # Log iteration
         self._log_iteration(iteration_data)
     
     def _log_iteration(self, iteration_data: str) -> None:
-        """Log iteration to file"""
+        """Log iteration to file (buffered; opened once per loop)"""
         try:
-            with open(self.log_file, 'a') as f:
-                f.write(f"\n{'='*60}\n")
-                f.write(f"Timestamp: {datetime.now().isoformat()}\n")
-                f.write(f"{iteration_data}\n")
+            if self._log_fh is None:
+                self._log_fh = open(self.log_file, 'ab', buffering=LOG_BUFFER_SIZE)
+            self._log_fh.write(
+                f"\n{'='*60}\nTimestamp: {_timestamp()}\n{iteration_data}\n".encode('utf-8')
+            )
+            if self.completed:
+                self.close()
+            elif self.current_iteration % LOG_FLUSH_INTERVAL == 0:
+                self._log_fh.flush()
         except Exception as e:
             logger.error(f"Failed to log iteration: {e}")
     
+    def close(self) -> None:
+        """Flush and close the iteration log"""
+        if self._log_fh is not None:
+            try:
+                self._log_fh.close()
+            except Exception as e:
+                logger.error(f"Failed to close loop log: {e}")
+            finally:
+                self._log_fh = None
+    
+    def __del__(self) -> None:
+        self.close()
+    
+    def _contains_promise(self, response_text: str) -> bool:
+        """Case-insensitive substring check, casefolding long responses window by window"""
+        promise = self._promise_cf
+        if len(response_text) <= COMPLETION_SCAN_WINDOW:
+            return promise in response_text.casefold()
+        
+        # Overlap windows so a promise spanning a boundary is still found
+        overlap = max(len(promise) - 1, 0)
+        for start in range(0, len(response_text), COMPLETION_SCAN_WINDOW):
+            window = response_text[start:start + COMPLETION_SCAN_WINDOW + overlap]
+            if promise in window.casefold():
+                return True
+        return False
+    
     def check_completion(self, response_text: str) -> bool:
         """Check if completion promise is found in response"""
-        # Use case-insensitive search
-        pattern = re.escape(self.completion_promise)
-        if re.search(pattern, response_text, re.IGNORECASE):
+        if self._contains_promise(response_text):
             self.completed = True
             self.completion_reason = f"Found completion promise: {self.completion_promise}"
             self.save()
             return True
         return False
     
+    def _write_context(self, buf: io.StringIO) -> None:
+        """Stream the most recent iterations into buf (no slice copy or joined string)"""
+        # Keep last CONTEXT_WINDOW iterations for performance
+        end = len(self.context)
+        for i in range(max(0, end - CONTEXT_WINDOW), end):
+            buf.write(self.context[i])
+            if i < end - 1:
+                buf.write("\n\n")
+    
     def get_context_string(self) -> str:
         """Build context string from previous iterations"""
         if not self.context:
             return ""
         
-        # Summarize context if too long (keep last 5 iterations for performance)
-        recent_context = self.context[-5:] if len(self.context) > 5 else self.context
-        return "\n\n".join(recent_context)
+        buf = io.StringIO()
+        self._write_context(buf)
+        return buf.getvalue()
     
     def build_prompt(self) -> str:
         """Build full prompt with context"""
-        base_prompt = self.prompt
-        context = self.get_context_string()
+        buf = io.StringIO()
+        buf.write(self.prompt)
         
         # Add tool usage instructions for first iteration
-        tool_instructions = ""
         if self.current_iteration == 0:
-            tool_instructions = "\n\nCRITICAL: You MUST use tools in XML format to interact with files:\n\n<tool name=\"LS\"><param name=\"path\">.</param></tool>\n<tool name=\"View\"><param name=\"path\">filename.py</param></tool>\n<tool name=\"Bash\"><param name=\"command\">ls -la</param></tool>\n\nIf you cannot use XML format, describe tools clearly like:\n- \"Tool: LS\" or \"Use LS tool to list files\"\n- \"Tool: View file=main.py\" or \"Read the file main.py\"\n- \"Tool: Bash command='python test.py'\" or \"Run: python test.py\"\n\nStart by listing files, then read and refactor them."
+            buf.write(TOOL_INSTRUCTIONS)
         
-        if context:
-            return f"{base_prompt}{tool_instructions}\n\nPrevious iterations:\n{context}\n\nContinue working on this task. Output '{self.completion_promise}' when complete."
+        if self.context:
+            buf.write("\n\nPrevious iterations:\n")
+            self._write_context(buf)
+            buf.write(f"\n\nContinue working on this task. Output '{self.completion_promise}' when complete.")
         else:
-            return f"{base_prompt}{tool_instructions}\n\nOutput '{self.completion_promise}' when complete."
+            buf.write(f"\n\nOutput '{self.completion_promise}' when complete.")
+        return buf.getvalue()
     
     def cleanup(self) -> None:
         """Clean up loop state files (optional, for completed loops)"""
+        self.close()
+        # Archive instead of delete for safety
+        archive_file = self.state_file.replace('.json', '_completed.json')
         try:
-            if os.path.exists(self.state_file):
-                # Archive instead of delete for safety
-                archive_file = self.state_file.replace('.json', '_completed.json')
-                os.rename(self.state_file, archive_file)
+            os.replace(self.state_file, archive_file)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Failed to cleanup loop state: {e}")
 
@@ -277,29 +411,78 @@ def generate_loop_id() -> str:
     return f"loop_{int(time.time())}_{os.getpid()}"
 
 
-def check_for_active_loop() -> Optional[str]:
-    """Check for active (non-completed) loops"""
-    if not os.path.exists(LOOP_STATE_DIR):
+def _active_pointer_path() -> str:
+    """Path of the active-loop pointer file"""
+    return os.path.join(LOOP_STATE_DIR, ACTIVE_LOOP_POINTER)
+
+
+def _read_active_pointer() -> Optional[str]:
+    """Read the active-loop pointer (None if missing, "" if no loop is active)"""
+    try:
+        with open(_active_pointer_path(), 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.debug(f"Could not read active loop pointer: {e}")
         return None
+
+
+def _write_active_pointer(loop_id: str) -> None:
+    """Point the active-loop pointer at loop_id ("" clears it)"""
+    try:
+        with open(_active_pointer_path(), 'w') as f:
+            f.write(loop_id)
+    except OSError as e:
+        logger.error(f"Failed to update active loop pointer: {e}")
+
+
+def _scan_for_active_loop() -> Optional[str]:
+    """Scan loop state files for a non-completed loop (slow fallback)
     
+    Uses os.scandir (no Path objects, no full listing) and stops at the first hit.
+    """
     try:
-        for state_file in Path(LOOP_STATE_DIR).glob("loop_*.json"):
-            if state_file.name.endswith("_completed.json"):
-                continue
-            
-            try:
-                with open(state_file, 'r') as f:
-                    state_data = json.load(f)
+        with os.scandir(LOOP_STATE_DIR) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.startswith("loop_") or not name.endswith(".json") or name.endswith("_completed.json"):
+                    continue
+                
+                try:
+                    with open(entry.path, 'rb') as f:
+                        state_data = _json_loads(f.read())
                     if not state_data.get("completed", False):
                         return state_data.get("loop_id")
-            except Exception:
-                continue
+                except Exception:
+                    continue
     except Exception as e:
         logger.error(f"Error checking for active loops: {e}")
     
     return None
 
 
+def check_for_active_loop() -> Optional[str]:
+    """Check for active (non-completed) loops
+    
+    Reads the active-loop pointer file; the full directory scan only runs
+    when the pointer is missing (state dirs from older versions) or stale.
+    """
+    if not os.path.exists(LOOP_STATE_DIR):
+        return None
+    
+    loop_id = _read_active_pointer()
+    if loop_id == "":
+        return None
+    if loop_id and os.path.exists(os.path.join(LOOP_STATE_DIR, f"{loop_id}.json")):
+        return loop_id
+    
+    # Pointer missing or stale: scan once and rebuild it
+    loop_id = _scan_for_active_loop()
+    _write_active_pointer(loop_id or "")
+    return loop_id
+
+
 def cancel_active_loop(loop_id: Optional[str] = None) -> bool:
     """Cancel an active loop"""
     if loop_id is None:
@@ -317,6 +500,49 @@ def cancel_active_loop(loop_id: Optional[str] = None) -> bool:
     return False
 
 
+def run_tool_calls(
+    tool_calls: List[Tuple[str, List[Tuple[str, str]]]],
+    execute: Callable[..., Tuple[int, str, str]],
+    args: Any,
+    history: List[Dict[str, str]]
+) -> List[Tuple[str, Any]]:
+    """Execute tool calls in order, running consecutive read-only tools concurrently
+    
+    Read-only tools (PARALLEL_SAFE_TOOLS) never prompt for permission, so runs of
+    them are executed in a thread pool. Everything else runs serially, in order.
+    
+    Returns:
+        List of (tool_name, result) in call order; result is the (exit_code,
+        stdout, stderr) tuple or the exception raised by the tool
+    """
+    def _run(tool_name: str, params_list: List[Tuple[str, str]]) -> Any:
+        params = {p[0]: p[1] for p in params_list}
+        try:
+            return execute(tool_name, params, args, history)
+        except Exception as e:
+            return e
+    
+    results: List[Tuple[str, Any]] = []
+    i = 0
+    while i < len(tool_calls):
+        j = i
+        while j < len(tool_calls) and tool_calls[j][0] in PARALLEL_SAFE_TOOLS:
+            j += 1
+        
+        if j - i > 1:
+            batch = tool_calls[i:j]
+            with ThreadPoolExecutor(max_workers=min(MAX_TOOL_WORKERS, len(batch))) as executor:
+                futures = [executor.submit(_run, name, params_list) for name, params_list in batch]
+                results.extend((name, future.result()) for (name, _), future in zip(batch, futures))
+            i = j
+        else:
+            tool_name, params_list = tool_calls[i]
+            results.append((tool_name, _run(tool_name, params_list)))
+            i += 1
+    
+    return results
+
+
 def run_eleven_loop(
     loop_id: str,
     prompt: str,
@@ -343,8 +569,7 @@ def run_eleven_loop(
         Final result message
     """
     try:
-        from grok_agent import call_grok_api, extract_tools, get_env_context, get_system_prompt
-        from main_helpers import execute_tool_safely
+        grok, helpers = _agent_modules()
     except ImportError as e:
         return f"Error: Required modules not available: {e}"
     
@@ -357,6 +582,9 @@ def run_eleven_loop(
     
     executed_outputs = []
     
+    # Bounded view of recent history sent with each request (full history kept for persistence)
+    recent_history = deque(history[-LOOP_HISTORY_WINDOW:], maxlen=LOOP_HISTORY_WINDOW)
+    
     try:
         while loop.current_iteration < loop.max_iterations:
             if loop.completed:
@@ -366,12 +594,12 @@ def run_eleven_loop(
             full_prompt = loop.build_prompt()
             
             # Update system prompt with current context
-            cwd, git_status, dir_tree = get_env_context()
-            system_prompt = get_system_prompt(cwd, git_status, dir_tree)
+            cwd, git_status, dir_tree = grok.get_env_context_cached()
+            system_prompt = grok.get_system_prompt_cached(cwd, git_status, dir_tree)
             
             # Build messages
             messages = [{"role": "system", "content": system_prompt}]
-            messages.extend(history[-10:] if len(history) > 10 else history)  # Include recent history
+            messages.extend(recent_history)  # Include recent history
             messages.append({"role": "user", "content": full_prompt})
             
             # Call API
@@ -379,14 +607,10 @@ def run_eleven_loop(
             print(f"Iteration {loop.current_iteration + 1}/{loop.max_iterations}")
             print(f"{'-'*60}\n")
             
-            full_response = ""
             try:
-                for chunk in call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=loop_config):
-                    content = chunk.get('choices', [{}])[0].get('delta', {}).get('content', '')
-                    if content:
-                        print(content, end='', flush=True)
-                        full_response += content
-                print()  # Newline after streaming
+                full_response = grok.stream_response_to_stdout(
+                    grok.call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=loop_config)
+                )
             except Exception as e:
                 error_msg = f"API error: {e}"
                 print(f"Error: {error_msg}")
@@ -401,7 +625,7 @@ def run_eleven_loop(
             
             # Extract and execute tools
             executed_output = ""
-            tool_calls = extract_tools(full_response)
+            tool_calls = grok.extract_tools(full_response)
             
             # Fallback: if no XML tools found, try natural language parsing
             if not tool_calls:
@@ -409,24 +633,28 @@ def run_eleven_loop(
                 if tool_calls:
                     logger.debug(f"Extracted {len(tool_calls)} tools from natural language response")
             
-            for tool_name, params_list in tool_calls:
-                params = {p[0]: p[1] for p in params_list}
-                if execute_tool_safely and args:
-                    try:
-                        exit_code, stdout, stderr = execute_tool_safely(tool_name, params, args, history)
-                        if exit_code is not None and (stdout or stderr):
-                            executed_output += f"\n[{tool_name}] Exit code: {exit_code}\n{stdout if stdout else stderr}"
-                            executed_outputs.append(executed_output)
-                    except Exception as e:
-                        logger.error(f"Error executing tool {tool_name}: {e}")
-                        executed_output += f"\n[{tool_name}] Error: {str(e)}"
+            if args:
+                for tool_name, result in run_tool_calls(tool_calls, helpers.execute_tool_safely, args, history):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error executing tool {tool_name}: {result}")
+                        executed_output += f"\n[{tool_name}] Error: {str(result)}"
+                        continue
+                    exit_code, stdout, stderr = result
+                    if exit_code is not None and (stdout or stderr):
+                        executed_output += f"\n[{tool_name}] Exit code: {exit_code}\n{stdout if stdout else stderr}"
+                        executed_outputs.append(executed_output)
             
             # Add iteration
             loop.add_iteration(full_response, executed_output)
             
-            # Add to history for next iteration
-            history.append({"role": "user", "content": full_prompt})
-            history.append({"role": "assistant", "content": full_response})
+            # Add to history for next iteration; the original prompt is stored rather
+            # than full_prompt, whose iteration context already lives in loop.context
+            user_msg = {"role": "user", "content": prompt}
+            assistant_msg = {"role": "assistant", "content": full_response}
+            history.append(user_msg)
+            history.append(assistant_msg)
+            recent_history.append(user_msg)
+            recent_history.append(assistant_msg)
             
             # Small delay to avoid rate limiting
             time.sleep(0.5)
@@ -448,5 +676,9 @@ def run_eleven_loop(
         loop.completion_reason = f"Error: {str(e)}"
         loop.save()
         return f"Loop error: {str(e)}"
+    finally:
+        if loop._dirty:
+            loop.save()
+        loop.close()
     
     return f"Loop completed: {loop.completion_reason}"
@@ -3,7 +3,8 @@ Helper functions extracted from main() for better organization
 """
 import sys
 import json
-import os
+import re
+import time
 from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime
 
@@ -11,14 +12,43 @@ from datetime import datetime
 try:
     from grok_agent import (
         colored, get_api_key, load_config, load_history, save_history, save_todos,
-        load_todos, call_grok_api, extract_tools, classify_command_risk, run_hook,
-        get_env_context, get_system_prompt, TOOLS, DEFAULT_CONFIG, HISTORY_COMPACT_THRESHOLD,
-        COMPACT_PROMPT, TOPIC_PROMPT
+        load_todos, call_grok_api, message_content, stream_response_to_stdout, extract_tools, classify_command_risk, run_hook, expand_user_path,
+        get_env_context_cached, invalidate_env_context_cache,
+        get_system_prompt_cached, dumps_history, TOOLS, DEFAULT_CONFIG, HISTORY_COMPACT_THRESHOLD,
+        HISTORY_SAVE_INTERVAL_TURNS, HISTORY_SAVE_INTERVAL_SECONDS,
+        COMPACT_PROMPT_HEAD, COMPACT_PROMPT_TAIL, TOPIC_PROMPT_HEAD, TOPIC_PROMPT_TAIL,
+        TOPIC_TITLE_LENGTH, TOPIC_DETECTION_MIN_LENGTH, TODO_RE, likely_new_topic, last_user_message,
+        start_api_probe
     )
 except ImportError:
     # Fallback if imported before grok_agent is fully loaded
     pass
 
+
+# Tools whose side effects invalidate the cached env context
+ENV_MUTATING_TOOLS = frozenset({"Bash", "Edit", "Write"})
+
+# /eleven-loop tokenizer: "double quoted" (backslash escapes), 'single quoted', or bare words
+_LOOP_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|\'([^\']*)\'|(\S+)')
+_LOOP_ESCAPE_RE = re.compile(r'\\(.)')
+# /eleven-loop flags: flag -> (option name, value converter)
+_LOOP_FLAGS = {
+    '--completion-promise': ("completion_promise", str),
+    '--max-iterations': ("max_iterations", int),
+}
+
+
+def _tokenize_loop_command(text: str) -> List[str]:
+    """Split a slash command into words, honouring quotes (lightweight shlex.split)"""
+    tokens = []
+    for double, single, bare in _LOOP_TOKEN_RE.findall(text):
+        if double:
+            tokens.append(_LOOP_ESCAPE_RE.sub(r'\1', double))
+        else:
+            tokens.append(single or bare)
+    return tokens
+
+
 def handle_list_agents(config: Dict[str, Any]) -> None:
     """Handle --list-agents flag"""
     specialized_agents = config.get("specialized_agents", DEFAULT_CONFIG.get("specialized_agents", {}))
@@ -64,7 +94,7 @@ def handle_slash_commands(user_input: str, api_key: str, config: Dict[str, Any],
                 stream=False,
                 config=config
             )
-            init_content = init_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
+            init_content = message_content(init_resp)
             with open('ELEVEN.md', 'w') as f:
                 f.write(init_content)
             print(colored("ELEVEN.md generated.", 'green'))
@@ -73,13 +103,13 @@ def handle_slash_commands(user_input: str, api_key: str, config: Dict[str, Any],
         return True
     elif user_input == '/clear':
         history.clear()
-        cwd, git_status, dir_tree = get_env_context()
-        system_prompt = get_system_prompt(cwd, git_status, dir_tree)
+        cwd, git_status, dir_tree = get_env_context_cached()
+        system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
         history.append({"role": "system", "content": system_prompt})
         print(colored("History cleared.", 'green'))
         return True
     elif user_input == '/hooks':
-        hook_dir = os.path.expanduser(DEFAULT_CONFIG['hooks_dir'])
+        hook_dir = expand_user_path(DEFAULT_CONFIG['hooks_dir'])
         print(colored(f"Hooks directory: {hook_dir}", 'cyan'))
         print("Create PreToolUse.sh and PostToolUse.sh in this directory")
         return True
@@ -87,30 +117,28 @@ def handle_slash_commands(user_input: str, api_key: str, config: Dict[str, Any],
         # Parse loop command
         try:
             from loop_utils import run_eleven_loop, generate_loop_id
-            import shlex
             
-            parts = shlex.split(user_input)
+            parts = _tokenize_loop_command(user_input)
             if len(parts) < 2:
                 print(colored("Usage: /eleven-loop <prompt> --completion-promise \"<phrase>\" [--max-iterations N]", 'yellow'))
                 return True
             
-            # Parse arguments
-            prompt = ""
-            completion_promise = "DONE"
-            max_iterations = 20
+            # Parse arguments in one pass: known flags take the next token, the rest form the prompt
+            options = {"completion_promise": "DONE", "max_iterations": 20}
+            prompt_parts = []
             i = 1
             while i < len(parts):
-                if parts[i] == '--completion-promise' and i + 1 < len(parts):
-                    completion_promise = parts[i + 1]
-                    i += 2
-                elif parts[i] == '--max-iterations' and i + 1 < len(parts):
-                    max_iterations = int(parts[i + 1])
+                flag = _LOOP_FLAGS.get(parts[i])
+                if flag and i + 1 < len(parts):
+                    name, convert = flag
+                    options[name] = convert(parts[i + 1])
                     i += 2
                 else:
-                    if prompt:
-                        prompt += " "
-                    prompt += parts[i]
+                    prompt_parts.append(parts[i])
                     i += 1
+            prompt = " ".join(prompt_parts)
+            completion_promise = options["completion_promise"]
+            max_iterations = options["max_iterations"]
             
             if not prompt:
                 print(colored("Error: Prompt required", 'red'))
@@ -156,7 +184,8 @@ def execute_tool_safely(
     Returns:
         Tuple of (exit_code, stdout, stderr)
     """
-    if tool_name not in TOOLS:
+    tool_fn = TOOLS.get(tool_name)
+    if tool_fn is None:
         return 1, "", f"Unknown tool: {tool_name}"
     
     # Classify risk for Bash commands
@@ -177,12 +206,16 @@ def execute_tool_safely(
     # Execute tool
     try:
         if tool_name == 'Bash':
-            exit_code, stdout, stderr = TOOLS[tool_name](params, allow_force=args.force)
+            exit_code, stdout, stderr = tool_fn(params, allow_force=args.force)
         else:
-            exit_code, stdout, stderr = TOOLS[tool_name](params)
+            exit_code, stdout, stderr = tool_fn(params)
         
         result_text = stdout if stdout else stderr
         
+        # Tools that can touch the working tree make cached git status/dir tree stale
+        if tool_name in ENV_MUTATING_TOOLS:
+            invalidate_env_context_cache()
+        
         if exit_code == 0:
             print(colored(f"Tool {tool_name} result: {result_text}", 'magenta'))
         else:
@@ -209,18 +242,18 @@ def compact_history_if_needed(history: List[Dict[str, str]], api_key: str, confi
     try:
         compact_resp = call_grok_api(
             api_key,
-            [{"role": "user", "content": COMPACT_PROMPT.format(history=json.dumps(history[1:]))}],
+            [{"role": "user", "content": COMPACT_PROMPT_HEAD + dumps_history(history[1:]) + COMPACT_PROMPT_TAIL}],
             config['model'],
             config['temperature'],
             1024,
             stream=False,
             config=config
         )
-        compacted_content = compact_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
-        return [history[0]] + [{"role": "assistant", "content": compacted_content}]
+        compacted_content = message_content(compact_resp)
+        return [history[0], {"role": "assistant", "content": compacted_content}]
     except Exception:
         # If compaction fails, just keep recent history
-        return history[:1] + history[-19:]
+        return [history[0], *history[-19:]]
 
 def initialize_interactive_session(api_key: str, config: Dict[str, Any], history: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """Initialize interactive session with history compaction if needed
@@ -228,23 +261,8 @@ def initialize_interactive_session(api_key: str, config: Dict[str, Any], history
     Returns:
         Initialized history list
     """
-    # Quota check
-    try:
-        quota_resp = call_grok_api(
-            api_key,
-            [{"role": "user", "content": "quota"}],
-            config['model'],
-            0.0,
-            10,
-            stream=False,
-            config=config
-        )
-        if "error" in quota_resp:
-            print(colored("Quota/API issue.", 'red'))
-            sys.exit(1)
-    except Exception as e:
-        print(colored(f"API check failed: {e}", 'red'))
-        # Continue anyway
+    # Optional API probe (ELEVEN_HEALTHCHECK=1), off the critical path
+    start_api_probe(api_key, config)
     
     # Summarize previous if history exists
     system_msg = None
@@ -252,28 +270,28 @@ def initialize_interactive_session(api_key: str, config: Dict[str, Any], history
         try:
             compact_resp = call_grok_api(
                 api_key,
-                [{"role": "user", "content": COMPACT_PROMPT.format(history=json.dumps(history))}],
+                [{"role": "user", "content": COMPACT_PROMPT_HEAD + dumps_history(history) + COMPACT_PROMPT_TAIL}],
                 config['model'],
                 config['temperature'],
                 512,
                 stream=False,
                 config=config
             )
-            compacted_content = compact_resp.get('choices', [{}])[0].get('message', {}).get('content', '')
-            cwd, git_status, dir_tree = get_env_context()
-            system_prompt = get_system_prompt(cwd, git_status, dir_tree)
+            compacted_content = message_content(compact_resp)
+            cwd, git_status, dir_tree = get_env_context_cached()
+            system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
             history = [
                 {"role": "system", "content": system_prompt},
                 {"role": "assistant", "content": compacted_content}
             ]
         except Exception:
             # If compaction fails, use full history
-            cwd, git_status, dir_tree = get_env_context()
-            system_prompt = get_system_prompt(cwd, git_status, dir_tree)
+            cwd, git_status, dir_tree = get_env_context_cached()
+            system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
             history = [{"role": "system", "content": system_prompt}] + history
     else:
-        cwd, git_status, dir_tree = get_env_context()
-        system_prompt = get_system_prompt(cwd, git_status, dir_tree)
+        cwd, git_status, dir_tree = get_env_context_cached()
+        system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
         history = [{"role": "system", "content": system_prompt}]
     
     return history
@@ -288,11 +306,18 @@ def run_interactive_loop(
     """Run the interactive session loop"""
     print(colored("eleven session started. Type queries; /help for commands; 'exit' to quit.", 'green'))
     
+    # Reserve the system-prompt slot once so each turn just overwrites history[0]
+    # (initialize_interactive_session already provides it)
+    if not history or history[0].get('role') != 'system':
+        history.insert(0, {"role": "system", "content": ""})
+    
+    turns_since_save = 0
+    last_history_save = time.monotonic()
     while True:
         try:
             user_input = input(colored("You: ", 'blue')).strip()
             
-            if user_input.lower() == 'exit':
+            if len(user_input) == 4 and user_input.lower() == 'exit':  # Length first: no lowercased copy of long pastes
                 save_history(history)
                 save_todos(todos)
                 print(colored("Session ended.", 'green'))
@@ -302,49 +327,49 @@ def run_interactive_loop(
             if handle_slash_commands(user_input, api_key, config, history, args):
                 continue
             
-            # Topic detection
-            is_new_topic = False
-            try:
-                topic_resp = call_grok_api(
-                    api_key,
-                    [{"role": "user", "content": TOPIC_PROMPT.format(input=user_input)}],
-                    config['model'],
-                    0.0,
-                    128,
-                    stream=False,
-                    config=config
-                )
-                topic_content = topic_resp.get('choices', [{}])[0].get('message', {}).get('content', '{}')
-                topic = json.loads(topic_content)
-                if topic.get('isNewTopic', False):
-                    is_new_topic = True
-                    print(colored(f"New topic: {topic.get('title', 'Unknown')}", 'cyan'))
-            except Exception:
-                pass  # Topic detection is non-critical
+            # Topic detection (skipped for short follow-ups; local heuristic first,
+            # lightweight call only when ambiguous)
+            is_new_topic: Optional[bool] = False
+            if len(user_input) >= TOPIC_DETECTION_MIN_LENGTH:
+                is_new_topic = likely_new_topic(last_user_message(history), user_input)
+                if is_new_topic:
+                    print(colored(f"New topic: {user_input[:TOPIC_TITLE_LENGTH]}", 'cyan'))
+            if is_new_topic is None:
+                is_new_topic = False
+                try:
+                    topic_resp = call_grok_api(
+                        api_key,
+                        [{"role": "user", "content": TOPIC_PROMPT_HEAD + user_input + TOPIC_PROMPT_TAIL}],
+                        config['model'],
+                        0.0,
+                        128,
+                        stream=False,
+                        config=config
+                    )
+                    topic_content = message_content(topic_resp, '{}')
+                    topic = json.loads(topic_content)
+                    if topic.get('isNewTopic', False):
+                        is_new_topic = True
+                        print(colored(f"New topic: {topic.get('title', 'Unknown')}", 'cyan'))
+                except Exception:
+                    pass  # Topic detection is non-critical
             
             # Add user message to history
             history.append({"role": "user", "content": user_input})
             
             # Update system prompt with current context
-            cwd, git_status, dir_tree = get_env_context()
-            system_prompt = get_system_prompt(cwd, git_status, dir_tree)
-            if history and history[0].get('role') == 'system':
-                history[0]['content'] = system_prompt
-            else:
-                history.insert(0, {"role": "system", "content": system_prompt})
+            cwd, git_status, dir_tree = get_env_context_cached()
+            system_prompt = get_system_prompt_cached(cwd, git_status, dir_tree)
+            history[0]['content'] = system_prompt  # Slot guaranteed before the loop
             
             # Call API with streaming
             messages = history
-            full_response = ""
             print(colored("eleven: ", 'green'), end='', flush=True)
             
             try:
-                for chunk in call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config):
-                    content = chunk.get('choices', [{}])[0].get('delta', {}).get('content', '')
-                    if content:
-                        print(content, end='', flush=True)
-                        full_response += content
-                print()  # Newline after streaming
+                full_response = stream_response_to_stdout(
+                    call_grok_api(api_key, messages, config['model'], config['temperature'], config['max_tokens'], stream=True, config=config)
+                )
             except Exception as e:
                 print(colored(f"\nAPI error: {e}", 'red'))
                 continue
@@ -393,12 +418,16 @@ def run_interactive_loop(
             history = compact_history_if_needed(history, api_key, config)
             
             # Todos if mentioned
-            if "todo" in user_input.lower():
+            if TODO_RE.search(user_input):
                 todos[datetime.now().isoformat()] = user_input
                 save_todos(todos)
             
-            # Save history periodically
-            save_history(history)
+            # Save history periodically (debounced; exit paths always save)
+            turns_since_save += 1
+            now = time.monotonic()
+            if turns_since_save >= HISTORY_SAVE_INTERVAL_TURNS or now - last_history_save >= HISTORY_SAVE_INTERVAL_SECONDS:
+                save_history(history)
+                turns_since_save, last_history_save = 0, now
             
         except KeyboardInterrupt:
             print(colored("\nInterrupted. Session ended.", 'yellow'))
@@ -6,9 +6,35 @@ Provides database schema migration capabilities
 
 import subprocess
 import os
+import io
 from typing import Dict, Any, Tuple, Optional
 from pathlib import Path
 
+# Try to import alembic for in-process commands (optional)
+try:
+    from alembic import command as alembic_command
+    from alembic.config import Config as AlembicConfig
+    from alembic.util import CommandError as AlembicCommandError
+    ALEMBIC_AVAILABLE = True
+except ImportError:
+    alembic_command = None  # type: ignore
+    AlembicConfig = None  # type: ignore
+    AlembicCommandError = Exception  # type: ignore
+    ALEMBIC_AVAILABLE = False
+
+
+def _alembic_config(directory: str, stdout: io.StringIO) -> Optional[Any]:
+    """Load directory's alembic.ini for in-process use (None if alembic or the ini is missing)"""
+    ini_path = os.path.join(directory, 'alembic.ini')
+    if not ALEMBIC_AVAILABLE or not os.path.isfile(ini_path):
+        return None
+    cfg = AlembicConfig(ini_path, stdout=stdout)
+    # The CLI resolves a relative script_location against its cwd; do the same for directory
+    script_location = cfg.get_main_option('script_location')
+    if script_location and not os.path.isabs(script_location) and ':' not in script_location:
+        cfg.set_main_option('script_location', os.path.join(directory, script_location))
+    return cfg
+
 
 def alembic_current(directory: str = ".") -> Tuple[int, str, str]:
     """Show current Alembic migration revision"""
@@ -25,7 +51,22 @@ def alembic_current(directory: str = ".") -> Tuple[int, str, str]:
 
 
 def alembic_history(directory: str = ".", verbose: bool = False) -> Tuple[int, str, str]:
-    """Show Alembic migration history"""
+    """Show Alembic migration history
+    
+    Runs in-process when alembic is importable: history only reads the
+    migration scripts, so it skips an interpreter start plus alembic import.
+    """
+    buf = io.StringIO()
+    try:
+        cfg = _alembic_config(directory, buf)
+        if cfg is not None:
+            alembic_command.history(cfg, verbose=verbose)
+            return 0, buf.getvalue(), ""
+    except AlembicCommandError as e:
+        return 1, buf.getvalue(), str(e)
+    except Exception:
+        pass  # Fall back to the CLI
+    
     try:
         cmd = ['alembic', 'history']
         if verbose:
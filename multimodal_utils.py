@@ -4,15 +4,61 @@ Handles image inputs, file attachments, and other media types
 """
 import base64
 import logging
+import mmap
+import os
+import stat
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
+# Read size for incremental base64 encoding; a multiple of 3 so no padding appears mid-stream
+B64_CHUNK_SIZE = 57 * 1024
+IMAGE_READ_BUFFER = 1 << 20
+# Encoded images kept in memory, keyed on (path, mtime, size); each entry is ~4/3 of the file
+IMAGE_CACHE_SIZE = 16
+# Common image extensions resolved without mimetypes (which loads system MIME tables on first use)
+_IMAGE_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+}
+# Text attachments at least this large are decoded from an mmap instead of read() into bytes
+ATTACHMENT_MMAP_THRESHOLD = 1 << 20
+
+def _guess_image_mime_type(path: str) -> Optional[str]:
+    """MIME type for path, from the image extension table with a mimetypes fallback"""
+    mime_type = _IMAGE_MIME_TYPES.get(os.path.splitext(path)[1].lower())
+    if mime_type is None:
+        mime_type, _ = mimetypes.guess_type(path)
+    return mime_type
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def _encode_image_cached(image_path: str, mime_type: str, mtime_ns: int, size: int) -> str:
+    """Read and base64-encode an image (mtime_ns and size key the cache only)"""
+    # Read and encode incrementally (no full copy of the raw file in memory)
+    encoded = bytearray()
+    with open(image_path, 'rb', buffering=IMAGE_READ_BUFFER) as f:
+        while chunk := f.read(B64_CHUNK_SIZE):
+            encoded += base64.b64encode(chunk)
+    
+    # Return data URI format
+    return f"data:{mime_type};base64,{encoded.decode('ascii')}"
+
+def clear_image_cache() -> None:
+    """Drop all memoized image encodings"""
+    _encode_image_cached.cache_clear()
+
 def encode_image_to_base64(image_path: str) -> Optional[str]:
     """Encode image file to base64
     
+    Repeated references to an unchanged file are served from an in-memory cache.
+    
     Args:
         image_path: Path to image file
         
@@ -20,29 +66,38 @@ def encode_image_to_base64(image_path: str) -> Optional[str]:
         Base64 encoded string with data URI prefix, or None on error
     """
     try:
-        image_path_obj = Path(image_path)
-        if not image_path_obj.exists():
+        try:
+            st = os.stat(image_path)
+        except FileNotFoundError:
             logger.error(f"Image file not found: {image_path}")
             return None
         
         # Determine MIME type
-        mime_type, _ = mimetypes.guess_type(str(image_path_obj))
+        mime_type = _guess_image_mime_type(str(image_path))
         if not mime_type or not mime_type.startswith('image/'):
             logger.error(f"File is not an image: {image_path}")
             return None
         
-        # Read and encode
-        with open(image_path_obj, 'rb') as f:
-            image_data = f.read()
-        
-        base64_data = base64.b64encode(image_data).decode('utf-8')
-        
-        # Return data URI format
-        return f"data:{mime_type};base64,{base64_data}"
+        return _encode_image_cached(str(image_path), mime_type, st.st_mtime_ns, st.st_size)
     except Exception as e:
         logger.error(f"Error encoding image {image_path}: {e}")
         return None
 
+def _read_attachment(path: Path) -> str:
+    """Read a text attachment; large files are decoded straight from an mmap (no bytes copy)"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < ATTACHMENT_MMAP_THRESHOLD:
+            text = f.read().decode('utf-8', errors='ignore')
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, 'utf-8', 'ignore')
+    
+    # Match text-mode reads (universal newlines)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
 def prepare_multimodal_message(
     text: str,
     image_paths: Optional[List[str]] = None,
@@ -87,8 +142,7 @@ def prepare_multimodal_message(
             try:
                 file_path_obj = Path(file_path)
                 if file_path_obj.exists():
-                    with open(file_path_obj, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
+                    file_content = _read_attachment(file_path_obj)
                     
                     content.append({
                         "type": "text",
@@ -145,22 +199,16 @@ def extract_images_from_message(message: Dict[str, Any]) -> List[str]:
     Returns:
         List of image URLs or paths
     """
-    images = []
-    
-    content = message.get("content", [])
-    if isinstance(content, str):
-        # Plain text message, no images
-        return images
-    
-    if isinstance(content, list):
-        for item in content:
-            if isinstance(item, dict):
-                if item.get("type") == "image_url":
-                    url = item.get("image_url", {}).get("url", "")
-                    if url:
-                        images.append(url)
-    
-    return images
+    content = message.get("content")
+    if not isinstance(content, list):
+        # Plain text (or missing) content, no images
+        return []
+    
+    return [
+        url for item in content
+        if isinstance(item, dict) and item.get("type") == "image_url"
+        and (url := (item.get("image_url") or {}).get("url"))
+    ]
 
 def validate_image_file(image_path: str) -> tuple[bool, Optional[str]]:
     """Validate image file
@@ -171,21 +219,22 @@ def validate_image_file(image_path: str) -> tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    image_path_obj = Path(image_path)
-    
-    if not image_path_obj.exists():
+    # One stat() answers existence, file type and size
+    try:
+        st = os.stat(image_path)
+    except OSError:
         return False, f"Image file not found: {image_path}"
     
-    if not image_path_obj.is_file():
+    if not stat.S_ISREG(st.st_mode):
         return False, f"Path is not a file: {image_path}"
     
     # Check file size (max 10MB)
     max_size = 10 * 1024 * 1024  # 10MB
-    if image_path_obj.stat().st_size > max_size:
+    if st.st_size > max_size:
         return False, f"Image file too large (max 10MB): {image_path}"
     
     # Check MIME type
-    mime_type, _ = mimetypes.guess_type(str(image_path_obj))
+    mime_type = _guess_image_mime_type(str(image_path))
     if not mime_type or not mime_type.startswith('image/'):
         return False, f"File is not an image: {image_path}"
     
@@ -4,171 +4,556 @@ Container Orchestration Utilities for NextEleven Terminal Agent
 Provides Kubernetes and container orchestration capabilities
 """
 
+import asyncio
+import atexit
+import random
+import re
+import select
 import subprocess
+import threading
+import time
 import json
 import os
-from typing import Dict, Any, Tuple, Optional, List
+import weakref
+from typing import Dict, Any, Tuple, Optional, List, Awaitable, Iterable, Callable, Union
 
+from cli_utils import run_cli
 
-def kubectl_get(resource: str, namespace: Optional[str] = None, output_format: str = "json") -> Tuple[int, str, str]:
-    """Get Kubernetes resources"""
+# Default cap on concurrently running kubectl/helm processes in batch calls
+BATCH_CONCURRENCY = 10
+
+# Async helm install/upgrade: concurrent operations and retries on release lock conflicts
+HELM_CONCURRENCY = 10
+HELM_RETRY_ATTEMPTS = 3
+HELM_RETRY_BASE_DELAY = 1.0  # Seconds, doubled per attempt plus jitter
+_HELM_IN_PROGRESS_RE = re.compile(r'another operation \(install/upgrade/rollback\) is in progress', re.IGNORECASE)
+_helm_concurrency = HELM_CONCURRENCY
+_helm_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+# Route JSON kubectl_get reads through one long-lived `kubectl proxy` (opt-in: the
+# proxy exposes the current kube credentials to anything that can reach its port)
+KUBECTL_USE_PROXY = False
+KUBECTL_PROXY_START_TIMEOUT = 10.0
+_PROXY_SERVE_RE = re.compile(r'Starting to serve on ([\w.\[\]:]+:\d+)')
+_PROXY_RESOURCE_GROUPS = {
+    **dict.fromkeys(['pods', 'services', 'configmaps', 'endpoints', 'events', 'serviceaccounts',
+                     'persistentvolumeclaims', 'namespaces', 'nodes', 'persistentvolumes'], 'api/v1'),
+    **dict.fromkeys(['deployments', 'statefulsets', 'daemonsets', 'replicasets'], 'apis/apps/v1'),
+    **dict.fromkeys(['jobs', 'cronjobs'], 'apis/batch/v1'),
+    'ingresses': 'apis/networking.k8s.io/v1',
+}
+_CLUSTER_SCOPED_RESOURCES = {'namespaces', 'nodes', 'persistentvolumes'}
+_proxy_lock = threading.Lock()
+_proxy_proc: Optional[subprocess.Popen] = None
+_proxy_client = None
+
+KUBECTL_GET_CACHE_TTL = 5.0  # Seconds to reuse a successful kubectl get result
+KUBECTL_GET_CACHE_MAX_ENTRIES = 256  # Prune expired/oldest results beyond this size
+
+# (command tuple) -> (timestamp, result), oldest first; cleared whenever we change the cluster
+_kubectl_get_cache: Dict[Tuple[str, ...], Tuple[float, Tuple[int, str, str]]] = {}
+
+
+def invalidate_kubectl_cache() -> None:
+    """Drop cached kubectl get results"""
+    _kubectl_get_cache.clear()
+
+
+def _prune_kubectl_get_cache(now: float, ttl: float) -> None:
+    """Drop expired entries, then the oldest ones until the cache fits its cap"""
+    for key, (stamp, _) in list(_kubectl_get_cache.items()):
+        if now - stamp < ttl and len(_kubectl_get_cache) <= KUBECTL_GET_CACHE_MAX_ENTRIES:
+            break
+        _kubectl_get_cache.pop(key, None)
+
+
+def _fields_jsonpath(fields: List[str]) -> str:
+    """Build a jsonpath template printing one tab-separated row per list item"""
+    columns = '{"\\t"}'.join('{.%s}' % field.lstrip('.') for field in fields)
+    return '{range .items[*]}' + columns + '{"\\n"}{end}'
+
+
+def _kubectl_get_cmd(resource: str, namespace: Optional[str], output_format: str,
+                     fields: Optional[List[str]], chunk_size: Optional[int],
+                     label_selector: Optional[str], field_selector: Optional[str]) -> List[str]:
+    """Build the kubectl get command line"""
+    if fields:
+        output_format = 'jsonpath=' + _fields_jsonpath(fields)
+    cmd = ['kubectl', 'get', resource, '-o', output_format]
+    if namespace:
+        cmd.extend(['-n', namespace])
+    if chunk_size is not None:
+        cmd.append(f'--chunk-size={chunk_size}')
+    if label_selector:
+        cmd.extend(['-l', label_selector])
+    if field_selector:
+        cmd.append(f'--field-selector={field_selector}')
+    return cmd
+
+
+def parse_kubectl_rows(output: str, fields: List[str]) -> List[Dict[str, str]]:
+    """Parse output of a `fields` kubectl_get into one dict per resource"""
+    return [dict(zip(fields, line.split('\t'))) for line in output.splitlines() if line]
+
+
+def _start_kubectl_proxy():
+    """Start `kubectl proxy` on a free port; returns (process, base URL) or None"""
     try:
-        cmd = ['kubectl', 'get', resource, '-o', output_format]
-        if namespace:
-            cmd.extend(['-n', namespace])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        return result.returncode, result.stdout, result.stderr
+        proc = subprocess.Popen(['kubectl', 'proxy', '--port=0'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return None
+    ready, _, _ = select.select([proc.stdout], [], [], KUBECTL_PROXY_START_TIMEOUT)
+    match = _PROXY_SERVE_RE.search(proc.stdout.readline()) if ready else None
+    if not match:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        return None
+    return proc, f"http://{match.group(1)}"
+
+
+def _stop_kubectl_proxy() -> None:
+    """Shut down the shared kubectl proxy and its HTTP client"""
+    global _proxy_proc, _proxy_client
+    with _proxy_lock:
+        if _proxy_client is not None:
+            _proxy_client.close()
+        if _proxy_proc is not None:
+            if _proxy_proc.poll() is None:
+                _proxy_proc.kill()
+                _proxy_proc.wait()
+            if _proxy_proc.stdout is not None:
+                _proxy_proc.stdout.close()
+        _proxy_proc = _proxy_client = None
+
+
+def _kubectl_proxy_client():
+    """Return a keep-alive HTTP client bound to the shared kubectl proxy, starting it on first use"""
+    global _proxy_proc, _proxy_client
+    with _proxy_lock:
+        if _proxy_client is not None and _proxy_proc is not None and _proxy_proc.poll() is None:
+            return _proxy_client
+        started = _start_kubectl_proxy()
+        if started is None:
+            return None
+        import httpx
+        if _proxy_proc is None:
+            atexit.register(_stop_kubectl_proxy)
+        elif _proxy_client is not None:
+            _proxy_client.close()  # Previous proxy exited
+        _proxy_proc, base_url = started
+        _proxy_client = httpx.Client(base_url=base_url, timeout=60)
+        return _proxy_client
+
+
+def _kubectl_get_via_proxy(resource: str, namespace: Optional[str], label_selector: Optional[str],
+                           field_selector: Optional[str]) -> Optional[Tuple[int, str, str]]:
+    """GET a resource list through kubectl proxy; None means use the kubectl CLI instead"""
+    group = _PROXY_RESOURCE_GROUPS.get(resource)
+    if group is None:
+        return None
+    if resource in _CLUSTER_SCOPED_RESOURCES:
+        path = f"/{group}/{resource}"
+    elif namespace:
+        path = f"/{group}/namespaces/{namespace}/{resource}"
+    else:
+        return None  # The context's default namespace is only known to kubectl
+    client = _kubectl_proxy_client()
+    if client is None:
+        return None
+    query = {}
+    if label_selector:
+        query['labelSelector'] = label_selector
+    if field_selector:
+        query['fieldSelector'] = field_selector
+    try:
+        response = client.get(path, params=query)
+    except Exception:
+        return None
+    if response.status_code != 200:
+        return None  # Let kubectl produce its usual error message
+    return 0, response.text, ""
+
+
+def kubectl_get(resource: str, namespace: Optional[str] = None, output_format: str = "json",
+                fields: Optional[List[str]] = None, chunk_size: Optional[int] = 0,
+                label_selector: Optional[str] = None, field_selector: Optional[str] = None,
+                cache_ttl: float = KUBECTL_GET_CACHE_TTL) -> Tuple[int, str, str]:
+    """Get Kubernetes resources
+
+    When `fields` (jsonpath-style paths such as "metadata.name") is given, only
+    those fields are requested, one tab-separated row per resource, instead of
+    the full JSON document. Successful results are reused for `cache_ttl`
+    seconds (0 disables) or until kubectl_apply/kubectl_delete/helm changes.
+    """
+    cmd = _kubectl_get_cmd(resource, namespace, output_format, fields,
+                           chunk_size, label_selector, field_selector)
+    key = tuple(cmd)
+    now = time.monotonic()
+    cached = _kubectl_get_cache.get(key)
+    if cached is not None and now - cached[0] < cache_ttl:
+        return cached[1]
+
+    result = None
+    if KUBECTL_USE_PROXY and output_format == "json" and not fields:
+        result = _kubectl_get_via_proxy(resource, namespace, label_selector, field_selector)
+    if result is None:
+        result = run_cli(cmd, 60, 'kubectl', 'brew install kubectl')
+    if result[0] == 0 and cache_ttl > 0:
+        _kubectl_get_cache.pop(key, None)  # Re-insert at the end to keep oldest-first order
+        _kubectl_get_cache[key] = (now, result)
+        if len(_kubectl_get_cache) > KUBECTL_GET_CACHE_MAX_ENTRIES:
+            _prune_kubectl_get_cache(now, cache_ttl)
+    return result
+
+
+def kubectl_get_rows(resource: str, fields: List[str], namespace: Optional[str] = None,
+                     label_selector: Optional[str] = None,
+                     field_selector: Optional[str] = None) -> Tuple[int, List[Dict[str, str]], str]:
+    """Get selected fields of Kubernetes resources as a list of dicts"""
+    code, stdout, stderr = kubectl_get(resource, namespace, fields=fields,
+                                       label_selector=label_selector, field_selector=field_selector)
+    if code != 0:
+        return code, [], stderr
+    return 0, parse_kubectl_rows(stdout, fields), stderr
+
+
+def _kubectl_watch_cmd(resource: str, namespace: Optional[str]) -> List[str]:
+    """Build a kubectl get --watch command emitting JSON watch events"""
+    cmd = ['kubectl', 'get', resource, '--watch', '-o', 'json', '--output-watch-events=true']
+    if namespace:
+        cmd.extend(['-n', namespace])
+    return cmd
+
+
+class _WatchEventDecoder:
+    """Incrementally split kubectl's stream of (pretty-printed) JSON events
+
+    Fed one line at a time. An event can only end on a line whose closing
+    brace sits at column 0, so the buffer is decoded only on those lines and
+    each event is parsed once instead of once per line it spans.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+
+    def feed(self, line: str) -> List[Dict[str, Any]]:
+        self._buffer += line
+        events: List[Dict[str, Any]] = []
+        if line[:1] not in ('{', '}') or not line.rstrip().endswith('}'):
+            return events
+        while True:
+            buffer = self._buffer.lstrip()
+            if not buffer:
+                self._buffer = ""
+                return events
+            try:
+                event, end = self._decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                self._buffer = buffer  # Incomplete object, wait for more
+                return events
+            self._buffer = buffer[end:]
+            events.append(event)
+
+
+def _watch_match(events: List[Dict[str, Any]], predicate: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+    """Return the first watched object satisfying predicate"""
+    for event in events:
+        obj = event.get('object', event) if isinstance(event, dict) else None
+        if isinstance(obj, dict) and predicate(obj):
+            return obj
+    return None
+
+
+def kubectl_watch(resource: str, namespace: Optional[str], predicate: Callable[[Dict[str, Any]], bool],
+                  timeout: float = 600) -> Tuple[int, str, str]:
+    """Wait until a watched resource satisfies predicate
+
+    Runs a single `kubectl get --watch` instead of polling `kubectl get` in a
+    loop. Returns the matching object as JSON, or an error on timeout.
+    """
+    try:
+        proc = subprocess.Popen(_kubectl_watch_cmd(resource, namespace), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True)
     except FileNotFoundError:
         return 1, "", "kubectl not found. Install with: brew install kubectl"
-    except subprocess.TimeoutExpired:
-        return 1, "", "kubectl timeout"
     except Exception as e:
         return 1, "", str(e)
 
+    stdout, stderr = proc.stdout, proc.stderr
+    assert stdout is not None and stderr is not None  # Both opened with PIPE above
 
-def kubectl_apply(file_path: str, namespace: Optional[str] = None) -> Tuple[int, str, str]:
-    """Apply Kubernetes manifest"""
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    decoder = _WatchEventDecoder()
     try:
-        cmd = ['kubectl', 'apply', '-f', file_path]
-        if namespace:
-            cmd.extend(['-n', namespace])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "kubectl not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "kubectl timeout"
+        for line in stdout:
+            match = _watch_match(decoder.feed(line), predicate)
+            if match is not None:
+                return 0, json.dumps(match), ""
+        if not timer.is_alive():
+            return 1, "", "kubectl watch timeout"
+        return proc.wait() or 1, "", stderr.read() or "watch ended without a match"
     except Exception as e:
         return 1, "", str(e)
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        stdout.close()
+        stderr.close()
+
+
+def kubectl_apply(file_path: Union[str, List[str]], namespace: Optional[str] = None) -> Tuple[int, str, str]:
+    """Apply Kubernetes manifest(s)
+
+    A list of manifests is applied by a single kubectl invocation (one -f per
+    file, duplicates dropped), so a bundle pays for one process start and one
+    API discovery instead of one per file.
+    """
+    paths = [file_path] if isinstance(file_path, str) else list(dict.fromkeys(file_path))
+    if not paths:
+        return 1, "", "No manifests to apply"
+    cmd = ['kubectl', 'apply']
+    for path in paths:
+        cmd.extend(['-f', path])
+    if namespace:
+        cmd.extend(['-n', namespace])
+    result = run_cli(cmd, 120, 'kubectl')
+    invalidate_kubectl_cache()
+    return result
 
 
 def kubectl_delete(resource: str, name: str, namespace: Optional[str] = None) -> Tuple[int, str, str]:
     """Delete Kubernetes resource"""
-    try:
-        cmd = ['kubectl', 'delete', resource, name]
-        if namespace:
-            cmd.extend(['-n', namespace])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "kubectl not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "kubectl timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    cmd = ['kubectl', 'delete', resource, name]
+    if namespace:
+        cmd.extend(['-n', namespace])
+    result = run_cli(cmd, 60, 'kubectl')
+    invalidate_kubectl_cache()
+    return result
 
 
 def helm_list(namespace: Optional[str] = None) -> Tuple[int, str, str]:
     """List Helm releases"""
-    try:
-        cmd = ['helm', 'list', '--output', 'json']
-        if namespace:
-            cmd.extend(['-n', namespace])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "helm not found. Install with: brew install helm"
-    except subprocess.TimeoutExpired:
-        return 1, "", "helm timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    cmd = ['helm', 'list', '--output', 'json']
+    if namespace:
+        cmd.extend(['-n', namespace])
+    return run_cli(cmd, 60, 'helm', 'brew install helm')
+
+
+def _helm_release_cmd(action: str, name: str, chart: str, namespace: Optional[str],
+                      values_file: Optional[str]) -> List[str]:
+    """Build a helm install/upgrade command"""
+    cmd = ['helm', action, name, chart]
+    if namespace:
+        cmd.extend(['-n', namespace])
+        if action == 'install':
+            cmd.append('--create-namespace')
+    if values_file:
+        cmd.extend(['-f', values_file])
+    return cmd
 
 
 def helm_install(name: str, chart: str, namespace: Optional[str] = None, values_file: Optional[str] = None) -> Tuple[int, str, str]:
     """Install Helm chart"""
-    try:
-        cmd = ['helm', 'install', name, chart]
-        if namespace:
-            cmd.extend(['-n', namespace, '--create-namespace'])
-        if values_file:
-            cmd.extend(['-f', values_file])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "helm not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "helm timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = run_cli(_helm_release_cmd('install', name, chart, namespace, values_file), 300, 'helm')
+    invalidate_kubectl_cache()
+    return result
 
 
 def helm_upgrade(name: str, chart: str, namespace: Optional[str] = None, values_file: Optional[str] = None) -> Tuple[int, str, str]:
     """Upgrade Helm release"""
-    try:
-        cmd = ['helm', 'upgrade', name, chart]
-        if namespace:
-            cmd.extend(['-n', namespace])
-        if values_file:
-            cmd.extend(['-f', values_file])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "helm not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "helm timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = run_cli(_helm_release_cmd('upgrade', name, chart, namespace, values_file), 300, 'helm')
+    invalidate_kubectl_cache()
+    return result
 
 
 def docker_compose_up(compose_file: Optional[str] = None, services: Optional[List[str]] = None, detach: bool = True) -> Tuple[int, str, str]:
     """Start Docker Compose services"""
-    try:
-        cmd = ['docker-compose']
-        if compose_file:
-            cmd.extend(['-f', compose_file])
-        cmd.append('up')
-        if detach:
-            cmd.append('-d')
-        if services:
-            cmd.extend(services)
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "docker-compose not found. Install with: brew install docker-compose"
-    except subprocess.TimeoutExpired:
-        return 1, "", "docker-compose timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    cmd = ['docker-compose']
+    if compose_file:
+        cmd.extend(['-f', compose_file])
+    cmd.append('up')
+    if detach:
+        cmd.append('-d')
+    if services:
+        cmd.extend(services)
+    return run_cli(cmd, 300, 'docker-compose', 'brew install docker-compose')
 
 
 def docker_compose_down(compose_file: Optional[str] = None) -> Tuple[int, str, str]:
     """Stop Docker Compose services"""
+    cmd = ['docker-compose']
+    if compose_file:
+        cmd.extend(['-f', compose_file])
+    cmd.append('down')
+    return run_cli(cmd, 120, 'docker-compose')
+
+
+def docker_compose_ps(compose_file: Optional[str] = None) -> Tuple[int, str, str]:
+    """List Docker Compose services status"""
+    cmd = ['docker-compose']
+    if compose_file:
+        cmd.extend(['-f', compose_file])
+    cmd.append('ps')
+    return run_cli(cmd, 30, 'docker-compose')
+
+
+async def _run_async(cmd: List[str], timeout: float, tool: str,
+                     install_hint: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async counterpart of cli_utils.run_cli"""
     try:
-        cmd = ['docker-compose']
-        if compose_file:
-            cmd.extend(['-f', compose_file])
-        cmd.append('down')
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        return result.returncode, result.stdout, result.stderr
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
     except FileNotFoundError:
-        return 1, "", "docker-compose not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "docker-compose timeout"
+        if install_hint:
+            return 1, "", f"{tool} not found. Install with: {install_hint}"
+        return 1, "", f"{tool} not found"
     except Exception as e:
         return 1, "", str(e)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return 1, "", f"{tool} timeout"
+    return proc.returncode or 0, out.decode(errors='replace'), err.decode(errors='replace')  # Set once communicate() returns
 
 
-def docker_compose_ps(compose_file: Optional[str] = None) -> Tuple[int, str, str]:
-    """List Docker Compose services status"""
+async def kubectl_get_async(resource: str, namespace: Optional[str] = None, output_format: str = "json",
+                            fields: Optional[List[str]] = None, chunk_size: Optional[int] = 0,
+                            label_selector: Optional[str] = None,
+                            field_selector: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async variant of kubectl_get"""
+    cmd = _kubectl_get_cmd(resource, namespace, output_format, fields,
+                           chunk_size, label_selector, field_selector)
+    return await _run_async(cmd, 60, 'kubectl', 'brew install kubectl')
+
+
+async def kubectl_watch_async(resource: str, namespace: Optional[str],
+                              predicate: Callable[[Dict[str, Any]], bool],
+                              timeout: float = 600) -> Tuple[int, str, str]:
+    """Async variant of kubectl_watch"""
     try:
-        cmd = ['docker-compose']
-        if compose_file:
-            cmd.extend(['-f', compose_file])
-        cmd.append('ps')
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        return result.returncode, result.stdout, result.stderr
+        proc = await asyncio.create_subprocess_exec(
+            *_kubectl_watch_cmd(resource, namespace),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
     except FileNotFoundError:
-        return 1, "", "docker-compose not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "docker-compose timeout"
+        return 1, "", "kubectl not found. Install with: brew install kubectl"
     except Exception as e:
         return 1, "", str(e)
+
+    async def wait_for_match():
+        decoder = _WatchEventDecoder()
+        async for line in proc.stdout:
+            match = _watch_match(decoder.feed(line.decode(errors='replace')), predicate)
+            if match is not None:
+                return 0, json.dumps(match), ""
+        err = await proc.stderr.read()
+        return (await proc.wait()) or 1, "", err.decode(errors='replace') or "watch ended without a match"
+
+    try:
+        return await asyncio.wait_for(wait_for_match(), timeout)
+    except asyncio.TimeoutError:
+        return 1, "", "kubectl watch timeout"
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+async def helm_list_async(namespace: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async variant of helm_list"""
+    cmd = ['helm', 'list', '--output', 'json']
+    if namespace:
+        cmd.extend(['-n', namespace])
+    return await _run_async(cmd, 60, 'helm', 'brew install helm')
+
+
+def set_helm_concurrency(limit: int) -> None:
+    """Set how many async helm install/upgrade operations may run at once"""
+    global _helm_concurrency
+    _helm_concurrency = max(1, limit)
+    _helm_semaphores.clear()
+
+
+def _helm_semaphore() -> asyncio.Semaphore:
+    """Semaphore limiting helm operations on the running event loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _helm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _helm_semaphores[loop] = asyncio.Semaphore(_helm_concurrency)
+    return semaphore
+
+
+async def _helm_release_async(action: str, name: str, chart: str, namespace: Optional[str],
+                              values_file: Optional[str]) -> Tuple[int, str, str]:
+    """Run helm install/upgrade under the concurrency cap, retrying lock conflicts"""
+    cmd = _helm_release_cmd(action, name, chart, namespace, values_file)
+    async with _helm_semaphore():
+        for attempt in range(HELM_RETRY_ATTEMPTS + 1):
+            result = await _run_async(cmd, 300, 'helm', 'brew install helm')
+            if result[0] == 0 or not _HELM_IN_PROGRESS_RE.search(result[2]) or attempt == HELM_RETRY_ATTEMPTS:
+                break
+            await asyncio.sleep(HELM_RETRY_BASE_DELAY * 2 ** attempt + random.random())
+    invalidate_kubectl_cache()
+    return result
+
+
+async def helm_install_async(name: str, chart: str, namespace: Optional[str] = None,
+                             values_file: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async variant of helm_install with bounded concurrency and retry"""
+    return await _helm_release_async('install', name, chart, namespace, values_file)
+
+
+async def helm_upgrade_async(name: str, chart: str, namespace: Optional[str] = None,
+                             values_file: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async variant of helm_upgrade with bounded concurrency and retry"""
+    return await _helm_release_async('upgrade', name, chart, namespace, values_file)
+
+
+async def docker_compose_ps_async(compose_file: Optional[str] = None) -> Tuple[int, str, str]:
+    """Async variant of docker_compose_ps"""
+    cmd = ['docker-compose']
+    if compose_file:
+        cmd.extend(['-f', compose_file])
+    cmd.append('ps')
+    return await _run_async(cmd, 30, 'docker-compose')
+
+
+async def batch(calls: Iterable[Awaitable[Tuple[int, str, str]]],
+                concurrency: int = BATCH_CONCURRENCY) -> List[Tuple[int, str, str]]:
+    """Await independent orchestration calls concurrently, at most `concurrency` at a time
+
+    Results are returned in the order the calls were given.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def limited(call):
+        async with semaphore:
+            return await call
+
+    return list(await asyncio.gather(*(limited(call) for call in calls)))
+
+
+def gather_kubectl(calls: List[Tuple[str, Optional[str]]],
+                   concurrency: int = BATCH_CONCURRENCY) -> List[Tuple[int, str, str]]:
+    """Run several `kubectl get` calls in parallel
+
+    Args:
+        calls: (resource, namespace) pairs, e.g. [("pods", "web"), ("services", "web")]
+        concurrency: Maximum kubectl processes running at once
+
+    Returns:
+        One (returncode, stdout, stderr) tuple per call, in order
+    """
+    return asyncio.run(batch(
+        [kubectl_get_async(resource, namespace) for resource, namespace in calls],
+        concurrency,
+    ))
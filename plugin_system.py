@@ -4,14 +4,21 @@ Allows users to register custom tools and extend functionality
 """
 import inspect
 import logging
+import os
+import sys
 from typing import Dict, Any, Callable, List, Tuple, Optional
 from pathlib import Path
+from types import ModuleType
 import importlib.util
 
 logger = logging.getLogger(__name__)
 
 # Registry for plugins
 _plugin_registry: Dict[str, Dict[str, Any]] = {}
+# name -> func alias of the registry, so execute_tool's hot path is one dict lookup
+_plugin_funcs: Dict[str, Callable] = {}
+# (resolved path, mtime_ns) -> executed plugin module, so reloading unchanged plugins is free
+_module_cache: Dict[Tuple[str, int], ModuleType] = {}
 
 def register_tool(name: str, func: Callable, description: str = "", params: Optional[Dict[str, str]] = None):
     """Register a custom tool
@@ -30,12 +37,15 @@ def register_tool(name: str, func: Callable, description: str = "", params: Opti
     if len(sig.parameters) != 1:
         raise ValueError(f"Tool {name} must accept exactly one parameter (params: Dict[str, Any])")
     
+    name = sys.intern(name)
     _plugin_registry[name] = {
         "func": func,
         "description": description or f"Custom tool: {name}",
         "params": params or {},
-        "type": "custom"
+        "type": "custom",
+        "signature": sig
     }
+    _plugin_funcs[name] = func
     
     logger.info(f"Registered custom tool: {name}")
 
@@ -50,6 +60,7 @@ def unregister_tool(name: str) -> bool:
     """
     if name in _plugin_registry:
         del _plugin_registry[name]
+        _plugin_funcs.pop(name, None)
         logger.info(f"Unregistered tool: {name}")
         return True
     return False
@@ -84,17 +95,25 @@ def load_plugin_from_file(file_path: str) -> bool:
     """
     try:
         file_path_obj = Path(file_path)
-        if not file_path_obj.exists():
+        try:
+            mtime_ns = file_path_obj.stat().st_mtime_ns
+        except FileNotFoundError:
             logger.error(f"Plugin file not found: {file_path}")
             return False
         
-        spec = importlib.util.spec_from_file_location("plugin_module", file_path)
-        if spec is None or spec.loader is None:
-            logger.error(f"Could not load plugin spec from: {file_path}")
-            return False
-        
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        key = (str(file_path_obj.resolve()), mtime_ns)
+        module = _module_cache.get(key)
+        if module is None:
+            spec = importlib.util.spec_from_file_location("plugin_module", file_path)
+            if spec is None or spec.loader is None:
+                logger.error(f"Could not load plugin spec from: {file_path}")
+                return False
+            
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            for stale in [k for k in _module_cache if k[0] == key[0]]:
+                del _module_cache[stale]
+            _module_cache[key] = module
         
         # Look for register_plugin function
         if hasattr(module, 'register_plugin'):
@@ -117,17 +136,19 @@ def load_plugins_from_directory(directory: str) -> int:
     Returns:
         Number of plugins loaded
     """
-    plugin_dir = Path(directory)
-    if not plugin_dir.exists():
+    try:
+        with os.scandir(directory) as entries:
+            plugin_files = [
+                entry.path for entry in entries
+                if entry.name.endswith('.py') and entry.name != '__init__.py' and entry.is_file()
+            ]
+    except (FileNotFoundError, NotADirectoryError):
         logger.warning(f"Plugin directory not found: {directory}")
         return 0
     
     loaded = 0
-    for plugin_file in plugin_dir.glob("*.py"):
-        if plugin_file.name == "__init__.py":
-            continue
-        
-        if load_plugin_from_file(str(plugin_file)):
+    for plugin_file in plugin_files:
+        if load_plugin_from_file(plugin_file):
             loaded += 1
     
     return loaded
@@ -142,12 +163,11 @@ def execute_tool(name: str, params: Dict[str, Any]) -> Tuple[int, str, str]:
     Returns:
         Tuple of (exit_code, stdout, stderr)
     """
-    tool = get_tool(name)
-    if tool is None:
+    func = _plugin_funcs.get(name)
+    if func is None:
         return 1, "", f"Tool '{name}' not found"
     
     try:
-        func = tool["func"]
         return func(params)
     except Exception as e:
         logger.error(f"Error executing tool {name}: {e}")
@@ -8,16 +8,34 @@ import subprocess
 import sys
 import os
 import cProfile
-import pstats
-import io
-from typing import Dict, Any, Tuple, Optional
+import heapq
+import json
+import marshal
+import mmap
+import shutil
+from typing import Dict, Any, Tuple, Optional, List
 from pathlib import Path
 
 
-def profile_python_script(script_path: str, args: Optional[list] = None, output_file: Optional[str] = None) -> Tuple[int, str, str]:
-    """Profile a Python script using cProfile"""
+def profile_python_script(script_path: str, args: Optional[list] = None, output_file: Optional[str] = None,
+                          method: str = "sampling", rate: int = 100) -> Tuple[int, str, str]:
+    """Profile a Python script
+
+    method="sampling" runs the script under `py-spy record` (flame graph SVG,
+    low overhead); method="deterministic" uses cProfile (.stats file). Sampling
+    falls back to cProfile when py-spy is not installed, and an output_file
+    ending in .stats always gets cProfile output so analyze_profile_stats can
+    read it.
+    """
     try:
-        cmd = [sys.executable, '-m', 'cProfile', '-o', output_file or '/tmp/profile.stats', script_path]
+        wants_stats = bool(output_file) and output_file.endswith('.stats')
+        if method == "sampling" and not wants_stats and shutil.which('py-spy'):
+            output_file = output_file or '/tmp/profile.svg'
+            cmd = ['py-spy', 'record', '-o', output_file, '--rate', str(rate), '--',
+                   sys.executable, script_path]
+        else:
+            output_file = output_file or '/tmp/profile.stats'
+            cmd = [sys.executable, '-m', 'cProfile', '-o', output_file, script_path]
         if args:
             cmd.extend(args)
         
@@ -29,18 +47,26 @@ def profile_python_script(script_path: str, args: Optional[list] = None, output_
         return 1, "", str(e)
 
 
+def profile_stats_rows(stats_file: str, top_n: int = 20) -> List[Dict[str, Any]]:
+    """Return the top N functions of a cProfile stats file by cumulative time
+
+    Rows are read straight from pstats' raw dict: primitive calls (cc), total
+    calls (nc), own time (tt) and cumulative time (ct).
+    """
+    with open(stats_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Same marshal'd dict pstats.Stats loads, without buffering a bytes copy first
+        stats = marshal.loads(mm)
+    top = heapq.nlargest(top_n, stats.items(), key=lambda item: item[1][3])
+    return [
+        {"func": f"{filename}:{line}({name})", "cc": cc, "nc": nc, "tt": tt, "ct": ct}
+        for (filename, line, name), (cc, nc, tt, ct, _callers) in top
+    ]
+
+
 def analyze_profile_stats(stats_file: str, top_n: int = 20) -> Tuple[int, str, str]:
-    """Analyze cProfile stats file and return top N functions"""
+    """Analyze cProfile stats file and return top N functions as JSON rows"""
     try:
-        import pstats
-        stats = pstats.Stats(stats_file)
-        
-        # Capture output
-        output = io.StringIO()
-        stats.sort_stats('cumulative')
-        stats.print_stats(top_n, stream=output)
-        
-        return 0, output.getvalue(), ""
+        return 0, json.dumps(profile_stats_rows(stats_file, top_n)), ""
     except Exception as e:
         return 1, "", str(e)
 
@@ -4,15 +4,22 @@ import json
 import sys
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 def generate_report(benchmark_file: Path):
     """Generate human-readable performance report"""
-    with open(benchmark_file) as f:
-        data = json.load(f)
+    if ORJSON_AVAILABLE:
+        data = orjson.loads(benchmark_file.read_bytes())
+    else:
+        with open(benchmark_file) as f:
+            data = json.load(f)
     
-    print("=" * 60)
-    print("Performance Benchmark Report")
-    print("=" * 60)
-    print()
+    rule = "=" * 60
+    lines = [rule, "Performance Benchmark Report", rule, ""]
     
     benchmarks = data.get("benchmarks", [])
     
@@ -23,13 +30,16 @@ def generate_report(benchmark_file: Path):
         min_time = stats.get("min", 0) * 1000
         max_time = stats.get("max", 0) * 1000
         
-        print(f"Benchmark: {name}")
-        print(f"  Mean: {mean:.2f}ms")
-        print(f"  Min: {min_time:.2f}ms")
-        print(f"  Max: {max_time:.2f}ms")
-        print()
+        lines.append(
+            f"Benchmark: {name}\n"
+            f"  Mean: {mean:.2f}ms\n"
+            f"  Min: {min_time:.2f}ms\n"
+            f"  Max: {max_time:.2f}ms\n"
+        )
     
-    print("=" * 60)
+    lines.append(rule)
+    # One write instead of a print() per line
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
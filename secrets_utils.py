@@ -7,64 +7,72 @@ Provides secure secrets management capabilities
 import subprocess
 import json
 import os
+import tempfile
 from typing import Dict, Any, Tuple, Optional
 
+from cli_utils import run_cli
 
-def vault_read(path: str, field: Optional[str] = None) -> Tuple[int, str, str]:
-    """Read secret from Vault"""
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _sops_to_file(cmd: list, output_file: str, timeout: int = 30) -> Tuple[int, str]:
+    """Run sops with stdout going straight to a temp file next to output_file
+
+    The temp file replaces output_file only on success, so a failed run never
+    truncates an existing file (or the input, when both paths are the same).
+    Returns (returncode, stderr).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_file)),
+                                    prefix='.sops-', suffix='.tmp')
     try:
-        cmd = ['vault', 'kv', 'get', '-format=json', path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0 and field:
+        with os.fdopen(fd, 'wb') as f:
+            proc = subprocess.Popen(cmd, stdout=f, stderr=subprocess.PIPE)
             try:
-                data = json.loads(result.stdout)
-                value = data.get('data', {}).get('data', {}).get(field, '')
-                return 0, value, ""
-            except (json.JSONDecodeError, KeyError):
-                pass
-        
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "vault not found. Install with: brew install vault"
-    except subprocess.TimeoutExpired:
-        return 1, "", "vault timeout"
-    except Exception as e:
-        return 1, "", str(e)
+                _, err = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
+        if proc.returncode == 0:
+            os.replace(tmp_path, output_file)
+        return proc.returncode, err.decode(errors='replace')
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def vault_read(path: str, field: Optional[str] = None) -> Tuple[int, str, str]:
+    """Read secret from Vault"""
+    cmd = ['vault', 'kv', 'get', '-format=json', path]
+    returncode, stdout, stderr = run_cli(cmd, 30, 'vault', 'brew install vault')
+    
+    if returncode == 0 and field:
+        try:
+            data = orjson.loads(stdout) if ORJSON_AVAILABLE else json.loads(stdout)
+            value = data.get('data', {}).get('data', {}).get(field, '')
+            return 0, value, ""
+        except (json.JSONDecodeError, KeyError):
+            pass
+    
+    return returncode, stdout, stderr
 
 
 def vault_write(path: str, data: Dict[str, str]) -> Tuple[int, str, str]:
     """Write secret to Vault"""
-    try:
-        # Vault write expects key=value pairs
-        cmd = ['vault', 'kv', 'put', path]
-        for key, value in data.items():
-            cmd.append(f"{key}={value}")
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "vault not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "vault timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    # "-" makes vault read the key/value pairs as JSON from stdin, keeping
+    # secret values out of the process command line
+    cmd = ['vault', 'kv', 'put', path, '-']
+    return run_cli(cmd, 30, 'vault', stdin_text=json.dumps(data))
 
 
 def vault_list(path: str) -> Tuple[int, str, str]:
     """List secrets in Vault path"""
-    try:
-        cmd = ['vault', 'kv', 'list', path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "vault not found"
-    except subprocess.TimeoutExpired:
-        return 1, "", "vault timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    cmd = ['vault', 'kv', 'list', path]
+    return run_cli(cmd, 30, 'vault')
 
 
 def sops_decrypt(file_path: str, output_file: Optional[str] = None) -> Tuple[int, str, str]:
@@ -72,15 +80,11 @@ def sops_decrypt(file_path: str, output_file: Optional[str] = None) -> Tuple[int
     try:
         cmd = ['sops', '-d', file_path]
         if output_file:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                with open(output_file, 'w') as f:
-                    f.write(result.stdout)
+            returncode, stderr = _sops_to_file(cmd, output_file)
+            if returncode == 0:
                 return 0, f"Decrypted to {output_file}", ""
-            return result.returncode, result.stdout, result.stderr
-        else:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            return result.returncode, result.stdout, result.stderr
+            return returncode, "", stderr
+        return run_cli(cmd, 30, 'sops', 'brew install sops')
     except FileNotFoundError:
         return 1, "", "sops not found. Install with: brew install sops"
     except subprocess.TimeoutExpired:
@@ -95,12 +99,10 @@ def sops_encrypt(file_path: str, output_file: Optional[str] = None) -> Tuple[int
         output_file = output_file or file_path + ".enc"
         cmd = ['sops', '-e', file_path]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode == 0:
-            with open(output_file, 'w') as f:
-                f.write(result.stdout)
+        returncode, stderr = _sops_to_file(cmd, output_file)
+        if returncode == 0:
             return 0, f"Encrypted to {output_file}", ""
-        return result.returncode, result.stdout, result.stderr
+        return returncode, "", stderr
     except FileNotFoundError:
         return 1, "", "sops not found"
     except subprocess.TimeoutExpired:
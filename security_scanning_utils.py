@@ -4,121 +4,151 @@ Security Scanning Utilities for NextEleven Terminal Agent
 Provides security vulnerability scanning capabilities
 """
 
-import subprocess
 import json
 import os
-from typing import Dict, Any, Tuple, Optional
+import shutil
+from typing import Dict, Any, Tuple, Optional, List, Callable
 from pathlib import Path
 
+from cli_utils import run_cli
 
-def snyk_test(path: str = ".", severity_threshold: str = "low") -> Tuple[int, str, str]:
-    """Run Snyk security test"""
+# Optional: ijson walks scanner reports without materializing the whole document
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Optional: orjson for faster full parses when ijson is not installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_loads(text: str) -> Any:
+    """Parse JSON with orjson when available (raises a json.JSONDecodeError subclass)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# Scanner name -> resolved executable (None if missing), looked up once per process
+_BIN_CACHE: Dict[str, Optional[str]] = {}
+
+
+def _resolve(name: str) -> Optional[str]:
+    """Find a scanner executable on PATH, memoizing the result"""
+    if name not in _BIN_CACHE:
+        _BIN_CACHE[name] = shutil.which(name)
+    return _BIN_CACHE[name]
+
+
+def _count_json_items(output: str, prefix: str, first_of: Optional[str] = None) -> int:
+    """Count the items of the JSON array at `prefix` (ijson notation, e.g. "results.item")
+
+    With `first_of` set (e.g. "Results.item"), only items under the first element
+    of that array are counted. Raises ValueError on malformed JSON.
+    """
+    if not IJSON_AVAILABLE:
+        data = _json_loads(output)
+        parts = prefix.split('.')
+        try:
+            if first_of:
+                head = first_of.split('.')
+                results = data.get(head[0]) or []
+                data = results[0] if results else {}
+                parts = parts[len(head):]
+            for part in parts[:-1]:
+                data = (data or {}).get(part)
+        except AttributeError as e:
+            raise ValueError(str(e))
+        return len(data or [])
+
+    count = 0
+    seen_first = 0
+    try:
+        for event_prefix, event, _ in ijson.parse(output.encode()):
+            if first_of and event_prefix == first_of and event == 'start_map':
+                seen_first += 1
+                if seen_first > 1:
+                    break
+            elif event_prefix == prefix and event not in ('map_key', 'end_map', 'end_array'):
+                count += 1
+    except ijson.JSONError as e:
+        raise ValueError(str(e))
+    return count
+
+
+def _run_scanner(name: str, args: List[str], timeout: int, install_hint: str) -> Tuple[int, str, str]:
+    """Run a scanner by its resolved path, short-circuiting when it is not installed"""
+    executable = _resolve(name)
+    if not executable:
+        return 1, "", f"{name} not found. Install with: {install_hint}"
+    return run_cli([executable, *args], timeout, name, install_hint)
+
+
+def _with_summary(result: Tuple[int, str, str], summarize: Callable[[str], str]) -> Tuple[int, str, str]:
+    """Prefix scanner output with a one-line summary when the report parses"""
+    returncode, stdout, stderr = result
     try:
-        cmd = ['snyk', 'test', '--severity-threshold', severity_threshold, '--json', path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        # Try to parse JSON output
+        return returncode, summarize(stdout) + "\n" + stdout, stderr
+    except (ValueError, KeyError, IndexError, AttributeError):
+        return result
+
+
+def _trivy_summary(output: str) -> str:
+    vuln_count = _count_json_items(output, 'Results.item.Vulnerabilities.item', first_of='Results.item')
+    return f"Found {vuln_count} vulnerabilities"
+
+
+def _bandit_summary(output: str) -> str:
+    if IJSON_AVAILABLE:
+        # Only the totals block is built, not the per-issue results
         try:
-            data = json.loads(result.stdout)
-            summary = f"Found {len(data.get('vulnerabilities', []))} vulnerabilities"
-            return result.returncode, summary + "\n" + result.stdout, result.stderr
-        except (json.JSONDecodeError, ValueError):
-            return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "snyk not found. Install with: brew install snyk or npm install -g snyk"
-    except subprocess.TimeoutExpired:
-        return 1, "", "snyk timeout"
-    except Exception as e:
-        return 1, "", str(e)
+            totals = next(ijson.items(output.encode(), 'metrics._totals'), {})
+        except ijson.JSONError as e:
+            raise ValueError(str(e))
+    else:
+        totals = _json_loads(output).get('metrics', {}).get('_totals', {})
+    severity = totals.get('SEVERITY', {})
+    total = severity.get('HIGH', 0) + severity.get('MEDIUM', 0) + severity.get('LOW', 0)
+    return f"Found {total} security issues"
+
+
+def snyk_test(path: str = ".", severity_threshold: str = "low") -> Tuple[int, str, str]:
+    """Run Snyk security test"""
+    result = _run_scanner('snyk', ['test', '--severity-threshold', severity_threshold, '--json', path],
+                          300, 'brew install snyk or npm install -g snyk')
+    return _with_summary(
+        result, lambda output: f"Found {_count_json_items(output, 'vulnerabilities.item')} vulnerabilities"
+    )
 
 
 def trivy_scan_image(image: str, severity: str = "UNKNOWN,LOW,MEDIUM,HIGH,CRITICAL") -> Tuple[int, str, str]:
     """Scan container image with Trivy"""
-    try:
-        cmd = ['trivy', 'image', '--severity', severity, '--format', 'json', image]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-        
-        try:
-            data = json.loads(result.stdout)
-            vuln_count = len(data.get('Results', [{}])[0].get('Vulnerabilities', []))
-            summary = f"Found {vuln_count} vulnerabilities"
-            return result.returncode, summary + "\n" + result.stdout, result.stderr
-        except (json.JSONDecodeError, ValueError, IndexError, KeyError):
-            return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "trivy not found. Install with: brew install trivy"
-    except subprocess.TimeoutExpired:
-        return 1, "", "trivy timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = _run_scanner('trivy', ['image', '--severity', severity, '--format', 'json', image],
+                          600, 'brew install trivy')
+    return _with_summary(result, _trivy_summary)
 
 
 def trivy_scan_filesystem(path: str = ".", severity: str = "UNKNOWN,LOW,MEDIUM,HIGH,CRITICAL") -> Tuple[int, str, str]:
     """Scan filesystem with Trivy"""
-    try:
-        cmd = ['trivy', 'filesystem', '--severity', severity, '--format', 'json', path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-        
-        try:
-            data = json.loads(result.stdout)
-            vuln_count = len(data.get('Results', [{}])[0].get('Vulnerabilities', []))
-            summary = f"Found {vuln_count} vulnerabilities"
-            return result.returncode, summary + "\n" + result.stdout, result.stderr
-        except (json.JSONDecodeError, ValueError, IndexError, KeyError):
-            return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "trivy not found. Install with: brew install trivy"
-    except subprocess.TimeoutExpired:
-        return 1, "", "trivy timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = _run_scanner('trivy', ['filesystem', '--severity', severity, '--format', 'json', path],
+                          600, 'brew install trivy')
+    return _with_summary(result, _trivy_summary)
 
 
 def semgrep_scan(path: str = ".", config: str = "auto") -> Tuple[int, str, str]:
     """Run Semgrep security scan"""
-    try:
-        cmd = ['semgrep', '--config', config, '--json', path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        try:
-            data = json.loads(result.stdout)
-            findings_count = len(data.get('results', []))
-            summary = f"Found {findings_count} security findings"
-            return result.returncode, summary + "\n" + result.stdout, result.stderr
-        except (json.JSONDecodeError, ValueError, KeyError):
-            return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "semgrep not found. Install with: brew install semgrep"
-    except subprocess.TimeoutExpired:
-        return 1, "", "semgrep timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = _run_scanner('semgrep', ['--config', config, '--json', path], 300, 'brew install semgrep')
+    return _with_summary(
+        result, lambda output: f"Found {_count_json_items(output, 'results.item')} security findings"
+    )
 
 
 def bandit_scan(path: str = ".", severity_level: int = 1) -> Tuple[int, str, str]:
     """Run Bandit security scan (Python)"""
-    try:
-        cmd = ['bandit', '-r', '-f', 'json', '-ll', str(severity_level), path]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        try:
-            data = json.loads(result.stdout)
-            metrics = data.get('metrics', {})
-            total = metrics.get('_totals', {}).get('SEVERITY', {}).get('HIGH', 0) + \
-                   metrics.get('_totals', {}).get('SEVERITY', {}).get('MEDIUM', 0) + \
-                   metrics.get('_totals', {}).get('SEVERITY', {}).get('LOW', 0)
-            summary = f"Found {total} security issues"
-            return result.returncode, summary + "\n" + result.stdout, result.stderr
-        except (json.JSONDecodeError, ValueError, KeyError):
-            return result.returncode, result.stdout, result.stderr
-    except FileNotFoundError:
-        return 1, "", "bandit not found. Install with: pip install bandit"
-    except subprocess.TimeoutExpired:
-        return 1, "", "bandit timeout"
-    except Exception as e:
-        return 1, "", str(e)
+    result = _run_scanner('bandit', ['-r', '-f', 'json', '-ll', str(severity_level), path],
+                          300, 'pip install bandit')
+    return _with_summary(result, _bandit_summary)
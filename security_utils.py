@@ -4,12 +4,30 @@ Security Utilities for NextEleven Terminal Agent
 Provides safe command execution, input sanitization, and validation
 """
 
+import importlib.util
 import re
 import shlex
 import subprocess
 import sys
+from functools import lru_cache
+from types import ModuleType
 from typing import Tuple, Optional
-from pathlib import Path
+
+# Optional auto-sudo retry. sudo_utils is bound here but, via LazyLoader, only
+# executed on first attribute access, so commands that never need sudo skip it
+sudo_utils: Optional[ModuleType]
+_sudo_spec = importlib.util.find_spec('sudo_utils')
+if 'sudo_utils' in sys.modules:
+    sudo_utils = sys.modules['sudo_utils']
+elif _sudo_spec is not None and _sudo_spec.loader is not None:
+    _sudo_loader = importlib.util.LazyLoader(_sudo_spec.loader)
+    _sudo_spec.loader = _sudo_loader
+    sudo_utils = importlib.util.module_from_spec(_sudo_spec)
+    sys.modules['sudo_utils'] = sudo_utils
+    _sudo_loader.exec_module(sudo_utils)
+else:
+    sudo_utils = None
+SUDO_UTILS_AVAILABLE = sudo_utils is not None
 
 # Dangerous command patterns that require --force flag
 DANGEROUS_PATTERNS = [
@@ -27,6 +45,42 @@ DANGEROUS_PATTERNS = [
     r'\bcurl\s+.*\|\s*sh\b',  # Download and execute
 ]
 
+# Command injection patterns (chained destructive commands)
+INJECTION_PATTERNS = [
+    r';\s*(rm|del|format|mkfs|dd)',
+    r'&&\s*(rm|del|format|mkfs|dd)',
+    r'\|\s*(rm|del|format|mkfs|dd)',
+    r'`.*(rm|del|format|mkfs|dd)',
+    r'\$\(.*(rm|del|format|mkfs|dd)',
+    r'\$\{.*(rm|del|format|mkfs|dd)',
+]
+
+
+def _combine_patterns(patterns):
+    """Fuse patterns into one alternation; group p<i> identifies which one matched"""
+    return re.compile('|'.join(f'(?P<p{i}>{p})' for i, p in enumerate(patterns)), re.IGNORECASE)
+
+
+# One pass over the command per pattern list instead of one search per pattern
+_DANGEROUS_RE = _combine_patterns(DANGEROUS_PATTERNS)
+_INJECTION_RE = _combine_patterns(INJECTION_PATTERNS)
+_INJECTION_CHARS = frozenset(';&|`$')
+_SHELL_OPERATOR_RE = re.compile(r'[|&;<>]')
+
+# stderr fragments (lowercase) suggesting a failed command may succeed with sudo.
+# Built once into _PERMISSION_RE below; nothing iterates it per call
+PERMISSION_INDICATORS = frozenset({
+    'permission denied',
+    'operation not permitted',
+    'access denied',
+    'cannot open',
+    'read-only file system',
+    'eacces',
+    'eperm',
+})
+# One linear, case-insensitive pass over the raw stderr (no lowercased copy)
+_PERMISSION_RE = re.compile('|'.join(map(re.escape, sorted(PERMISSION_INDICATORS))), re.IGNORECASE)
+
 # Allowed command whitelist (optional, can be disabled)
 # If enabled, only these commands can be executed
 ALLOWED_COMMANDS_WHITELIST = None  # Set to list of commands to enable whitelist mode
@@ -34,6 +88,9 @@ ALLOWED_COMMANDS_WHITELIST = None  # Set to list of commands to enable whitelist
 # Maximum command length to prevent buffer overflow attacks
 MAX_COMMAND_LENGTH = 10000
 
+# str.translate table deleting control characters (including NUL) but keeping \t, \n, \r
+_CONTROL_CHAR_TABLE = dict.fromkeys(c for c in range(32) if chr(c) not in '\t\n\r')
+
 
 class SecurityError(Exception):
     """Raised when a security validation fails"""
@@ -60,12 +117,8 @@ def sanitize_input(text: str, max_length: int = MAX_COMMAND_LENGTH) -> str:
     if len(text) > max_length:
         raise SecurityError(f"Input too long (max {max_length} characters)")
     
-    # Remove null bytes
-    text = text.replace('\x00', '')
-    
-    # Remove control characters except newline, tab, carriage return
-    # Preserve whitespace characters: \n (newline), \t (tab), \r (carriage return)
-    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t\r')
+    # Remove null bytes and control characters except newline, tab, carriage return
+    text = text.translate(_CONTROL_CHAR_TABLE)
     
     # Don't strip if we want to preserve newlines/tabs at the end
     # But still trim leading/trailing spaces (not newlines/tabs)
@@ -75,8 +128,12 @@ def sanitize_input(text: str, max_length: int = MAX_COMMAND_LENGTH) -> str:
     return text
 
 
+@lru_cache(maxsize=1)
 def is_creator_verified() -> bool:
-    """Check if creator identity is verified"""
+    """Check if creator identity is verified
+
+    Cached for the process lifetime; a restart is needed to pick up a change.
+    """
     try:
         from identity_verify import is_creator_verified as check_creator
         return check_creator()
@@ -96,60 +153,41 @@ def validate_command_structure(cmd: str, allow_force: bool = False) -> Tuple[boo
         Tuple of (is_valid, error_message)
     """
     # Creator override: Verified creator can bypass all restrictions
-    creator_verified = is_creator_verified()
+    # (including empty and over-long commands)
+    if is_creator_verified():
+        return True, None
     
     if not cmd or not cmd.strip():
-        if creator_verified:
-            return True, None  # Creator can execute empty commands if needed
         return False, "Empty command not allowed"
     
     # Check length
     if len(cmd) > MAX_COMMAND_LENGTH:
-        if creator_verified:
-            return True, None  # Creator override
         return False, f"Command too long (max {MAX_COMMAND_LENGTH} characters)"
     
-    cmd_lower = cmd.lower()
-    
-    # Check for dangerous patterns
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, cmd_lower):
-            if creator_verified:
-                return True, None  # Creator override - all restrictions bypassed
-            if not allow_force:
-                return False, f"Dangerous command pattern detected: {pattern}"
-            # Even with --force, we still block system-destructive commands
-            # Block commands that target root or system directories
-            if re.search(r'\s+/(?:\s|$)', cmd_lower) or cmd_lower.strip() == '/':
-                if creator_verified:
-                    return True, None  # Creator override
-                return False, "System-destructive commands are not allowed even with --force"
-            # Even with --force, log the dangerous command
-            # (could add audit logging here)
+    # Check for dangerous patterns (case-insensitive, no lowered copy of cmd needed)
+    match = _DANGEROUS_RE.search(cmd)
+    if match:
+        if not allow_force:
+            pattern = DANGEROUS_PATTERNS[int(match.lastgroup[1:])]
+            return False, f"Dangerous command pattern detected: {pattern}"
+        # Even with --force, we still block system-destructive commands
+        # Block commands that target root or system directories ("/" as a whole word)
+        if '/' in cmd.split():
+            return False, "System-destructive commands are not allowed even with --force"
+        # Even with --force, log the dangerous command
+        # (could add audit logging here)
     
-    # Check for command injection attempts
-    injection_patterns = [
-        r';\s*(rm|del|format|mkfs|dd)',
-        r'&&\s*(rm|del|format|mkfs|dd)',
-        r'\|\s*(rm|del|format|mkfs|dd)',
-        r'`.*(rm|del|format|mkfs|dd)',
-        r'\$\(.*(rm|del|format|mkfs|dd)',
-        r'\$\{.*(rm|del|format|mkfs|dd)',
-    ]
-    
-    for pattern in injection_patterns:
-        if re.search(pattern, cmd_lower):
-            if creator_verified:
-                return True, None  # Creator override
-            return False, f"Command injection pattern detected: {pattern}"
+    # Check for command injection attempts (every pattern needs one of these characters)
+    match = None if _INJECTION_CHARS.isdisjoint(cmd) else _INJECTION_RE.search(cmd)
+    if match:
+        pattern = INJECTION_PATTERNS[int(match.lastgroup[1:])]
+        return False, f"Command injection pattern detected: {pattern}"
     
     # Check for whitelist if enabled
     if ALLOWED_COMMANDS_WHITELIST is not None:
-        # Extract first command
-        first_word = cmd.split()[0] if cmd.split() else ""
+        # Extract first command (cmd is known to be non-blank here)
+        first_word = cmd.split(None, 1)[0]
         if first_word not in ALLOWED_COMMANDS_WHITELIST:
-            if creator_verified:
-                return True, None  # Creator override
             return False, f"Command not in whitelist: {first_word}"
     
     return True, None
@@ -165,16 +203,31 @@ def sanitize_command(cmd: str) -> str:
     Returns:
         Sanitized command string
     """
-    # First sanitize input
-    cmd = sanitize_input(cmd)
-    
-    # Remove any embedded null bytes
-    cmd = cmd.replace('\x00', '')
-    
-    # Trim whitespace
-    cmd = cmd.strip()
-    
-    return cmd
+    # sanitize_input already dropped NUL/control characters and edge spaces;
+    # strip() additionally trims edge newlines/tabs, which commands never need
+    return sanitize_input(cmd).strip()
+
+
+@lru_cache(maxsize=256)
+def _split_cached(cmd: str) -> Tuple[str, ...]:
+    """shlex.split memoized for the short commands a session keeps repeating"""
+    return tuple(shlex.split(cmd))
+
+
+def has_permission_error(stderr: str) -> bool:
+    """Check whether stderr contains any of PERMISSION_INDICATORS (case-insensitive)"""
+    return _PERMISSION_RE.search(stderr) is not None
+
+
+def _maybe_sudo_retry(cmd: str, result: subprocess.CompletedProcess, allow_force: bool,
+                      timeout: int) -> subprocess.CompletedProcess:
+    """Re-run a command with sudo if it failed on permissions, else return result"""
+    if (not SUDO_UTILS_AVAILABLE or sudo_utils is None or result.returncode == 0
+            or not has_permission_error(result.stderr)):
+        return result
+    retried: subprocess.CompletedProcess = sudo_utils.execute_with_auto_sudo(
+        cmd, allow_force=allow_force, timeout=timeout, auto_sudo=True)
+    return retried
 
 
 def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 60, auto_sudo: bool = True) -> subprocess.CompletedProcess:
@@ -209,7 +262,7 @@ def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 6
     # For simple commands (no pipes/redirects), use shell=False for maximum safety
     # For complex commands, we need shell=True but with validation already done
     
-    has_shell_operators = bool(re.search(r'[|&;<>]', cmd))
+    has_shell_operators = _SHELL_OPERATOR_RE.search(cmd) is not None
     
     if has_shell_operators:
         # Complex command with pipes/redirects - use shell=True but we've validated it
@@ -224,29 +277,10 @@ def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 6
                 capture_output=True,
                 text=True,
                 timeout=timeout,
-                cwd=Path.cwd(),  # Execute in current directory
             )
             # Step 4: Auto-sudo if needed (for accessibility)
-            if auto_sudo and result.returncode != 0:
-                stderr_lower = result.stderr.lower()
-                permission_indicators = [
-                    'permission denied',
-                    'operation not permitted',
-                    'access denied',
-                    'cannot open',
-                    'read-only file system',
-                    'eacces',
-                    'eperm'
-                ]
-                needs_sudo = any(indicator in stderr_lower for indicator in permission_indicators)
-                
-                if needs_sudo:
-                    try:
-                        from sudo_utils import execute_with_auto_sudo
-                        return execute_with_auto_sudo(cmd, allow_force=allow_force, timeout=timeout, auto_sudo=True)
-                    except ImportError:
-                        pass  # sudo_utils not available
-            
+            if auto_sudo:
+                return _maybe_sudo_retry(cmd, result, allow_force, timeout)
             return result
         except subprocess.TimeoutExpired as e:
             raise
@@ -255,7 +289,7 @@ def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 6
     else:
         # Simple command - split and execute with shell=False (safer)
         try:
-            args = shlex.split(cmd)
+            args = list(_split_cached(cmd))
             if not args:
                 raise SecurityError("Empty command after parsing")
             
@@ -265,29 +299,10 @@ def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 6
                 capture_output=True,
                 text=True,
                 timeout=timeout,
-                cwd=Path.cwd(),
             )
             # Step 4: Auto-sudo if needed (for accessibility)
-            if auto_sudo and result.returncode != 0:
-                stderr_lower = result.stderr.lower()
-                permission_indicators = [
-                    'permission denied',
-                    'operation not permitted',
-                    'access denied',
-                    'cannot open',
-                    'read-only file system',
-                    'eacces',
-                    'eperm'
-                ]
-                needs_sudo = any(indicator in stderr_lower for indicator in permission_indicators)
-                
-                if needs_sudo:
-                    try:
-                        from sudo_utils import execute_with_auto_sudo
-                        return execute_with_auto_sudo(cmd, allow_force=allow_force, timeout=timeout, auto_sudo=True)
-                    except ImportError:
-                        pass  # sudo_utils not available
-            
+            if auto_sudo:
+                return _maybe_sudo_retry(cmd, result, allow_force, timeout)
             return result
         except FileNotFoundError as e:
             # Command not found - this is not a security error, just a runtime error
@@ -308,29 +323,10 @@ def execute_command_safely(cmd: str, allow_force: bool = False, timeout: int = 6
                 capture_output=True,
                 text=True,
                 timeout=timeout,
-                cwd=Path.cwd(),
             )
             # Step 4: Auto-sudo if needed (for accessibility)
-            if auto_sudo and result.returncode != 0:
-                stderr_lower = result.stderr.lower()
-                permission_indicators = [
-                    'permission denied',
-                    'operation not permitted',
-                    'access denied',
-                    'cannot open',
-                    'read-only file system',
-                    'eacces',
-                    'eperm'
-                ]
-                needs_sudo = any(indicator in stderr_lower for indicator in permission_indicators)
-                
-                if needs_sudo:
-                    try:
-                        from sudo_utils import execute_with_auto_sudo
-                        return execute_with_auto_sudo(cmd, allow_force=allow_force, timeout=timeout, auto_sudo=True)
-                    except ImportError:
-                        pass  # sudo_utils not available
-            
+            if auto_sudo:
+                return _maybe_sudo_retry(cmd, result, allow_force, timeout)
             return result
         except subprocess.TimeoutExpired as e:
             raise
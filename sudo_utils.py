@@ -4,14 +4,35 @@ Sudo Utilities for Automatic Sudo Access
 Provides seamless sudo access for accessibility needs
 """
 
+import atexit
 import subprocess
 import os
+import re
 import sys
+import tempfile
 from typing import Optional, Tuple
 import getpass
 
+# sudo's replies to a rejected password
+_SUDO_REJECTED_RE = re.compile(r'sorry|incorrect password|try again', re.IGNORECASE)
+
+# SUDO_ASKPASS helper, written once per process on first sudo retry
+_askpass_path: Optional[str] = None
+
+# Keychain password fetched once per session; cleared on rejection and at exit
+_cached_sudo_password: Optional[str] = None
+
+def _clear_cached_sudo_password() -> None:
+    global _cached_sudo_password
+    _cached_sudo_password = None
+
+atexit.register(_clear_cached_sudo_password)
+
 def get_sudo_password_from_keychain() -> Optional[str]:
-    """Retrieve sudo password from macOS Keychain"""
+    """Retrieve sudo password from macOS Keychain (cached for the session)"""
+    global _cached_sudo_password
+    if _cached_sudo_password is not None:
+        return _cached_sudo_password
     try:
         result = subprocess.run(
             ['security', 'find-generic-password', '-s', 'grok-terminal', '-a', 'sudo-password', '-w'],
@@ -19,7 +40,8 @@ def get_sudo_password_from_keychain() -> Optional[str]:
             text=True,
             check=True
         )
-        return result.stdout.strip()
+        _cached_sudo_password = result.stdout.strip() or None
+        return _cached_sudo_password
     except subprocess.CalledProcessError:
         return None
 
@@ -61,23 +83,44 @@ def check_if_sudo_needed(command: str, result: subprocess.CompletedProcess) -> b
     if result.returncode == 0:
         return False
     
-    # Check stderr for permission errors
-    stderr_lower = result.stderr.lower()
-    permission_indicators = [
-        'permission denied',
-        'operation not permitted',
-        'access denied',
-        'cannot open',
-        'read-only file system',
-        'eacces',
-        'eperm'
-    ]
+    from security_utils import has_permission_error
     
-    for indicator in permission_indicators:
-        if indicator in stderr_lower:
-            return True
+    # Check stderr for permission errors
+    return has_permission_error(result.stderr)
+
+def _remove_askpass(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+def _askpass_helper() -> str:
+    """Return the path of a SUDO_ASKPASS script that prints $SUDO_PASS"""
+    global _askpass_path
+    if _askpass_path is None:
+        fd, path = tempfile.mkstemp(prefix='grok-askpass-', suffix='.sh')
+        with os.fdopen(fd, 'w') as f:
+            f.write('#!/bin/sh\nprintf \'%s\\n\' "$SUDO_PASS"\n')
+        os.chmod(path, 0o700)
+        atexit.register(_remove_askpass, path)
+        _askpass_path = path
+    return _askpass_path
+
+def _run_with_sudo(cmd: str, password: str, timeout: int) -> subprocess.CompletedProcess:
+    """Run cmd under sudo, answering the password prompt through SUDO_ASKPASS
     
-    return False
+    sudo -A asks the helper instead of reading stdin, so no stdin feeder is
+    needed and no TTY is required. sudo's env_reset keeps SUDO_PASS out of
+    the environment of the command itself, which runs via sh -c.
+    """
+    env = dict(os.environ, SUDO_ASKPASS=_askpass_helper(), SUDO_PASS=password)
+    return subprocess.run(
+        ['sudo', '-A', '/bin/sh', '-c', cmd],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
 
 def execute_with_auto_sudo(cmd: str, allow_force: bool = False, timeout: int = 60, auto_sudo: bool = True) -> subprocess.CompletedProcess:
     """
@@ -115,25 +158,8 @@ def execute_with_auto_sudo(cmd: str, allow_force: bool = False, timeout: int = 6
                     return result  # Return original failure
             
             # Retry with sudo
-            sudo_cmd = f"sudo -S {cmd}"
             try:
-                proc = subprocess.Popen(
-                    sudo_cmd,
-                    shell=True,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=timeout
-                )
-                stdout, stderr = proc.communicate(input=f"{sudo_password}\n", timeout=timeout)
-                
-                result = subprocess.CompletedProcess(
-                    args=sudo_cmd.split(),
-                    returncode=proc.returncode,
-                    stdout=stdout,
-                    stderr=stderr
-                )
+                result = _run_with_sudo(cmd, sudo_password, timeout)
                 
                 # If sudo worked, return the result
                 if result.returncode == 0:
@@ -141,32 +167,17 @@ def execute_with_auto_sudo(cmd: str, allow_force: bool = False, timeout: int = 6
                 else:
                     # Sudo might have failed (wrong password, etc.)
                     # Check if password is wrong
-                    if 'sorry' in stderr.lower() or 'incorrect password' in stderr.lower() or 'try again' in stderr.lower():
+                    if _SUDO_REJECTED_RE.search(result.stderr):
                         # Password might be wrong, prompt again
+                        _clear_cached_sudo_password()
                         print("⚠️  Password incorrect. Please re-enter:")
                         new_password = prompt_for_sudo_password()
                         if new_password:
                             # Retry once more
-                            proc = subprocess.Popen(
-                                sudo_cmd,
-                                shell=True,
-                                stdin=subprocess.PIPE,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True,
-                                timeout=timeout
-                            )
-                            stdout, stderr = proc.communicate(input=f"{new_password}\n", timeout=timeout)
-                            return subprocess.CompletedProcess(
-                                args=sudo_cmd.split(),
-                                returncode=proc.returncode,
-                                stdout=stdout,
-                                stderr=stderr
-                            )
+                            return _run_with_sudo(cmd, new_password, timeout)
                     
                     return result
             except subprocess.TimeoutExpired:
-                proc.kill()
                 raise
             except Exception as e:
                 # If sudo execution fails, return original result
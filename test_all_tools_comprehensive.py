@@ -9,154 +9,212 @@ import shutil
 import sys
 import os
 import json
+import time
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
+# Exit codes of earlier `tool --version` runs, keyed by resolved path + args and
+# reused while the binary's mtime is unchanged (pass --no-cache to ignore)
+VERSION_CACHE_FILE = Path.home() / ".cache" / "grok_tool_test" / "versions.json"
+VERSION_CACHE_TTL = 24 * 60 * 60
+
+# (tool, args, category, expected exit code (-1 = any), brew formula to try if missing)
+TOOL_PROBES = [
+    ("fzf", ["--version"], "Essential", -1, "fzf"),
+    ("tree", ["--version"], "Essential", -1, "tree"),
+    ("jq", ["--version"], "Essential", -1, "jq"),
+    ("git", ["--version"], "Essential", -1, None),
+    ("python3", ["--version"], "Essential", -1, None),
+    ("pip3", ["--version"], "Essential", -1, None),
+    ("wget", ["--version"], "Essential", -1, "wget"),
+    ("rg", ["--version"], "Enhanced", -1, "ripgrep"),
+    ("bat", ["--version"], "Enhanced", -1, "bat"),
+    ("fd", ["--version"], "Enhanced", -1, "fd"),
+    ("htop", ["--version"], "Enhanced", -1, "htop"),
+    ("xcodebuild", ["-version"], "Xcode", -1, None),
+    ("xcrun", ["--version"], "Xcode", -1, None),
+    ("swift", ["--version"], "Xcode", -1, None),
+    ("pod", ["--version"], "Xcode", -1, "cocoapods"),
+    ("gh", ["--version"], "Development", -1, "gh"),
+    ("git-lfs", ["version"], "Development", -1, "git-lfs"),
+    ("node", ["--version"], "Development", -1, "node"),
+    ("npm", ["--version"], "Development", -1, "npm"),
+    ("docker", ["--version"], "Development", -1, "docker"),
+    ("make", ["--version"], "Build", -1, None),
+    ("cmake", ["--version"], "Build", -1, "cmake"),
+    ("curl", ["--version"], "System", -1, None),
+    ("tar", ["--version"], "System", -1, None),
+    ("gzip", ["--version"], "System", -1, None),
+]
+
+# Tool name -> resolved path (None if missing), looked up once per run
+_WHICH_CACHE: Dict[str, Optional[str]] = {}
+
+
+def _which(tool: str) -> Optional[str]:
+    """shutil.which, memoized; install_missing_tool drops a tool's entry after installing it"""
+    if tool not in _WHICH_CACHE:
+        _WHICH_CACHE[tool] = shutil.which(tool)
+    return _WHICH_CACHE[tool]
+
+
+def _scan_dir(path: str) -> Dict[str, os.DirEntry]:
+    """Entries of a directory by name ({} if it cannot be read)"""
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name: entry for entry in entries}
+    except OSError:
+        return {}
+
+
 class ToolTester:
-    def __init__(self):
+    _grok_agent = None  # grok_agent module, imported on first use
+    
+    def __init__(self, use_cache: bool = True):
         self.results = {
             "passed": [],
             "failed": [],
             "warnings": [],
             "fixed": []
         }
+        self._results_lock = threading.Lock()
+        self._pending_installs: List[Tuple[str, str]] = []
         self.test_dir = Path("/tmp/grok_tool_test")
         self.test_dir.mkdir(exist_ok=True)
+        self.use_cache = use_cache
+        self.version_cache = self._load_version_cache() if use_cache else {}
+    
+    def _load_version_cache(self) -> Dict[str, Dict]:
+        try:
+            with open(VERSION_CACHE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_version_cache(self):
+        """Write the version cache atomically (no-op with --no-cache)"""
+        if not self.use_cache:
+            return
+        try:
+            VERSION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = VERSION_CACHE_FILE.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(self.version_cache))
+            os.replace(tmp_file, VERSION_CACHE_FILE)
+        except OSError:
+            pass
+    
+    def _version_cache_key(self, tool: str, args: List[str]) -> Optional[Tuple[str, int]]:
+        """(cache key, binary mtime) for a resolvable tool, else None"""
+        path = _which(tool)
+        if not path:
+            return None
+        try:
+            return f"{path} {' '.join(args)}", os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _record(self, kind: str, entry: tuple):
+        """Append to self.results; tool probes run on worker threads"""
+        with self._results_lock:
+            self.results[kind].append(entry)
     
     def test_tool_presence(self, tool: str, category: str) -> bool:
         """Test if tool is present in PATH"""
-        path = shutil.which(tool)
+        path = _which(tool)
         if path:
-            self.results["passed"].append((category, tool, f"Found at {path}"))
+            self._record("passed", (category, tool, f"Found at {path}"))
             return True
         else:
-            self.results["failed"].append((category, tool, "Not found in PATH"))
+            self._record("failed", (category, tool, "Not found in PATH"))
             return False
     
     def test_tool_execution(self, tool: str, args: List[str], category: str, expected_code: int = 0) -> bool:
         """Test if tool can execute"""
         try:
-            result = subprocess.run(
-                [tool] + args,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode == expected_code or expected_code == -1:
-                self.results["passed"].append((category, tool, f"Executed successfully"))
+            cache_key = self._version_cache_key(tool, args) if self.use_cache else None
+            entry = self.version_cache.get(cache_key[0]) if cache_key else None
+            if (entry and entry["mtime_ns"] == cache_key[1]
+                    and time.time() - entry["checked_at"] < VERSION_CACHE_TTL):
+                returncode = entry["returncode"]
+            else:
+                # Only the exit code matters, so the output is never piped or decoded
+                result = subprocess.run(
+                    [tool] + args,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=10
+                )
+                returncode = result.returncode
+                if cache_key:
+                    with self._results_lock:
+                        self.version_cache[cache_key[0]] = {
+                            "mtime_ns": cache_key[1], "checked_at": time.time(), "returncode": returncode
+                        }
+            if returncode == expected_code or expected_code == -1:
+                self._record("passed", (category, tool, f"Executed successfully"))
                 return True
             else:
-                self.results["warnings"].append((category, tool, f"Exit code {result.returncode}, expected {expected_code}"))
+                self._record("warnings", (category, tool, f"Exit code {returncode}, expected {expected_code}"))
                 return True  # Still counts as available
         except subprocess.TimeoutExpired:
-            self.results["failed"].append((category, tool, "Execution timed out"))
+            self._record("failed", (category, tool, "Execution timed out"))
             return False
         except FileNotFoundError:
-            self.results["failed"].append((category, tool, "Tool not found"))
+            self._record("failed", (category, tool, "Tool not found"))
             return False
         except Exception as e:
-            self.results["failed"].append((category, tool, f"Error: {str(e)}"))
+            self._record("failed", (category, tool, f"Error: {str(e)}"))
             return False
     
     def test_python_package(self, package: str, category: str) -> bool:
-        """Test if Python package is importable"""
+        """Test if Python package is importable (found on sys.path; not imported)"""
         try:
-            __import__(package)
-            self.results["passed"].append((category, package, "Importable"))
+            # find_spec locates the package without running its top-level code;
+            # only a miss is double-checked with a real import
+            if importlib.util.find_spec(package) is None:
+                __import__(package)
+            self._record("passed", (category, package, "Importable"))
             return True
         except ImportError:
-            self.results["failed"].append((category, package, "Cannot import"))
+            self._record("failed", (category, package, "Cannot import"))
             return False
         except Exception as e:
-            self.results["warnings"].append((category, package, f"Import warning: {str(e)}"))
+            self._record("warnings", (category, package, f"Import warning: {str(e)}"))
             return True
     
-    def install_missing_tool(self, tool: str, formula: Optional[str] = None) -> bool:
-        """Attempt to install missing tool via Homebrew"""
-        if not shutil.which("brew"):
-            return False
+    def install_missing_tool(self, tool: str, formula: Optional[str] = None):
+        """Queue a missing tool for the batched brew install in install_pending_tools"""
+        self._pending_installs.append((tool, formula or tool))
+    
+    def install_pending_tools(self) -> List[str]:
+        """Install every queued formula with a single brew run; returns the tools now on PATH"""
+        pending, self._pending_installs = self._pending_installs, []
+        if not pending or not _which("brew"):
+            return []
         
-        formula = formula or tool
+        # One brew process shares its Ruby startup and formula index load across formulas
+        formulas = list(dict.fromkeys(formula for _, formula in pending))
         try:
-            result = subprocess.run(
-                ["brew", "install", formula],
+            subprocess.run(
+                ["brew", "install", *formulas],
                 capture_output=True,
                 text=True,
-                timeout=300  # 5 minute timeout
+                timeout=300 * len(formulas)  # 5 minutes per formula
             )
-            if result.returncode == 0:
-                if shutil.which(tool):
-                    self.results["fixed"].append((tool, f"Installed via brew install {formula}"))
-                    return True
         except Exception:
-            pass
-        return False
-    
-    def test_essential_tools(self):
-        """Test essential tools"""
-        print("📦 Testing Essential Tools...")
-        tools = [
-            ("fzf", ["--version"], -1),  # Exit code may vary
-            ("tree", ["--version"], -1),
-            ("jq", ["--version"], -1),
-            ("git", ["--version"], -1),
-            ("python3", ["--version"], -1),
-            ("pip3", ["--version"], -1),
-            ("wget", ["--version"], -1),
-        ]
+            return []
         
-        for tool, args, expected in tools:
-            if not self.test_tool_presence(tool, "Essential"):
-                # Try to install
-                if tool in ["fzf", "tree", "jq", "wget"]:
-                    self.install_missing_tool(tool)
-                    if shutil.which(tool):
-                        self.test_tool_execution(tool, args, "Essential", expected)
-            else:
-                self.test_tool_execution(tool, args, "Essential", expected)
-        print()
-    
-    def test_enhanced_tools(self):
-        """Test enhanced productivity tools"""
-        print("⚡ Testing Enhanced Tools...")
-        tools = [
-            ("rg", ["--version"], -1),
-            ("bat", ["--version"], -1),
-            ("fd", ["--version"], -1),
-            ("htop", ["--version"], -1),
-        ]
-        
-        for tool, args, expected in tools:
-            if not self.test_tool_presence(tool, "Enhanced"):
-                # Try to install
-                formula_map = {"rg": "ripgrep", "bat": "bat", "fd": "fd", "htop": "htop"}
-                formula = formula_map.get(tool, tool)
-                self.install_missing_tool(tool, formula)
-                if shutil.which(tool):
-                    self.test_tool_execution(tool, args, "Enhanced", expected)
-            else:
-                self.test_tool_execution(tool, args, "Enhanced", expected)
-        print()
-    
-    def test_xcode_tools(self):
-        """Test Xcode development tools"""
-        print("📱 Testing Xcode Tools...")
-        tools = [
-            ("xcodebuild", ["-version"], -1),
-            ("xcrun", ["--version"], -1),
-            ("swift", ["--version"], -1),
-            ("pod", ["--version"], -1),
-        ]
-        
-        for tool, args, expected in tools:
-            if self.test_tool_presence(tool, "Xcode"):
-                self.test_tool_execution(tool, args, "Xcode", expected)
-            elif tool == "pod":
-                # Try to install CocoaPods
-                self.install_missing_tool("pod", "cocoapods")
-                if shutil.which(tool):
-                    self.test_tool_execution(tool, args, "Xcode", expected)
-        print()
+        # brew keeps going past a failed formula, so check each tool rather than the exit code
+        installed = []
+        for tool, formula in pending:
+            _WHICH_CACHE.pop(tool, None)
+            if _which(tool):
+                self._record("fixed", (tool, f"Installed via brew install {formula}"))
+                installed.append(tool)
+        return installed
     
     def test_android_tools(self):
         """Test Android development tools"""
@@ -165,70 +223,58 @@ class ToolTester:
         # Check ANDROID_HOME
         android_home = os.environ.get("ANDROID_HOME") or os.environ.get("ANDROID_SDK_ROOT")
         if android_home and os.path.exists(android_home):
-            self.results["passed"].append(("Android", "ANDROID_HOME", f"Set to {android_home}"))
+            self._record("passed", ("Android", "ANDROID_HOME", f"Set to {android_home}"))
+            
+            # One directory read per SDK folder covers every binary probed in it
+            platform_tools = _scan_dir(os.path.join(android_home, "platform-tools"))
+            emulator_dir = _scan_dir(os.path.join(android_home, "emulator"))
             
             # Test ADB
-            adb_path = os.path.join(android_home, "platform-tools", "adb")
-            if os.path.exists(adb_path):
+            if "adb" in platform_tools:
+                adb_path = platform_tools["adb"].path
                 if self.test_tool_execution(adb_path, ["version"], "Android", -1):
-                    self.results["passed"].append(("Android", "adb", f"Available at {adb_path}"))
+                    self._record("passed", ("Android", "adb", f"Available at {adb_path}"))
             
             # Test emulator
-            emulator_path = os.path.join(android_home, "emulator", "emulator")
-            if os.path.exists(emulator_path):
-                self.results["passed"].append(("Android", "emulator", f"Available at {emulator_path}"))
+            if "emulator" in emulator_dir:
+                emulator_path = emulator_dir["emulator"].path
+                self._record("passed", ("Android", "emulator", f"Available at {emulator_path}"))
         else:
-            self.results["warnings"].append(("Android", "ANDROID_HOME", "Not set (Android tools may not be accessible)"))
+            self._record("warnings", ("Android", "ANDROID_HOME", "Not set (Android tools may not be accessible)"))
         
         # Also check if in PATH
-        if shutil.which("adb"):
+        if _which("adb"):
             self.test_tool_execution("adb", ["version"], "Android", -1)
-        if shutil.which("emulator"):
+        if _which("emulator"):
             self.test_tool_execution("emulator", ["-version"], "Android", -1)
         print()
     
-    def test_development_tools(self):
-        """Test development tools"""
-        print("🔧 Testing Development Tools...")
-        tools = [
-            ("gh", ["--version"], -1),
-            ("git-lfs", ["version"], -1),
-            ("node", ["--version"], -1),
-            ("npm", ["--version"], -1),
-            ("docker", ["--version"], -1),
-        ]
-        
-        for tool, args, expected in tools:
-            if self.test_tool_presence(tool, "Development"):
-                self.test_tool_execution(tool, args, "Development", expected)
-            elif tool in ["gh", "git-lfs", "node", "npm", "docker"]:
-                # Try to install
-                formula_map = {
-                    "gh": "gh",
-                    "git-lfs": "git-lfs",
-                    "node": "node",
-                    "docker": "docker"
-                }
-                formula = formula_map.get(tool, tool)
-                if self.install_missing_tool(tool, formula):
-                    self.test_tool_execution(tool, args, "Development", expected)
-        print()
+    def probe_tool(self, tool: str, args: List[str], category: str, expected_code: int) -> bool:
+        """Check a tool is on PATH and runs; returns False if it is missing"""
+        if not self.test_tool_presence(tool, category):
+            return False
+        self.test_tool_execution(tool, args, category, expected_code)
+        return True
     
-    def test_build_tools(self):
-        """Test build tools"""
-        print("🏗️  Testing Build Tools...")
-        tools = [
-            ("make", ["--version"], -1),
-            ("cmake", ["--version"], -1),
-        ]
+    def test_cli_tools(self):
+        """Test all command-line tools, probing them in parallel"""
+        print(f"🔧 Testing {len(TOOL_PROBES)} Command-Line Tools...")
+        missing = []
+        # Each probe mostly waits on a fork/exec, so threads overlap them well
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+            futures = {executor.submit(self.probe_tool, *probe[:4]): probe for probe in TOOL_PROBES}
+            for future in as_completed(futures):
+                if not future.result():
+                    missing.append(futures[future])
         
-        for tool, args, expected in tools:
-            if self.test_tool_presence(tool, "Build"):
-                self.test_tool_execution(tool, args, "Build", expected)
-            elif tool == "cmake":
-                self.install_missing_tool("cmake")
-                if shutil.which(tool):
-                    self.test_tool_execution(tool, args, "Build", expected)
+        missing.sort(key=TOOL_PROBES.index)
+        for tool, _, _, _, formula in missing:
+            if formula:
+                self.install_missing_tool(tool, formula)
+        installed = set(self.install_pending_tools())
+        for tool, args, category, expected, _ in missing:
+            if tool in installed:
+                self.test_tool_execution(tool, args, category, expected)
         print()
     
     def test_python_packages(self):
@@ -254,39 +300,36 @@ class ToolTester:
                         capture_output=True,
                         timeout=60
                     )
+                    importlib.invalidate_caches()
                     if self.test_python_package(package, "Python"):
-                        self.results["fixed"].append((package, "Installed via pip"))
+                        self._record("fixed", (package, "Installed via pip"))
                 except Exception:
                     pass
         print()
     
-    def test_system_tools(self):
-        """Test system tools"""
-        print("💻 Testing System Tools...")
-        tools = [
-            ("curl", ["--version"], -1),
-            ("tar", ["--version"], -1),
-            ("gzip", ["--version"], -1),
-        ]
-        
-        for tool, args, expected in tools:
-            if self.test_tool_presence(tool, "System"):
-                self.test_tool_execution(tool, args, "System", expected)
-        print()
+    @classmethod
+    def _import_grok_agent(cls):
+        """Import grok_agent from the working directory once per process"""
+        if cls._grok_agent is None:
+            cwd = str(Path.cwd())
+            if cwd not in sys.path:
+                sys.path.insert(0, cwd)
+            import grok_agent
+            cls._grok_agent = grok_agent
+        return cls._grok_agent
     
     def test_grok_agent_tools(self):
         """Test that grok_agent.py can access tools"""
         print("🤖 Testing Grok Agent Tool Access...")
         
         try:
-            # Try to import grok_agent
-            sys.path.insert(0, str(Path.cwd()))
-            import grok_agent
+            grok_agent = self._import_grok_agent()
+            tools = getattr(grok_agent, 'TOOLS', None)
             
             # Check TOOLS registry
-            if hasattr(grok_agent, 'TOOLS'):
-                tool_count = len(grok_agent.TOOLS)
-                self.results["passed"].append(("Grok Agent", "TOOLS registry", f"{tool_count} tools registered"))
+            if tools is not None:
+                tool_count = len(tools)
+                self._record("passed", ("Grok Agent", "TOOLS registry", f"{tool_count} tools registered"))
                 
                 # Check for key tools
                 expected_tools = [
@@ -294,17 +337,17 @@ class ToolTester:
                     "XcodeProjectInfo", "XcodeListFiles", "AndroidProjectInfo", "AndroidListFiles"
                 ]
                 for tool_name in expected_tools:
-                    if tool_name in grok_agent.TOOLS:
-                        self.results["passed"].append(("Grok Agent", f"Tool: {tool_name}", "Registered"))
+                    if tool_name in tools:
+                        self._record("passed", ("Grok Agent", f"Tool: {tool_name}", "Registered"))
                     else:
-                        self.results["failed"].append(("Grok Agent", f"Tool: {tool_name}", "Not in TOOLS registry"))
+                        self._record("failed", ("Grok Agent", f"Tool: {tool_name}", "Not in TOOLS registry"))
             else:
-                self.results["failed"].append(("Grok Agent", "TOOLS registry", "Not found"))
+                self._record("failed", ("Grok Agent", "TOOLS registry", "Not found"))
                 
         except ImportError as e:
-            self.results["failed"].append(("Grok Agent", "Import", f"Cannot import: {str(e)}"))
+            self._record("failed", ("Grok Agent", "Import", f"Cannot import: {str(e)}"))
         except Exception as e:
-            self.results["failed"].append(("Grok Agent", "Error", str(e)))
+            self._record("failed", ("Grok Agent", "Error", str(e)))
         print()
     
     def print_summary(self):
@@ -357,19 +400,15 @@ class ToolTester:
         print("=" * 70)
         print()
         
-        self.test_essential_tools()
-        self.test_enhanced_tools()
-        self.test_xcode_tools()
+        self.test_cli_tools()
         self.test_android_tools()
-        self.test_development_tools()
-        self.test_build_tools()
         self.test_python_packages()
-        self.test_system_tools()
         self.test_grok_agent_tools()
+        self.save_version_cache()
         
         return self.print_summary()
 
 if __name__ == "__main__":
-    tester = ToolTester()
+    tester = ToolTester(use_cache="--no-cache" not in sys.argv[1:])
     success = tester.run_all_tests()
     sys.exit(0 if success else 1)
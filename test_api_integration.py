@@ -4,31 +4,43 @@ Comprehensive API integration tests for Grok-Code agents
 """
 
 import sys
+import io
 import json
-import subprocess
+import contextlib
+from functools import lru_cache
 from pathlib import Path
 
 # Import grok_agent module
-sys.path.insert(0, str(Path(__file__).parent))
+_repo_dir = str(Path(__file__).parent)
+if _repo_dir not in sys.path:
+    sys.path.insert(0, _repo_dir)
 import grok_agent
 
-def test_count(func):
-    """Decorator to count test results"""
-    def wrapper(*args, **kwargs):
-        try:
-            result = func(*args, **kwargs)
-            if result:
-                print(f"  ✅ PASS")
-                return True
-            else:
-                print(f"  ❌ FAIL")
-                return False
-        except Exception as e:
-            print(f"  ❌ FAIL: {e}")
-            return False
-    return wrapper
-
-@test_count
+def run_test(name, test_func):
+    """Run one check; a failed assertion is a FAIL, any other exception propagates"""
+    print(f"[Test] {name}...", end="")
+    try:
+        passed = bool(test_func())
+    except AssertionError as e:
+        print(f"  ❌ FAIL: {e}")
+        return False
+    print("  ✅ PASS" if passed else "  ❌ FAIL")
+    return passed
+
+def run_main(*argv):
+    """Run grok_agent.main() in-process with the given CLI args; returns its stdout"""
+    output = io.StringIO()
+    saved_argv = sys.argv
+    sys.argv = ['grok_agent.py', *argv]
+    try:
+        with contextlib.redirect_stdout(output):
+            grok_agent.main()
+    except SystemExit:
+        pass
+    finally:
+        sys.argv = saved_argv
+    return output.getvalue()
+
 def test_all_agents_present():
     """Test that all 20 agents are present in DEFAULT_CONFIG"""
     agents = grok_agent.DEFAULT_CONFIG.get('specialized_agents', {})
@@ -45,32 +57,35 @@ def test_all_agents_present():
     assert len(missing) == 0, f"Missing agents: {missing}"
     return True
 
-@test_count
-def test_agent_structure():
-    """Test that each agent has required fields"""
+REQUIRED_AGENT_FIELDS = {'name', 'emoji', 'mode', 'agent'}
+VALID_MODES = {'agent', 'review', 'debug', 'orchestrate'}
+
+@lru_cache(maxsize=1)
+def agent_problems():
+    """Validate every agent in one pass; returns (structure problems, mode problems)"""
     agents = grok_agent.DEFAULT_CONFIG.get('specialized_agents', {})
-    
+    structure, modes = [], []
     for agent_id, agent_info in agents.items():
-        assert 'name' in agent_info, f"Agent {agent_id} missing 'name'"
-        assert 'emoji' in agent_info, f"Agent {agent_id} missing 'emoji'"
-        assert 'mode' in agent_info, f"Agent {agent_id} missing 'mode'"
-        assert 'agent' in agent_info, f"Agent {agent_id} missing 'agent'"
-    
+        missing = REQUIRED_AGENT_FIELDS - agent_info.keys()
+        if missing:
+            structure.append(f"Agent {agent_id} missing {sorted(missing)}")
+        mode = agent_info.get('mode')
+        if mode not in VALID_MODES:
+            modes.append(f"Agent {agent_id} has invalid mode: {mode}")
+    return structure, modes
+
+def test_agent_structure():
+    """Test that each agent has required fields"""
+    structure, _ = agent_problems()
+    assert not structure, "; ".join(structure)
     return True
 
-@test_count
 def test_agent_modes():
     """Test that all agent modes are valid"""
-    agents = grok_agent.DEFAULT_CONFIG.get('specialized_agents', {})
-    valid_modes = ['agent', 'review', 'debug', 'orchestrate']
-    
-    for agent_id, agent_info in agents.items():
-        mode = agent_info.get('mode')
-        assert mode in valid_modes, f"Agent {agent_id} has invalid mode: {mode}"
-    
+    _, modes = agent_problems()
+    assert not modes, "; ".join(modes)
     return True
 
-@test_count
 def test_grokcode_api_detection():
     """Test Grok-Code API detection"""
     url = "https://grokcode.vercel.app/api/chat"
@@ -78,7 +93,6 @@ def test_grokcode_api_detection():
     assert is_grokcode, "Grok-Code API not detected correctly"
     return True
 
-@test_count
 def test_message_extraction():
     """Test message extraction from messages array"""
     messages = [
@@ -95,7 +109,6 @@ def test_message_extraction():
     assert message_text == "test message", f"Expected 'test message', got '{message_text}'"
     return True
 
-@test_count
 def test_agent_payload_construction():
     """Test specialized agent payload construction"""
     config = grok_agent.DEFAULT_CONFIG.copy()
@@ -118,7 +131,6 @@ def test_agent_payload_construction():
     assert payload.get('agent') == 'security', f"Expected agent 'security', got '{payload.get('agent')}'"
     return True
 
-@test_count
 def test_sse_response_conversion():
     """Test SSE response format conversion"""
     # Simulate Grok-Code SSE response
@@ -137,53 +149,38 @@ def test_sse_response_conversion():
         "Response conversion failed"
     return True
 
-@test_count
 def test_list_agents_command():
     """Test --list-agents command"""
-    result = subprocess.run(
-        ['python3', 'grok_agent.py', '--list-agents'],
-        capture_output=True,
-        text=True,
-        timeout=10
-    )
-    
-    assert "Available Specialized Agents" in result.stdout, \
+    stdout = run_main('--list-agents')
+    
+    assert "Available Specialized Agents" in stdout, \
         "--list-agents command failed"
-    assert "(20)" in result.stdout, "Should show 20 agents"
+    assert "(20)" in stdout, "Should show 20 agents"
     return True
 
-@test_count
 def test_help_command_includes_list_agents():
     """Test that --help includes --list-agents"""
-    result = subprocess.run(
-        ['python3', 'grok_agent.py', '--help'],
-        capture_output=True,
-        text=True,
-        timeout=10
-    )
-    
-    assert "--list-agents" in result.stdout, \
+    stdout = run_main('--help')
+    
+    assert "--list-agents" in stdout, \
         "--list-agents not in help output"
     return True
 
-@test_count
 def test_specific_agents():
     """Test specific agents have correct configuration"""
     agents = grok_agent.DEFAULT_CONFIG.get('specialized_agents', {})
+    expected = {
+        'security': {'name': 'Security Agent', 'emoji': '🔒', 'mode': 'agent'},
+        'codeReview': {'mode': 'review'},
+        'bugHunter': {'mode': 'debug'},
+        'orchestrator': {'mode': 'orchestrate'},
+    }
     
-    # Test security agent
-    assert agents['security']['name'] == 'Security Agent'
-    assert agents['security']['emoji'] == '🔒'
-    assert agents['security']['mode'] == 'agent'
-    
-    # Test codeReview agent (should use 'review' mode)
-    assert agents['codeReview']['mode'] == 'review'
-    
-    # Test bugHunter agent (should use 'debug' mode)
-    assert agents['bugHunter']['mode'] == 'debug'
-    
-    # Test orchestrator agent (should use 'orchestrate' mode)
-    assert agents['orchestrator']['mode'] == 'orchestrate'
+    actual = {
+        agent_id: {field: agents.get(agent_id, {}).get(field) for field in fields}
+        for agent_id, fields in expected.items()
+    }
+    assert actual == expected, f"Expected {expected}, got {actual}"
     
     return True
 
@@ -210,8 +207,7 @@ def run_all_tests():
     failed = 0
     
     for name, test_func in tests:
-        print(f"[Test] {name}...", end="")
-        if test_func():
+        if run_test(name, test_func):
             passed += 1
         else:
             failed += 1
@@ -7,6 +7,7 @@ import sys
 import os
 import tempfile
 import shutil
+from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -72,18 +73,16 @@ try:
     print("\n3. Verifying created files...")
     
     for filename, language, code in blocks:
-        filepath = os.path.join(test_dir, filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            if content.strip() == code.strip():
-                print(f"   ✓ {filename} content matches")
-            else:
-                print(f"   ✗ {filename} content mismatch")
-                sys.exit(1)
-        else:
+        try:
+            content = Path(test_dir, filename).read_text(encoding='utf-8')
+        except FileNotFoundError:
             print(f"   ✗ {filename} not found")
             sys.exit(1)
+        if content.strip() == code.strip():
+            print(f"   ✓ {filename} content matches")
+        else:
+            print(f"   ✗ {filename} content mismatch")
+            sys.exit(1)
     
     # Test 4: Test filename inference from context
     print("\n4. Testing filename inference...")
@@ -0,0 +1,22 @@
+"""Tests for cli_utils"""
+import subprocess
+from unittest.mock import patch
+from cli_utils import run_cli
+
+
+def test_run_cli_success_and_stdin():
+    """Test output is returned and input reaches stdin"""
+    assert run_cli(["cat"], 5, "cat", stdin_text="hello") == (0, "hello", "")
+
+
+def test_run_cli_missing_tool():
+    """Test missing binaries report the install hint when given"""
+    assert run_cli(["no-such-tool-xyz"], 5, "xyz") == (1, "", "xyz not found")
+    assert run_cli(["no-such-tool-xyz"], 5, "xyz", "brew install xyz") == \
+        (1, "", "xyz not found. Install with: brew install xyz")
+
+
+def test_run_cli_timeout():
+    """Test timeouts are reported, not raised"""
+    with patch("cli_utils.subprocess.run", side_effect=subprocess.TimeoutExpired("kubectl", 1)):
+        assert run_cli(["kubectl"], 1, "kubectl") == (1, "", "kubectl timeout")
@@ -138,6 +138,13 @@ class TestSaveHistory:
         loaded = json.loads(history_file.read_text())
         assert len(loaded) == 40  # Last 40 messages
 
+    def test_dumps_history_roundtrips(self):
+        """Test prompt serialization of history with and without orjson"""
+        history = [{"role": "user", "content": "héllo \"quoted\""}]
+        assert json.loads(grok_agent.dumps_history(history)) == history
+        with patch.object(grok_agent, 'ORJSON_AVAILABLE', False):
+            assert grok_agent.dumps_history(history) == json.dumps(history)
+
 
 class TestLoadTodos:
     """Test todos loading"""
@@ -226,6 +233,23 @@ class TestGetEnvContext:
             
             assert "Not a git repository" in git_status or "Git status unavailable" in git_status
 
+    def test_get_env_context_cached_reuses_result(self):
+        """Test cached env context skips subprocess calls until invalidated"""
+        grok_agent.invalidate_env_context_cache()
+        with patch('grok_agent.get_env_context', return_value=("/tmp", "", "tree")) as mock_ctx:
+            assert grok_agent.get_env_context_cached() == ("/tmp", "", "tree")
+            assert grok_agent.get_env_context_cached() == ("/tmp", "", "tree")
+            assert mock_ctx.call_count == 1
+
+            grok_agent.invalidate_env_context_cache()
+            grok_agent.get_env_context_cached()
+            assert mock_ctx.call_count == 2
+
+            # Expired TTL forces a refresh
+            grok_agent.get_env_context_cached(ttl=0)
+            assert mock_ctx.call_count == 3
+        grok_agent.invalidate_env_context_cache()
+
 
 class TestCallGrokApi:
     """Test Grok API calls"""
@@ -275,6 +299,31 @@ class TestCallGrokApi:
             
             assert len(chunks) > 0
 
+    def test_response_content_helpers(self):
+        """Test message/delta content extraction tolerates missing parts"""
+        assert grok_agent.message_content({"choices": [{"message": {"content": "hi"}}]}) == "hi"
+        assert grok_agent.message_content({}) == ""
+        assert grok_agent.message_content({"choices": []}, '{}') == "{}"
+        assert grok_agent.delta_content({"choices": [{"delta": {"content": "x"}}]}) == "x"
+        assert grok_agent.delta_content({"choices": [{"delta": None}]}) == ""
+
+    def test_stream_response_to_stdout_batches_flushes(self):
+        """Test streamed chunks are echoed, joined and flushed on newlines or elapsed time"""
+        pieces = ["a", "b", "c", "line\n", "d", ""]
+        chunks = [{"choices": [{"delta": {"content": p}}]} for p in pieces]
+        # start, then one reading per non-empty chunk
+        step = grok_agent.STREAM_FLUSH_SECONDS
+        clock = [0.0, 0.0, 0.0, step, step, step]
+        out = MagicMock()
+        with patch.object(sys, 'stdout', out), patch('grok_agent.time.monotonic', side_effect=clock):
+            result = grok_agent.stream_response_to_stdout(iter(chunks))
+
+        assert result == "".join(pieces)
+        written = "".join(c.args[0] for c in out.write.call_args_list)
+        assert written == result + "\n"
+        # One flush when the interval elapses ("c"), one on the newline chunk, one at the end
+        assert out.flush.call_count == 3
+
 
 class TestExtractTools:
     """Test tool extraction from responses"""
@@ -344,6 +393,15 @@ class TestClassifyCommandRisk:
         for cmd in caution_commands:
             risk = grok_agent.classify_command_risk(cmd)
             assert risk == "CAUTION" or risk == "DANGEROUS"  # Depends on patterns
+    
+    def test_classify_is_memoized(self):
+        """Test repeated commands hit the classification cache"""
+        grok_agent.classify_command_risk.cache_clear()
+        grok_agent.classify_command_risk("git status")
+        grok_agent.classify_command_risk("git status")
+        info = grok_agent.classify_command_risk.cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
 
 
 class TestRunHook:
@@ -375,6 +433,15 @@ class TestRunHook:
         assert success is True  # Returns True if hook doesn't exist
         assert output == ""
 
+    def test_expand_user_path_memoized(self):
+        """Test config path expansion is cached per raw path"""
+        grok_agent.expand_user_path.cache_clear()
+        with patch('grok_agent.os.path.expanduser', return_value="/home/u/hooks") as mock_expand:
+            assert grok_agent.expand_user_path("~/hooks") == "/home/u/hooks"
+            assert grok_agent.expand_user_path("~/hooks") == "/home/u/hooks"
+        mock_expand.assert_called_once_with("~/hooks")
+        grok_agent.expand_user_path.cache_clear()
+
 
 class TestTools:
     """Test tool implementations"""
@@ -456,6 +523,41 @@ class TestGetSystemPrompt:
         assert "Bash" in prompt
         assert "View" in prompt
 
+    def test_get_system_prompt_cached_rebuilds_on_env_change(self):
+        """Test cached system prompt is reused until the env context changes"""
+        grok_agent._system_prompt_cache.update(key=None, value=None)
+        with patch('grok_agent.get_system_prompt', side_effect=lambda *a: "|".join(a)) as mock_prompt:
+            assert grok_agent.get_system_prompt_cached("/a", "", "tree") == "/a||tree"
+            assert grok_agent.get_system_prompt_cached("/a", "", "tree") == "/a||tree"
+            assert mock_prompt.call_count == 1
+            assert grok_agent.get_system_prompt_cached("/a", "M x", "tree") == "/a|M x|tree"
+            assert mock_prompt.call_count == 2
+
+    def test_likely_new_topic(self):
+        """Test local topic heuristic is decisive only at the extremes"""
+        assert grok_agent.likely_new_topic("fix the parser bug", "fix the parser bug again") is False
+        assert grok_agent.likely_new_topic("fix the parser bug", "deploy docker image") is True
+        assert grok_agent.likely_new_topic("fix the parser bug now", "add parser tests later") is None
+        assert grok_agent.likely_new_topic("", "anything") is None
+
+    def test_last_user_message(self):
+        """Test most recent plain-text user message is returned"""
+        history = [
+            {"role": "user", "content": "first"},
+            {"role": "assistant", "content": "reply"},
+            {"role": "user", "content": [{"type": "text", "text": "multimodal"}]},
+        ]
+        assert grok_agent.last_user_message(history) == "first"
+        assert grok_agent.last_user_message([]) == ""
+
+    def test_presplit_prompts_match_format(self):
+        """Test pre-split prompt halves reproduce str.format output"""
+        user_input = "fix {this} bug"
+        topic = grok_agent.TOPIC_PROMPT_HEAD + user_input + grok_agent.TOPIC_PROMPT_TAIL
+        assert topic == grok_agent.TOPIC_PROMPT.format(input=user_input)
+        compact = grok_agent.COMPACT_PROMPT_HEAD + "[]" + grok_agent.COMPACT_PROMPT_TAIL
+        assert compact == grok_agent.COMPACT_PROMPT.format(history="[]")
+
 
 class TestMain:
     """Test main function"""
@@ -0,0 +1,241 @@
+"""Tests for loop_utils (Ralph-Wiggum loop state)"""
+import threading
+import pytest
+from unittest.mock import patch
+import loop_utils
+from loop_utils import LoopState, check_for_active_loop, cancel_active_loop
+
+
+@pytest.fixture(autouse=True)
+def loop_dirs(tmp_path, monkeypatch):
+    """Redirect loop state and log directories to a temp dir"""
+    state_dir = tmp_path / "loops"
+    log_dir = tmp_path / "loop_logs"
+    state_dir.mkdir()
+    log_dir.mkdir()
+    monkeypatch.setattr(loop_utils, "LOOP_STATE_DIR", str(state_dir))
+    monkeypatch.setattr(loop_utils, "LOOP_LOG_DIR", str(log_dir))
+    return state_dir
+
+
+def test_save_and_load_roundtrip():
+    """Test loop state survives a save/load cycle"""
+    loop = LoopState("loop_1", "Refactor main.py", "DONE", max_iterations=5)
+    loop.context = ["Iteration 0:\nhello", "Iteration 1:\nünïcödé"]
+    loop.current_iteration = 2
+    loop.save()
+
+    loaded = LoopState.load("loop_1")
+    assert loaded is not None
+    assert loaded.prompt == "Refactor main.py"
+    assert loaded.max_iterations == 5
+    assert loaded.current_iteration == 2
+    assert loaded.context == loop.context
+    assert loaded.completed is False
+
+
+def test_load_missing_returns_none():
+    """Test loading an unknown loop returns None"""
+    assert LoopState.load("loop_missing") is None
+
+
+def test_json_helpers_roundtrip():
+    """Test JSON helpers produce bytes that load back identically"""
+    data = {"context": ["a", "b"], "completed": False, "n": 3}
+    encoded = loop_utils._json_dumps(data, indent=True)
+    assert isinstance(encoded, bytes)
+    assert loop_utils._json_loads(encoded) == data
+
+
+def test_check_and_cancel_active_loop():
+    """Test active loop detection and cancellation"""
+    LoopState("loop_2", "Task", "DONE").save()
+    assert check_for_active_loop() == "loop_2"
+
+    assert cancel_active_loop() is True
+    assert check_for_active_loop() is None
+    assert cancel_active_loop() is False
+
+
+def test_build_prompt_uses_recent_context_window():
+    """Test prompt includes only the last CONTEXT_WINDOW iterations"""
+    loop = LoopState("loop_3", "Task", "DONE")
+    loop.context = [f"Iteration {i}" for i in range(8)]
+    loop.current_iteration = 8
+
+    prompt = loop.build_prompt()
+    assert prompt.startswith("Task\n\nPrevious iterations:\nIteration 3\n\nIteration 4")
+    assert "Iteration 2" not in prompt
+    assert prompt.endswith("Output 'DONE' when complete.")
+    assert loop.get_context_string() == "\n\n".join(loop.context[-loop_utils.CONTEXT_WINDOW:])
+
+
+def test_build_prompt_first_iteration_has_tool_instructions():
+    """Test first iteration prompt includes tool usage instructions"""
+    loop = LoopState("loop_4", "Task", "DONE")
+    assert loop.build_prompt() == f"Task{loop_utils.TOOL_INSTRUCTIONS}\n\nOutput 'DONE' when complete."
+
+
+def test_check_completion_case_insensitive():
+    """Test completion promise detection ignores case"""
+    loop = LoopState("loop_5", "Task", "All Done")
+    assert loop.check_completion("still working") is False
+    assert loop.completed is False
+    assert loop.check_completion("...ALL DONE!") is True
+    assert loop.completed is True
+
+    loop = LoopState("loop_5b", "Task", "Straße fertig")
+    assert loop.check_completion("STRASSE FERTIG") is True
+
+
+def test_check_completion_across_scan_windows():
+    """Test promise spanning a scan window boundary is detected in long responses"""
+    window = loop_utils.COMPLETION_SCAN_WINDOW
+    loop = LoopState("loop_6", "Task", "FINISHED")
+    response = "x" * (window - 3) + "finished" + "y" * window
+    assert loop.check_completion(response) is True
+
+    loop = LoopState("loop_7", "Task", "FINISHED")
+    assert loop.check_completion("x" * (window * 3)) is False
+
+
+def test_active_pointer_tracks_loop_lifecycle(loop_dirs):
+    """Test the active-loop pointer is set on first save and cleared on completion"""
+    pointer = loop_dirs / loop_utils.ACTIVE_LOOP_POINTER
+    loop = LoopState("loop_8", "Task", "DONE")
+    loop.save()
+    assert pointer.read_text() == "loop_8"
+
+    loop.completed = True
+    loop.save()
+    assert pointer.read_text() == ""
+    assert check_for_active_loop() is None
+
+
+def test_check_for_active_loop_rebuilds_missing_pointer(loop_dirs):
+    """Test legacy state dirs without a pointer fall back to a scan"""
+    (loop_dirs / "loop_old.json").write_text('{"loop_id": "loop_old", "completed": false}')
+    (loop_dirs / "loop_done.json").write_text('{"loop_id": "loop_done", "completed": true}')
+
+    assert check_for_active_loop() == "loop_old"
+    assert (loop_dirs / loop_utils.ACTIVE_LOOP_POINTER).read_text() == "loop_old"
+
+
+def test_iteration_log_is_buffered_and_flushed_on_close(tmp_path):
+    """Test iteration log reuses one handle and is flushed on close"""
+    loop = LoopState("loop_9", "Task", "DONE")
+    loop.add_iteration("first")
+    handle = loop._log_fh
+    loop.add_iteration("second")
+    assert loop._log_fh is handle
+
+    loop.close()
+    assert loop._log_fh is None
+    log_text = (tmp_path / "loop_logs" / "loop_9.txt").read_text()
+    assert "Iteration 0:\nfirst" in log_text
+    assert "Iteration 1:\nsecond" in log_text
+
+
+def _stream(text):
+    """Build a fake streaming API response"""
+    return iter([{"choices": [{"delta": {"content": text}}]}])
+
+
+def test_run_eleven_loop_sends_bounded_recent_history():
+    """Test loop requests only carry the last LOOP_HISTORY_WINDOW history messages"""
+    history = [{"role": "user", "content": f"msg {i}"} for i in range(15)]
+    sent = []
+
+    def fake_api(api_key, messages, *args, **kwargs):
+        sent.append(list(messages))
+        return _stream("done" if len(sent) == 3 else "working")
+
+    config = {"model": "grok", "temperature": 0.1, "max_tokens": 100}
+    with patch("grok_agent.call_grok_api", side_effect=fake_api), \
+         patch("grok_agent.get_env_context_cached", return_value=("/tmp", "", "")), \
+         patch("loop_utils.time.sleep"), patch("builtins.print"):
+        result = loop_utils.run_eleven_loop("loop_10", "Task", "DONE", 5, "key", config, history)
+
+    assert "Loop completed after" in result
+    assert len(history) == 15 + 4
+    window = loop_utils.LOOP_HISTORY_WINDOW
+    for messages in sent:
+        # system + recent history + current prompt
+        assert len(messages) == window + 2
+    assert sent[0][1]["content"] == "msg 5"
+    assert sent[2][-2]["content"] == "working"
+    # History records the original prompt, not the context-expanded one
+    assert history[15] == {"role": "user", "content": "Task"}
+
+
+def test_run_tool_calls_parallelizes_read_only_tools():
+    """Test consecutive read-only tools run concurrently and results keep call order"""
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def fake_execute(tool_name, params, args, history):
+        calls.append(tool_name)
+        if tool_name == "View":
+            barrier.wait()  # Deadlocks (times out) unless both Views run concurrently
+        if tool_name == "Bash":
+            raise RuntimeError("boom")
+        return 0, f"{tool_name}:{params.get('path', params.get('command'))}", ""
+
+    tool_calls = [
+        ("View", [("path", "a.py")]),
+        ("View", [("path", "b.py")]),
+        ("Bash", [("command", "make")]),
+        ("LS", [("path", ".")]),
+    ]
+    results = loop_utils.run_tool_calls(tool_calls, fake_execute, object(), [])
+
+    assert [name for name, _ in results] == ["View", "View", "Bash", "LS"]
+    assert results[0][1] == (0, "View:a.py", "")
+    assert results[1][1] == (0, "View:b.py", "")
+    assert isinstance(results[2][1], RuntimeError)
+    assert results[3][1] == (0, "LS:.", "")
+    # Serial tools run strictly after the parallel batch
+    assert calls[2:] == ["Bash", "LS"]
+
+
+def test_scan_skips_completed_archives_and_other_files(loop_dirs):
+    """Test fallback scan ignores archives, non-loop files and corrupt state"""
+    (loop_dirs / "loop_a_completed.json").write_text('{"loop_id": "loop_a", "completed": false}')
+    (loop_dirs / "notes.json").write_text('{"loop_id": "notes", "completed": false}')
+    (loop_dirs / "loop_bad.json").write_text("not json")
+    assert loop_utils._scan_for_active_loop() is None
+
+    (loop_dirs / "loop_b.json").write_text('{"loop_id": "loop_b", "completed": false}')
+    assert loop_utils._scan_for_active_loop() == "loop_b"
+
+
+def test_save_is_atomic_and_cleanup_archives(loop_dirs):
+    """Test save leaves no temp file and cleanup archives the state file"""
+    loop = LoopState("loop_11", "Task", "DONE")
+    loop.save()
+    assert (loop_dirs / "loop_11.json").exists()
+    assert not (loop_dirs / "loop_11.json.tmp").exists()
+
+    loop.cleanup()
+    assert not (loop_dirs / "loop_11.json").exists()
+    assert (loop_dirs / "loop_11_completed.json").exists()
+    loop.cleanup()  # Already archived: no error
+
+
+def test_add_iteration_saves_every_interval(loop_dirs):
+    """Test full state snapshots are coalesced to every STATE_SAVE_INTERVAL iterations"""
+    interval = loop_utils.STATE_SAVE_INTERVAL
+    loop = LoopState("loop_12", "Task", "DONE")
+    loop.save()
+    for i in range(interval - 1):
+        loop.add_iteration(f"step {i}")
+    assert LoopState.load("loop_12").current_iteration == 0
+
+    loop.add_iteration("step")
+    assert LoopState.load("loop_12").current_iteration == interval
+
+    loop.add_iteration("more")
+    loop.completed = True
+    loop.add_iteration("final")
+    assert LoopState.load("loop_12").current_iteration == interval + 2
+    loop.close()
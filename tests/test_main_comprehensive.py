@@ -22,20 +22,20 @@ class TestMainInteractiveQuota:
     """Test main() interactive mode quota check paths"""
     
     def test_main_interactive_quota_error(self, mock_keychain, patch_default_config, monkeypatch):
-        """Test interactive mode with quota error"""
+        """Test interactive start makes no blocking quota call, so a quota error cannot abort it"""
+        monkeypatch.delenv(grok_agent.HEALTHCHECK_ENV_VAR, raising=False)
         inputs = iter(['1', 'exit'])
         
         with patch('builtins.input', side_effect=lambda _: next(inputs)):
-            with patch('grok_agent.call_grok_api') as mock_api:
-                # Mock quota check with error
-                mock_api.side_effect = [
-                    {"error": "quota exceeded"},  # Quota check returns error
-                ]
-                
-                with patch('sys.argv', ['grok_agent.py', '--interactive']):
-                    with pytest.raises(SystemExit) as exc_info:
-                        grok_agent.main()
-                    assert exc_info.value.code == 1
+            with patch('grok_agent.load_history', return_value=[]):
+                with patch('grok_agent.call_grok_api', return_value={"error": "quota exceeded"}) as mock_api:
+                    with patch('sys.argv', ['grok_agent.py', '--interactive']):
+                        try:
+                            grok_agent.main()
+                        except SystemExit as e:
+                            assert e.code in (0, None)
+        
+        mock_api.assert_not_called()
     
     def test_main_interactive_quota_exception(self, mock_keychain, patch_default_config, monkeypatch):
         """Test interactive mode with quota check exception"""
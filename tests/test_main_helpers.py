@@ -0,0 +1,161 @@
+"""Tests for main_helpers (interactive session helpers)"""
+import importlib
+import json
+import pytest
+from unittest.mock import patch
+
+import grok_agent
+import main_helpers
+
+# grok_agent imports main_helpers while partially initialized, which skips
+# main_helpers' own grok_agent imports; reload now that grok_agent is complete
+main_helpers = importlib.reload(main_helpers)
+
+
+@pytest.fixture
+def mock_config():
+    return {"model": "grok-4.1-fast", "temperature": 0.1, "max_tokens": 2048}
+
+
+@pytest.fixture
+def mock_env():
+    with patch('main_helpers.get_env_context_cached', return_value=("/tmp", "", "tree")):
+        yield
+
+
+class TestInitializeInteractiveSession:
+    """Test interactive session initialization"""
+
+    def test_no_startup_api_probe_by_default(self, mock_config, mock_env, monkeypatch):
+        """Test session start makes no API call without history"""
+        monkeypatch.delenv(grok_agent.HEALTHCHECK_ENV_VAR, raising=False)
+        with patch('main_helpers.call_grok_api') as mock_api:
+            history = main_helpers.initialize_interactive_session("key", mock_config, [])
+
+        mock_api.assert_not_called()
+        assert len(history) == 1
+        assert history[0]["role"] == "system"
+
+    def test_startup_api_probe_runs_in_background(self, mock_config, mock_env, monkeypatch):
+        """Test opt-in probe runs off the main thread"""
+        monkeypatch.setenv(grok_agent.HEALTHCHECK_ENV_VAR, "1")
+        with patch('grok_agent.threading.Thread') as mock_thread:
+            main_helpers.initialize_interactive_session("key", mock_config, [])
+
+        mock_thread.assert_called_once()
+        assert mock_thread.call_args.kwargs["target"] is grok_agent._probe_api
+        mock_thread.return_value.start.assert_called_once()
+
+    def test_probe_api_never_raises(self, mock_config):
+        """Test probe failures are logged, not raised"""
+        with patch('grok_agent.call_grok_api', side_effect=Exception("down")):
+            grok_agent._probe_api("key", mock_config)
+        with patch('grok_agent.call_grok_api', return_value={"error": "quota"}):
+            grok_agent._probe_api("key", mock_config)
+
+
+class TestCompactHistory:
+    """Test history compaction"""
+
+    def test_under_threshold_returns_same_history(self, mock_config):
+        """Test short histories are returned untouched without an API call"""
+        history = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+        with patch('main_helpers.call_grok_api') as mock_api:
+            assert main_helpers.compact_history_if_needed(history, "key", mock_config) is history
+        mock_api.assert_not_called()
+
+    def test_compaction_prompt_matches_template(self, mock_config):
+        """Test compaction prompt is the COMPACT_PROMPT template filled with the JSON history"""
+        history = [{"role": "system", "content": "sys"}]
+        history += [{"role": "user", "content": f"msg {i}"} for i in range(25)]
+        with patch('main_helpers.call_grok_api') as mock_api:
+            mock_api.return_value = {"choices": [{"message": {"content": "summary"}}]}
+            compacted = main_helpers.compact_history_if_needed(history, "key", mock_config)
+
+        prompt = mock_api.call_args.args[1][0]["content"]
+        head, tail = grok_agent.COMPACT_PROMPT.split("{history}")
+        assert prompt.startswith(head) and prompt.endswith(tail)
+        assert json.loads(prompt[len(head):len(prompt) - len(tail)]) == history[1:]
+        assert compacted == [history[0], {"role": "assistant", "content": "summary"}]
+
+    def test_compaction_failure_keeps_recent_history(self, mock_config):
+        """Test failed compaction keeps the system message plus the last 19 messages"""
+        history = [{"role": "system", "content": "sys"}]
+        history += [{"role": "user", "content": f"msg {i}"} for i in range(25)]
+        with patch('main_helpers.call_grok_api', side_effect=Exception("down")):
+            compacted = main_helpers.compact_history_if_needed(history, "key", mock_config)
+        assert compacted == [history[0]] + history[-19:]
+
+
+class TestTokenizeLoopCommand:
+    """Test /eleven-loop command tokenization"""
+
+    @pytest.mark.parametrize("command", [
+        '/eleven-loop fix tests --completion-promise "ALL DONE" --max-iterations 5',
+        "/eleven-loop 'single quoted' \"esc \\\"q\\\"\" \"\" bare",
+    ])
+    def test_matches_shlex(self, command):
+        """Test tokens match shlex.split for quoted and bare words"""
+        import shlex
+        assert main_helpers._tokenize_loop_command(command) == shlex.split(command)
+
+    def test_eleven_loop_parses_flags_and_prompt(self, mock_config):
+        """Test /eleven-loop collects prompt words around flags"""
+        command = '/eleven-loop fix the "flaky tests" --max-iterations 3 now --completion-promise "ALL DONE"'
+        with patch('loop_utils.run_eleven_loop', return_value="ok") as mock_loop, \
+             patch('builtins.print'):
+            assert main_helpers.handle_slash_commands(command, "key", mock_config, []) is True
+
+        loop_id, prompt, promise, max_iterations = mock_loop.call_args.args[:4]
+        assert prompt == "fix the flaky tests now"
+        assert promise == "ALL DONE"
+        assert max_iterations == 3
+
+
+class TestRunInteractiveLoop:
+    """Test the interactive session loop"""
+
+    def test_history_saves_are_debounced(self, mock_config, mock_env):
+        """Test history is saved every HISTORY_SAVE_INTERVAL_TURNS turns and on exit"""
+        turns = main_helpers.HISTORY_SAVE_INTERVAL_TURNS + 1
+        inputs = [f"q{i}" for i in range(turns)] + ["exit"]
+        stream = lambda *args, **kwargs: iter([{"choices": [{"delta": {"content": "ok"}}]}])
+        with patch('builtins.input', side_effect=inputs), \
+             patch('main_helpers.call_grok_api', side_effect=stream), \
+             patch('main_helpers.save_history') as mock_save, \
+             patch('main_helpers.save_todos'), \
+             patch('main_helpers.time.monotonic', return_value=0.0), \
+             patch('builtins.print'):
+            main_helpers.run_interactive_loop("key", mock_config, [{"role": "system", "content": "sys"}], {}, None)
+
+        # One debounced save after HISTORY_SAVE_INTERVAL_TURNS turns, one on exit
+        assert mock_save.call_count == 2
+
+    def test_todo_inputs_are_recorded(self, mock_config, mock_env):
+        """Test inputs mentioning a todo (any case) are stored in todos"""
+        inputs = ["add a TODO for docs", "plain question", "EXIT"]
+        stream = lambda *args, **kwargs: iter([{"choices": [{"delta": {"content": "ok"}}]}])
+        todos = {}
+        with patch('builtins.input', side_effect=inputs), \
+             patch('main_helpers.call_grok_api', side_effect=stream), \
+             patch('main_helpers.save_history'), \
+             patch('main_helpers.save_todos'), \
+             patch('builtins.print'):
+            main_helpers.run_interactive_loop("key", mock_config, [{"role": "system", "content": "sys"}], todos, None)
+
+        assert list(todos.values()) == ["add a TODO for docs"]
+
+    def test_system_prompt_slot_reserved_once(self, mock_config, mock_env):
+        """Test history without a system message gets one slot, refreshed every turn"""
+        history = [{"role": "user", "content": "earlier"}]
+        stream = lambda *args, **kwargs: iter([{"choices": [{"delta": {"content": "ok"}}]}])
+        with patch('builtins.input', side_effect=["hello", "exit"]), \
+             patch('main_helpers.call_grok_api', side_effect=stream), \
+             patch('main_helpers.get_system_prompt_cached', return_value="SYS"), \
+             patch('main_helpers.save_history'), \
+             patch('main_helpers.save_todos'), \
+             patch('builtins.print'):
+            main_helpers.run_interactive_loop("key", mock_config, history, {}, None)
+
+        assert history[0] == {"role": "system", "content": "SYS"}
+        assert [m["role"] for m in history] == ["system", "user", "user", "assistant"]
@@ -1,7 +1,9 @@
 """Tests for multi-modal utilities"""
+import base64
 import pytest
 import tempfile
 from pathlib import Path
+import multimodal_utils
 from multimodal_utils import (
     encode_image_to_base64, prepare_multimodal_message,
     create_multimodal_messages, validate_image_file
@@ -30,4 +32,74 @@ def test_validate_image_file_nonexistent():
     """Test validating non-existent image"""
     valid, error = validate_image_file("/nonexistent/image.png")
     assert not valid
-    assert "not found" in error.lower()
\ No newline at end of file
+    assert "not found" in error.lower()
+
+def test_encode_image_to_base64_chunked_matches_full_encode(tmp_path):
+    """Test incremental encoding matches a one-shot base64 encode"""
+    data = bytes(range(256)) * (multimodal_utils.B64_CHUNK_SIZE // 256 + 7)
+    image = tmp_path / "big.png"
+    image.write_bytes(data)
+    result = encode_image_to_base64(str(image))
+    assert result == "data:image/png;base64," + base64.b64encode(data).decode('ascii')
+
+def test_encode_image_to_base64_memoized_until_file_changes(tmp_path):
+    """Test repeat encodes hit the cache and a modified file is re-encoded"""
+    multimodal_utils.clear_image_cache()
+    image = tmp_path / "shot.png"
+    image.write_bytes(b"first")
+    first = encode_image_to_base64(str(image))
+    assert encode_image_to_base64(str(image)) == first
+    assert multimodal_utils._encode_image_cached.cache_info().hits == 1
+
+    image.write_bytes(b"second!")
+    assert encode_image_to_base64(str(image)) == "data:image/png;base64," + base64.b64encode(b"second!").decode('ascii')
+    multimodal_utils.clear_image_cache()
+    assert multimodal_utils._encode_image_cached.cache_info().currsize == 0
+
+def test_validate_image_file_checks_type_and_size(tmp_path):
+    """Test directories, oversized files and non-images are rejected"""
+    assert validate_image_file(str(tmp_path)) == (False, f"Path is not a file: {tmp_path}")
+
+    big = tmp_path / "big.png"
+    with open(big, "wb") as f:
+        f.truncate(10 * 1024 * 1024 + 1)
+    assert "too large" in validate_image_file(str(big))[1]
+
+    text = tmp_path / "notes.txt"
+    text.write_text("hi")
+    assert "not an image" in validate_image_file(str(text))[1]
+
+    image = tmp_path / "ok.png"
+    image.write_bytes(b"png")
+    assert validate_image_file(str(image)) == (True, None)
+
+def test_prepare_multimodal_message_reads_large_attachment(tmp_path, monkeypatch):
+    """Test small and mmap-backed attachments decode the same way as text-mode reads"""
+    monkeypatch.setattr(multimodal_utils, "ATTACHMENT_MMAP_THRESHOLD", 16)
+    small = tmp_path / "small.txt"
+    small.write_bytes(b"a\r\nb")
+    large = tmp_path / "large.txt"
+    large.write_bytes(b"line\r\n" * 10 + b"caf\xc3\xa9\xff")
+
+    content = prepare_multimodal_message("", file_paths=[str(small), str(large)])
+    assert content[0]["text"] == "\n\n[File: small.txt]\na\nb"
+    assert content[1]["text"] == "\n\n[File: large.txt]\n" + "line\n" * 10 + "café"
+
+def test_guess_image_mime_type_table_and_fallback():
+    """Test common image extensions use the table and others fall back to mimetypes"""
+    assert multimodal_utils._guess_image_mime_type("shot.PNG") == "image/png"
+    assert multimodal_utils._guess_image_mime_type("photo.jpeg") == "image/jpeg"
+    assert multimodal_utils._guess_image_mime_type("icon.svg") == "image/svg+xml"
+    assert multimodal_utils._guess_image_mime_type("notes.txt") == "text/plain"
+
+def test_extract_images_from_message():
+    """Test image URLs are collected from list content only"""
+    message = {"content": [
+        {"type": "text", "text": "hi"},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,AA"}},
+        {"type": "image_url", "image_url": {}},
+        "stray",
+    ]}
+    assert multimodal_utils.extract_images_from_message(message) == ["data:image/png;base64,AA"]
+    assert multimodal_utils.extract_images_from_message({"content": "text"}) == []
+    assert multimodal_utils.extract_images_from_message({}) == []
@@ -0,0 +1,295 @@
+"""Tests for orchestration_utils"""
+import asyncio
+import json
+import os
+import subprocess
+import stat
+import time
+import pytest
+import orchestration_utils
+
+
+@pytest.fixture
+def fake_kubectl(tmp_path, monkeypatch):
+    """Put a fake kubectl on PATH that echoes its arguments after a short delay"""
+    script = tmp_path / "kubectl"
+    script.write_text("#!/bin/sh\nsleep 0.3\necho \"$@\"\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return script
+
+
+def test_gather_kubectl_runs_calls_concurrently(fake_kubectl):
+    """Test batched kubectl calls overlap and keep their order"""
+    start = time.monotonic()
+    results = orchestration_utils.gather_kubectl(
+        [("pods", "web"), ("deployments", None), ("services", "web")]
+    )
+    elapsed = time.monotonic() - start
+
+    assert [r[0] for r in results] == [0, 0, 0]
+    assert results[0][1].strip() == "get pods -o json -n web --chunk-size=0"
+    assert results[1][1].strip() == "get deployments -o json --chunk-size=0"
+    assert results[2][1].strip() == "get services -o json -n web --chunk-size=0"
+    assert elapsed < 0.8
+
+
+def test_gather_kubectl_respects_concurrency(fake_kubectl):
+    """Test concurrency=1 serializes the calls"""
+    start = time.monotonic()
+    orchestration_utils.gather_kubectl([("pods", None), ("services", None)], concurrency=1)
+    assert time.monotonic() - start >= 0.6
+
+
+def test_async_missing_binary(monkeypatch, tmp_path):
+    """Test a missing kubectl is reported, not raised"""
+    monkeypatch.setenv("PATH", str(tmp_path))
+    code, _, err = orchestration_utils.gather_kubectl([("pods", None)])[0]
+    assert code == 1
+    assert "kubectl not found" in err
+
+
+def test_kubectl_get_fields_builds_jsonpath():
+    """Test requested fields become a jsonpath row template"""
+    cmd = orchestration_utils._kubectl_get_cmd(
+        "pods", "web", "json", ["metadata.name", ".status.phase"], 0, "app=api", "status.phase=Running"
+    )
+    assert cmd == [
+        "kubectl", "get", "pods",
+        "-o", 'jsonpath={range .items[*]}{.metadata.name}{"\\t"}{.status.phase}{"\\n"}{end}',
+        "-n", "web", "--chunk-size=0", "-l", "app=api", "--field-selector=status.phase=Running",
+    ]
+
+
+def test_kubectl_get_rows_parses_output(monkeypatch):
+    """Test field rows come back as dicts keyed by field"""
+    monkeypatch.setattr(orchestration_utils, "kubectl_get",
+                        lambda *a, **k: (0, "api-1\tRunning\napi-2\tPending\n", ""))
+    code, rows, _ = orchestration_utils.kubectl_get_rows("pods", ["metadata.name", "status.phase"])
+    assert code == 0
+    assert rows == [
+        {"metadata.name": "api-1", "status.phase": "Running"},
+        {"metadata.name": "api-2", "status.phase": "Pending"},
+    ]
+
+
+def test_kubectl_get_caches_until_ttl_or_mutation(monkeypatch):
+    """Test repeat gets reuse the result until it expires or the cluster changes"""
+    orchestration_utils.invalidate_kubectl_cache()
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=f"out{len(calls)}", stderr="")
+
+    monkeypatch.setattr(orchestration_utils.subprocess, "run", fake_run)
+    assert orchestration_utils.kubectl_get("pods", "web")[1] == "out1"
+    assert orchestration_utils.kubectl_get("pods", "web")[1] == "out1"
+    assert orchestration_utils.kubectl_get("pods", "other")[1] == "out2"
+    assert orchestration_utils.kubectl_get("pods", "web", cache_ttl=0)[1] == "out3"
+
+    orchestration_utils.kubectl_apply("deploy.yaml", "web")
+    assert orchestration_utils.kubectl_get("pods", "web")[1] == "out5"
+    orchestration_utils.invalidate_kubectl_cache()
+
+
+def test_kubectl_get_cache_is_bounded(monkeypatch):
+    """Test distinct reads past the cap evict expired entries first, then the oldest"""
+    orchestration_utils.invalidate_kubectl_cache()
+    monkeypatch.setattr(orchestration_utils, "KUBECTL_GET_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(orchestration_utils.subprocess, "run",
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, stdout="out", stderr=""))
+    clock = iter([0.0, 1.0, 10.0, 11.0, 12.0])
+    monkeypatch.setattr(orchestration_utils.time, "monotonic", lambda: next(clock))
+
+    for namespace in ["a", "b", "c"]:
+        orchestration_utils.kubectl_get("pods", namespace)
+    assert [key[-2] for key in orchestration_utils._kubectl_get_cache] == ["c"]
+
+    for namespace in ["d", "e"]:
+        orchestration_utils.kubectl_get("pods", namespace)
+    assert [key[-2] for key in orchestration_utils._kubectl_get_cache] == ["d", "e"]
+    orchestration_utils.invalidate_kubectl_cache()
+
+
+WATCH_SCRIPT = """#!/bin/sh
+cat <<'JSON'
+{
+    "type": "ADDED",
+    "object": {"metadata": {"name": "api"}, "status": {"phase": "Pending"}}
+}
+JSON
+sleep 0.2
+printf '{"type": "MODIFIED", "object": {"metadata": {"name": "api"}, "status": {"phase": "Running"}}}\\n'
+exec sleep 5
+"""
+
+
+@pytest.fixture
+def watching_kubectl(fake_kubectl):
+    """Fake kubectl that streams pretty-printed watch events"""
+    fake_kubectl.write_text(WATCH_SCRIPT)
+    return fake_kubectl
+
+
+def _running(obj):
+    return obj["status"]["phase"] == "Running"
+
+
+def test_kubectl_watch_returns_first_match(watching_kubectl):
+    """Test watch returns as soon as an event satisfies the predicate"""
+    start = time.monotonic()
+    code, out, _ = orchestration_utils.kubectl_watch("pods", "web", _running, timeout=3)
+    assert code == 0
+    assert json.loads(out)["metadata"]["name"] == "api"
+    assert time.monotonic() - start < 2
+
+
+def test_kubectl_watch_times_out(watching_kubectl):
+    """Test watch gives up after the timeout"""
+    code, _, err = orchestration_utils.kubectl_watch("pods", "web", lambda obj: False, timeout=0.5)
+    assert code == 1
+    assert err == "kubectl watch timeout"
+
+
+def test_kubectl_watch_async(watching_kubectl):
+    """Test the async watch variant"""
+    code, out, _ = asyncio.run(orchestration_utils.kubectl_watch_async("pods", None, _running, timeout=3))
+    assert code == 0
+    assert json.loads(out)["status"]["phase"] == "Running"
+
+    result = asyncio.run(orchestration_utils.kubectl_watch_async("pods", None, lambda obj: False, timeout=0.5))
+    assert result == (1, "", "kubectl watch timeout")
+
+
+def test_watch_decoder_parses_each_event_once(monkeypatch):
+    """Test the buffer is only decoded on lines that can close an event"""
+    decoder = orchestration_utils._WatchEventDecoder()
+    calls = []
+    raw_decode = decoder._decoder.raw_decode
+    monkeypatch.setattr(decoder._decoder, "raw_decode", lambda s: calls.append(s) or raw_decode(s))
+    lines = ['{\n', '    "type": "ADDED",\n', '    "object": {"a": 1}\n', '}\n', '{"type": "DELETED"}\n']
+    events = [event for line in lines for event in decoder.feed(line)]
+    assert [event["type"] for event in events] == ["ADDED", "DELETED"]
+    assert len(calls) == 2
+
+
+HELM_SCRIPT = """#!/bin/sh
+n=$(cat "$COUNT_FILE" 2>/dev/null || echo 0)
+echo $((n + 1)) > "$COUNT_FILE"
+if [ "$n" -lt "$FAILURES" ]; then
+    echo "Error: UPGRADE FAILED: another operation (install/upgrade/rollback) is in progress" >&2
+    exit 1
+fi
+sleep 0.3
+echo "deployed $@"
+"""
+
+
+@pytest.fixture
+def fake_helm(tmp_path, monkeypatch):
+    """Fake helm that reports a release lock conflict $FAILURES times before succeeding"""
+    script = tmp_path / "helm"
+    script.write_text(HELM_SCRIPT)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("COUNT_FILE", str(tmp_path / "count"))
+    monkeypatch.setattr(orchestration_utils, "HELM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(orchestration_utils.random, "random", lambda: 0)
+    yield tmp_path / "count"
+    orchestration_utils.set_helm_concurrency(orchestration_utils.HELM_CONCURRENCY)
+
+
+def test_helm_upgrade_async_retries_lock_conflicts(fake_helm, monkeypatch):
+    """Test 'another operation is in progress' is retried with backoff"""
+    monkeypatch.setenv("FAILURES", "2")
+    code, out, _ = asyncio.run(orchestration_utils.helm_upgrade_async("web", "charts/web", "prod"))
+    assert code == 0
+    assert out.strip() == "deployed upgrade web charts/web -n prod"
+    assert fake_helm.read_text().strip() == "3"
+
+
+def test_helm_async_gives_up_after_retries(fake_helm, monkeypatch):
+    """Test lock conflicts surface once retries are exhausted"""
+    monkeypatch.setenv("FAILURES", "99")
+    code, _, err = asyncio.run(orchestration_utils.helm_install_async("web", "charts/web"))
+    assert code == 1
+    assert "in progress" in err
+    assert int(fake_helm.read_text()) == orchestration_utils.HELM_RETRY_ATTEMPTS + 1
+
+
+def test_helm_async_respects_concurrency(fake_helm, monkeypatch):
+    """Test set_helm_concurrency caps parallel helm operations"""
+    monkeypatch.setenv("FAILURES", "0")
+    orchestration_utils.set_helm_concurrency(1)
+
+    async def install_two():
+        return await orchestration_utils.batch([
+            orchestration_utils.helm_install_async("a", "chart"),
+            orchestration_utils.helm_install_async("b", "chart"),
+        ])
+
+    start = time.monotonic()
+    results = asyncio.run(install_two())
+    assert [r[0] for r in results] == [0, 0]
+    assert time.monotonic() - start >= 0.6
+
+
+def test_kubectl_apply_bundles_manifests(monkeypatch):
+    """Test several manifests are applied by one deduplicated kubectl call"""
+    commands = []
+    monkeypatch.setattr(orchestration_utils, "run_cli", lambda cmd, *a, **k: commands.append(cmd) or (0, "", ""))
+
+    orchestration_utils.kubectl_apply(["a.yaml", "b.yaml", "a.yaml"], "web")
+    orchestration_utils.kubectl_apply("c.yaml")
+    assert commands == [
+        ["kubectl", "apply", "-f", "a.yaml", "-f", "b.yaml", "-n", "web"],
+        ["kubectl", "apply", "-f", "c.yaml"],
+    ]
+    assert orchestration_utils.kubectl_apply([])[0] == 1
+
+
+def test_kubectl_get_via_proxy(monkeypatch):
+    """Test proxied reads hit the REST path and unsupported reads fall back to the CLI"""
+    import httpx
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        if request.url.path.endswith("/secrets"):
+            return httpx.Response(403, text="forbidden")
+        return httpx.Response(200, text='{"kind": "PodList", "items": []}')
+
+    client = httpx.Client(transport=httpx.MockTransport(handler), base_url="http://127.0.0.1:1")
+    monkeypatch.setattr(orchestration_utils, "_kubectl_proxy_client", lambda: client)
+    monkeypatch.setattr(orchestration_utils, "KUBECTL_USE_PROXY", True)
+    monkeypatch.setattr(orchestration_utils, "run_cli", lambda *a, **k: (0, "from-cli", ""))
+
+    result = orchestration_utils.kubectl_get("pods", "web", label_selector="app=api", cache_ttl=0)
+    assert result == (0, '{"kind": "PodList", "items": []}', "")
+    assert str(requests[-1]) == "http://127.0.0.1:1/api/v1/namespaces/web/pods?labelSelector=app%3Dapi"
+
+    orchestration_utils.kubectl_get("nodes", cache_ttl=0)
+    assert requests[-1].path == "/api/v1/nodes"
+
+    # No namespace, unknown resource, field projection or HTTP error -> kubectl CLI
+    assert orchestration_utils.kubectl_get("deployments", cache_ttl=0)[1] == "from-cli"
+    assert orchestration_utils.kubectl_get("widgets", "web", cache_ttl=0)[1] == "from-cli"
+    assert orchestration_utils.kubectl_get("pods", "web", fields=["metadata.name"], cache_ttl=0)[1] == "from-cli"
+    assert orchestration_utils.kubectl_get("secrets", "web", cache_ttl=0)[1] == "from-cli"
+
+
+def test_start_kubectl_proxy_parses_address(fake_kubectl):
+    """Test the proxy address is read from kubectl's startup line"""
+    fake_kubectl.write_text("#!/bin/sh\necho 'Starting to serve on 127.0.0.1:41234'\nexec sleep 5\n")
+    proc, url = orchestration_utils._start_kubectl_proxy()
+    try:
+        assert url == "http://127.0.0.1:41234"
+        assert proc.poll() is None
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+    fake_kubectl.write_text("#!/bin/sh\necho 'error: no context' >&2\nexit 1\n")
+    assert orchestration_utils._start_kubectl_proxy() is None
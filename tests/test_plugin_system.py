@@ -48,4 +48,70 @@ def test_register_invalid_tool():
         return 0, "", ""
     
     with pytest.raises(ValueError):
-        register_tool("wrong", wrong_signature)
\ No newline at end of file
+        register_tool("wrong", wrong_signature)
+
+
+def test_registration_keeps_func_alias_in_sync():
+    """Test execute_tool's name -> func alias follows register/unregister"""
+    import plugin_system
+
+    def test_tool(params):
+        return 0, "first", ""
+
+    register_tool("alias_tool", test_tool)
+    assert plugin_system._plugin_funcs["alias_tool"] is test_tool
+    assert list(get_tool("alias_tool")["signature"].parameters) == ["params"]
+
+    register_tool("alias_tool", lambda params: (0, "second", ""))
+    assert execute_tool("alias_tool", {}) == (0, "second", "")
+
+    unregister_tool("alias_tool")
+    assert "alias_tool" not in plugin_system._plugin_funcs
+    assert execute_tool("alias_tool", {})[0] == 1
+
+
+def test_load_plugin_reuses_unchanged_module(tmp_path):
+    """Test reloading an unchanged plugin file skips re-executing the module"""
+    import os
+    plugin = tmp_path / "counting_plugin.py"
+    plugin.write_text(
+        "import builtins\n"
+        "builtins._plugin_exec_count = getattr(builtins, '_plugin_exec_count', 0) + 1\n"
+        "from plugin_system import register_tool\n"
+        "def register_plugin():\n"
+        "    register_tool('counting_tool', lambda params: (0, 'v1', ''))\n"
+    )
+    import builtins
+    try:
+        assert load_plugin_from_file(str(plugin))
+        unregister_tool("counting_tool")
+        assert load_plugin_from_file(str(plugin))
+        assert builtins._plugin_exec_count == 1
+        assert execute_tool("counting_tool", {}) == (0, "v1", "")
+
+        plugin.write_text(plugin.read_text().replace("'v1'", "'v2'"))
+        stat = plugin.stat()
+        os.utime(plugin, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert load_plugin_from_file(str(plugin))
+        assert builtins._plugin_exec_count == 2
+        assert execute_tool("counting_tool", {}) == (0, "v2", "")
+    finally:
+        unregister_tool("counting_tool")
+        del builtins._plugin_exec_count
+
+
+def test_load_plugins_from_directory_filters_entries(tmp_path):
+    """Test only top-level .py files other than __init__.py are loaded"""
+    from plugin_system import load_plugins_from_directory
+    body = "from plugin_system import register_tool\ndef register_plugin():\n    register_tool('{0}', lambda params: (0, '{0}', ''))\n"
+    (tmp_path / "one.py").write_text(body.format("dir_tool_one"))
+    (tmp_path / "__init__.py").write_text(body.format("dir_tool_init"))
+    (tmp_path / "notes.txt").write_text("not a plugin")
+    (tmp_path / "pkg.py").mkdir()
+    try:
+        assert load_plugins_from_directory(str(tmp_path)) == 1
+        assert "dir_tool_one" in list_tools()
+        assert "dir_tool_init" not in list_tools()
+        assert load_plugins_from_directory(str(tmp_path / "missing")) == 0
+    finally:
+        unregister_tool("dir_tool_one")
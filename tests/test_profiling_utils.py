@@ -0,0 +1,81 @@
+"""Tests for profiling_utils"""
+import cProfile
+import json
+import subprocess
+import sys
+import profiling_utils
+
+
+def _busy():
+    return sum(i * i for i in range(20000))
+
+
+def test_analyze_profile_stats_returns_top_rows(tmp_path):
+    """Test stats are returned as JSON rows sorted by cumulative time"""
+    stats_file = tmp_path / "out.stats"
+    profiler = cProfile.Profile()
+    profiler.runcall(_busy)
+    profiler.dump_stats(str(stats_file))
+
+    code, out, err = profiling_utils.analyze_profile_stats(str(stats_file), top_n=3)
+    assert (code, err) == (0, "")
+    rows = json.loads(out)
+    assert len(rows) == 3
+    assert set(rows[0]) == {"func", "cc", "nc", "tt", "ct"}
+    assert [r["ct"] for r in rows] == sorted((r["ct"] for r in rows), reverse=True)
+    assert any(r["func"].endswith("(_busy)") for r in rows)
+
+
+def test_cprofile_analyze_tool_accepts_string_top_n(tmp_path):
+    """Test the CProfileAnalyze tool coerces top_n, which arrives as a string from XML params"""
+    from grok_agent import tool_cprofile_analyze
+    stats_file = tmp_path / "out.stats"
+    profiler = cProfile.Profile()
+    profiler.runcall(_busy)
+    profiler.dump_stats(str(stats_file))
+
+    code, out, err = tool_cprofile_analyze({"stats_file": str(stats_file), "top_n": "3"})
+    assert (code, err) == (0, "")
+    assert len(json.loads(out)) == 3
+
+
+def test_analyze_profile_stats_missing_file(tmp_path):
+    """Test a missing stats file is reported as an error"""
+    code, out, err = profiling_utils.analyze_profile_stats(str(tmp_path / "missing.stats"))
+    assert code == 1 and out == "" and err
+
+
+def test_profile_python_script_method_selection(monkeypatch):
+    """Test sampling uses py-spy when installed and falls back to cProfile"""
+    commands = []
+    monkeypatch.setattr(profiling_utils.subprocess, "run",
+                        lambda cmd, **kw: commands.append(cmd) or subprocess.CompletedProcess(cmd, 0, "", ""))
+
+    monkeypatch.setattr(profiling_utils.shutil, "which", lambda name: "/usr/bin/py-spy")
+    profiling_utils.profile_python_script("app.py", ["--fast"], rate=50)
+    assert commands[-1] == ["py-spy", "record", "-o", "/tmp/profile.svg", "--rate", "50", "--",
+                            sys.executable, "app.py", "--fast"]
+
+    profiling_utils.profile_python_script("app.py", method="deterministic", output_file="/tmp/a.stats")
+    assert commands[-1] == [sys.executable, "-m", "cProfile", "-o", "/tmp/a.stats", "app.py"]
+
+    monkeypatch.setattr(profiling_utils.shutil, "which", lambda name: None)
+    profiling_utils.profile_python_script("app.py")
+    assert commands[-1][1:4] == ["-m", "cProfile", "-o"]
+
+
+def test_profile_python_script_stats_output_uses_cprofile(monkeypatch):
+    """Test a .stats output_file gets cProfile output even when py-spy is installed"""
+    commands = []
+    monkeypatch.setattr(profiling_utils.subprocess, "run",
+                        lambda cmd, **kw: commands.append(cmd) or subprocess.CompletedProcess(cmd, 0, "", ""))
+
+    monkeypatch.setattr(profiling_utils.shutil, "which", lambda name: "/usr/bin/py-spy")
+    profiling_utils.profile_python_script("app.py", output_file="/tmp/x.stats")
+    assert commands[-1] == [sys.executable, "-m", "cProfile", "-o", "/tmp/x.stats", "app.py"]
+    profiling_utils.profile_python_script("app.py", output_file="/tmp/x.svg")
+    assert commands[-1][:4] == ["py-spy", "record", "-o", "/tmp/x.svg"]
+
+    monkeypatch.setattr(profiling_utils.shutil, "which", lambda name: None)
+    profiling_utils.profile_python_script("app.py", output_file="/tmp/x.stats")
+    assert commands[-1] == [sys.executable, "-m", "cProfile", "-o", "/tmp/x.stats", "app.py"]
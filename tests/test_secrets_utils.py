@@ -0,0 +1,59 @@
+"""Tests for secrets_utils"""
+import json
+import os
+import stat
+import pytest
+import secrets_utils
+
+
+def _fake_bin(tmp_path, monkeypatch, name, body):
+    """Put a fake executable on PATH"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    script = bin_dir / name
+    script.write_text("#!/bin/sh\n" + body)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return script
+
+
+def test_sops_decrypt_writes_output_file(tmp_path, monkeypatch):
+    """Test decrypted output is streamed into the output file"""
+    _fake_bin(tmp_path, monkeypatch, "sops", 'printf "plain:%s" "$2"\n')
+    out = tmp_path / "secret.yaml"
+    assert secrets_utils.sops_decrypt("secret.enc.yaml", str(out)) == (0, f"Decrypted to {out}", "")
+    assert out.read_text() == "plain:secret.enc.yaml"
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".sops-")] == []
+
+
+def test_sops_failure_keeps_existing_file(tmp_path, monkeypatch):
+    """Test a failed run leaves the existing output (and input) untouched"""
+    _fake_bin(tmp_path, monkeypatch, "sops", 'echo partial; echo "bad key" >&2; exit 2\n')
+    target = tmp_path / "config.yaml"
+    target.write_text("original")
+
+    code, out, err = secrets_utils.sops_encrypt(str(target), str(target))
+    assert (code, out) == (2, "")
+    assert "bad key" in err
+    assert target.read_text() == "original"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bin", "config.yaml"]
+
+
+def test_vault_write_sends_secrets_on_stdin(tmp_path, monkeypatch):
+    """Test secret values go to vault's stdin, not its argv"""
+    _fake_bin(tmp_path, monkeypatch, "vault", 'echo "$@" > "$ARGS_FILE"; cat > "$STDIN_FILE"\n')
+    monkeypatch.setenv("ARGS_FILE", str(tmp_path / "args"))
+    monkeypatch.setenv("STDIN_FILE", str(tmp_path / "stdin"))
+
+    code, _, _ = secrets_utils.vault_write("secret/app", {"password": "hunter2", "user": "me"})
+    assert code == 0
+    assert (tmp_path / "args").read_text().strip() == "kv put secret/app -"
+    assert json.loads((tmp_path / "stdin").read_text()) == {"password": "hunter2", "user": "me"}
+
+
+@pytest.mark.parametrize("use_orjson", [False, secrets_utils.ORJSON_AVAILABLE])
+def test_vault_read_field(tmp_path, monkeypatch, use_orjson):
+    """Test a single field is extracted from vault's JSON output"""
+    monkeypatch.setattr(secrets_utils, "ORJSON_AVAILABLE", use_orjson)
+    _fake_bin(tmp_path, monkeypatch, "vault", """echo '{"data": {"data": {"token": "abc"}}}'\n""")
+    assert secrets_utils.vault_read("secret/app", "token") == (0, "abc", "")
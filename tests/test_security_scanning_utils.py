@@ -0,0 +1,81 @@
+"""Tests for security_scanning_utils report summaries"""
+import json
+import subprocess
+import pytest
+from unittest.mock import patch
+import security_scanning_utils
+
+PARSERS = [False] + ([True] if security_scanning_utils.IJSON_AVAILABLE else [])
+
+
+@pytest.fixture(params=PARSERS, ids=lambda streaming: "ijson" if streaming else "json")
+def parser(request, monkeypatch):
+    """Run each test with and without the streaming parser"""
+    monkeypatch.setattr(security_scanning_utils, "IJSON_AVAILABLE", request.param)
+
+
+@pytest.fixture(autouse=True)
+def scanners_installed(monkeypatch):
+    """Pretend every scanner is on PATH"""
+    monkeypatch.setattr(security_scanning_utils, "_BIN_CACHE",
+                        {name: name for name in ("snyk", "trivy", "semgrep", "bandit")})
+
+
+def _completed(stdout, returncode=1):
+    return subprocess.CompletedProcess([], returncode, stdout=stdout, stderr="")
+
+
+def test_count_json_items(parser):
+    """Test array items are counted at the given prefix"""
+    report = json.dumps({"results": [{"id": 1, "extra": {"lines": [1, 2]}}, {"id": 2}], "errors": []})
+    assert security_scanning_utils._count_json_items(report, "results.item") == 2
+    assert security_scanning_utils._count_json_items('{"results": []}', "results.item") == 0
+    with pytest.raises(ValueError):
+        security_scanning_utils._count_json_items("not json", "results.item")
+
+
+def test_trivy_counts_first_result_only(parser):
+    """Test Trivy summary counts vulnerabilities of the first result"""
+    report = json.dumps({"Results": [
+        {"Target": "a", "Vulnerabilities": [{"id": "CVE-1"}, {"id": "CVE-2"}]},
+        {"Target": "b", "Vulnerabilities": [{"id": "CVE-3"}]},
+    ]})
+    with patch("cli_utils.subprocess.run", return_value=_completed(report)):
+        code, out, _ = security_scanning_utils.trivy_scan_image("alpine")
+    assert code == 1
+    assert out == "Found 2 vulnerabilities\n" + report
+
+
+def test_snyk_and_semgrep_summaries(parser):
+    """Test Snyk and Semgrep summaries count their findings"""
+    snyk = json.dumps({"vulnerabilities": [{"id": "x"}] * 3})
+    with patch("cli_utils.subprocess.run", return_value=_completed(snyk)):
+        assert security_scanning_utils.snyk_test()[1].startswith("Found 3 vulnerabilities\n")
+
+    semgrep = json.dumps({"results": [{"check_id": "a"}]})
+    with patch("cli_utils.subprocess.run", return_value=_completed(semgrep, 0)):
+        assert security_scanning_utils.semgrep_scan()[1].startswith("Found 1 security findings\n")
+
+
+def test_bandit_totals_and_malformed_output(parser):
+    """Test Bandit totals are summed and malformed output is passed through"""
+    report = json.dumps({"results": [{"x": 1}], "metrics": {"_totals": {"SEVERITY": {"HIGH": 1, "MEDIUM": 2, "LOW": 3}}}})
+    with patch("cli_utils.subprocess.run", return_value=_completed(report)):
+        assert security_scanning_utils.bandit_scan()[1].startswith("Found 6 security issues\n")
+
+    with patch("cli_utils.subprocess.run", return_value=_completed("oops")):
+        assert security_scanning_utils.bandit_scan() == (1, "oops", "")
+
+
+def test_missing_scanner_is_resolved_once(monkeypatch):
+    """Test a missing binary short-circuits without spawning and is looked up once"""
+    monkeypatch.setattr(security_scanning_utils, "_BIN_CACHE", {})
+    lookups = []
+    monkeypatch.setattr(security_scanning_utils.shutil, "which", lambda name: lookups.append(name))
+
+    with patch("cli_utils.subprocess.run") as run:
+        for _ in range(3):
+            code, _, err = security_scanning_utils.trivy_scan_filesystem()
+            assert code == 1 and err.startswith("trivy not found")
+    run.assert_not_called()
+    assert lookups == ["trivy"]
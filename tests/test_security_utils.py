@@ -100,6 +100,13 @@ class TestValidateCommandStructure:
         assert is_valid is True
         assert error is None
     
+    def test_validate_root_target_blocked_even_with_force(self):
+        """Test commands naming / itself stay blocked with force"""
+        for cmd in ("rm -rf /", "chmod 777 /", "RM -RF  /\t--no-preserve-root"):
+            is_valid, error = validate_command_structure(cmd, allow_force=True)
+            assert is_valid is False, cmd
+            assert "even with --force" in error
+    
     def test_validate_empty_command(self):
         """Test that empty commands are rejected"""
         is_valid, error = validate_command_structure("")
@@ -128,11 +135,108 @@ class TestValidateCommandStructure:
             is_valid, error = validate_command_structure(cmd)
             assert is_valid is False, f"Injection pattern not detected: {cmd}"
             assert "injection" in error.lower() or "dangerous" in error.lower()
+    
+    def test_validate_reports_matched_pattern(self):
+        """Test the error names the pattern that matched"""
+        is_valid, error = validate_command_structure("ls && del notes.txt")
+        assert error == "Command injection pattern detected: &&\\s*(rm|del|format|mkfs|dd)"
+        
+        is_valid, error = validate_command_structure("chmod 777 script.sh")
+        assert error == "Dangerous command pattern detected: \\bchmod\\s+777\\b"
+
+
+class TestWhitelist:
+    """Test whitelist mode"""
+    
+    def test_whitelist_checks_first_word(self, monkeypatch):
+        """Test only the first token is matched against the whitelist"""
+        import security_utils
+        monkeypatch.setattr(security_utils, "ALLOWED_COMMANDS_WHITELIST", ["ls", "git"])
+        assert validate_command_structure("\tgit status --short") == (True, None)
+        assert validate_command_structure("cat file") == (False, "Command not in whitelist: cat")
+
+
+class TestCreatorVerification:
+    """Test creator verification caching"""
+    
+    def test_is_creator_verified_is_cached(self, monkeypatch):
+        """Test identity_verify is consulted once per process"""
+        import types
+        import security_utils
+        calls = []
+        fake = types.ModuleType("identity_verify")
+        fake.is_creator_verified = lambda: calls.append(1) or False
+        monkeypatch.setitem(sys.modules, "identity_verify", fake)
+        security_utils.is_creator_verified.cache_clear()
+        try:
+            assert validate_command_structure("ls")[0] is True
+            assert validate_command_structure("sudo ls")[0] is False
+            assert calls == [1]
+        finally:
+            security_utils.is_creator_verified.cache_clear()
+    
+    def test_creator_bypasses_all_checks(self, monkeypatch):
+        """Test a verified creator skips every restriction"""
+        import security_utils
+        monkeypatch.setattr(security_utils, "is_creator_verified", lambda: True)
+        for cmd in ["", "a" * (MAX_COMMAND_LENGTH + 1), "rm -rf /", "ls; rm x"]:
+            assert validate_command_structure(cmd) == (True, None)
+
+
+class TestSudoRetry:
+    """Test the auto-sudo retry helper"""
+    
+    def test_retries_only_permission_failures(self, monkeypatch):
+        """Test only permission-related failures are re-run through sudo_utils"""
+        import security_utils
+        calls = []
+        monkeypatch.setattr(security_utils, "SUDO_UTILS_AVAILABLE", True)
+        monkeypatch.setattr(security_utils.sudo_utils, "execute_with_auto_sudo",
+                            lambda cmd, **kw: calls.append((cmd, kw)) or "retried")
+        
+        denied = subprocess.CompletedProcess("touch /x", 1, "", "touch: /x: Permission denied")
+        other = subprocess.CompletedProcess("false", 1, "", "something else")
+        ok = subprocess.CompletedProcess("true", 0, "", "permission denied")
+        
+        assert security_utils._maybe_sudo_retry("touch /x", denied, False, 5) == "retried"
+        assert security_utils._maybe_sudo_retry("false", other, False, 5) is other
+        assert security_utils._maybe_sudo_retry("true", ok, False, 5) is ok
+        assert calls == [("touch /x", {"allow_force": False, "timeout": 5, "auto_sudo": True})]
+        
+        monkeypatch.setattr(security_utils, "SUDO_UTILS_AVAILABLE", False)
+        assert security_utils._maybe_sudo_retry("touch /x", denied, False, 5) is denied
+    
+    def test_has_permission_error(self):
+        """Test permission indicators are matched case-insensitively anywhere in stderr"""
+        from security_utils import has_permission_error
+        assert has_permission_error("build log...\nmkdir: /opt/x: Permission denied\n")
+        assert has_permission_error("open failed: EACCES")
+        assert not has_permission_error("No such file or directory")
+        assert not has_permission_error("")
+    
+    def test_sudo_utils_loads_lazily(self):
+        """Test sudo_utils is only executed once one of its attributes is used"""
+        code = ("import sys, security_utils; "
+                "assert 'getpass' not in sys.modules; "
+                "security_utils.sudo_utils.check_if_sudo_needed; "
+                "assert 'getpass' in sys.modules")
+        result = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent.parent,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
 
 
 class TestExecuteCommandSafely:
     """Test safe command execution"""
     
+    def test_repeated_simple_commands_reuse_split(self):
+        """Test simple commands are tokenized once and then served from the cache"""
+        from security_utils import _split_cached
+        _split_cached.cache_clear()
+        for _ in range(3):
+            result = execute_command_safely("echo 'cached split'", timeout=5)
+            assert result.stdout == "cached split\n"
+        assert _split_cached.cache_info().hits == 2
+    
     def test_execute_safe_command(self):
         """Test execution of safe command"""
         result = execute_command_safely("echo 'test'", allow_force=False, timeout=5)
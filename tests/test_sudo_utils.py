@@ -0,0 +1,63 @@
+"""Tests for sudo_utils"""
+import os
+import stat
+import subprocess
+
+import pytest
+
+import sudo_utils
+
+FAKE_SUDO = """#!/bin/sh
+[ "$1" = "-A" ] || { echo "expected -A" >&2; exit 2; }
+shift
+[ "$("$SUDO_ASKPASS")" = "hunter2" ] || { echo "Sorry, try again." >&2; exit 1; }
+exec env -u SUDO_PASS "$@"
+"""
+
+
+@pytest.fixture
+def fake_sudo(tmp_path, monkeypatch):
+    """Put a fake sudo on PATH that checks the askpass password"""
+    script = tmp_path / "sudo"
+    script.write_text(FAKE_SUDO)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return script
+
+
+def test_run_with_sudo_uses_askpass(fake_sudo):
+    """Test the password reaches sudo through SUDO_ASKPASS, not stdin"""
+    result = sudo_utils._run_with_sudo("echo ok | tr a-z A-Z", "hunter2", 5)
+    assert (result.returncode, result.stdout) == (0, "OK\n")
+    assert stat.S_IMODE(os.stat(sudo_utils._askpass_path).st_mode) == 0o700
+
+    result = sudo_utils._run_with_sudo("echo ok", "wrong", 5)
+    assert result.returncode == 1
+    assert "try again" in result.stderr
+
+
+def test_check_if_sudo_needed():
+    """Test only failed commands with permission errors need sudo"""
+    denied = subprocess.CompletedProcess("ls", 1, "", "ls: /root: Permission denied")
+    assert sudo_utils.check_if_sudo_needed("ls", denied)
+    assert not sudo_utils.check_if_sudo_needed("ls", subprocess.CompletedProcess("ls", 1, "", "No such file"))
+    assert not sudo_utils.check_if_sudo_needed("ls", subprocess.CompletedProcess("ls", 0, "", "Permission denied"))
+
+
+def test_keychain_password_is_cached(monkeypatch):
+    """Test the keychain is queried once until the cache is cleared"""
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, "hunter2\n", "")
+
+    monkeypatch.setattr(sudo_utils, "_cached_sudo_password", None)
+    monkeypatch.setattr(sudo_utils.subprocess, "run", fake_run)
+    assert sudo_utils.get_sudo_password_from_keychain() == "hunter2"
+    assert sudo_utils.get_sudo_password_from_keychain() == "hunter2"
+    assert len(calls) == 1
+
+    sudo_utils._clear_cached_sudo_password()
+    assert sudo_utils.get_sudo_password_from_keychain() == "hunter2"
+    assert len(calls) == 2